@@ -0,0 +1,235 @@
+# === analysis/canon.py ===
+# Canon detection: find the same melodic line entering in different parts,
+# at any transposition and time offset.
+#
+# Each part is reduced to its top line, turned into a sequence of
+# (interval, inter-onset) tokens, and every n-gram of tokens is hashed with a
+# polynomial rolling hash. Equal hashes in different parts are candidate
+# imitations; they are verified against the actual tokens and chained along
+# the same (part pair, position shift) diagonal into longer entries. Work is
+# linear in the number of notes apart from the (capped) hash collisions.
+
+import argparse
+
+import numpy as np
+
+from analysis.note_index import DEFAULT_CACHE_DIR
+from analysis.score_index import load_score_index
+from utils import midi_to_note
+
+HASH_BASE = np.uint64(1_000_003)
+IOI_RESOLUTION = 48  # inter-onset intervals are quantized to 1/48 quarter
+
+
+def part_lines(index):
+    """
+    Reduce every part to its top line.
+    Returns {part id: (onsets, midi, measure numbers)} as numpy arrays.
+    """
+    notes = index["notes"]
+    measures = index["measures"]
+    onset = measures["offset"][notes["measure"]] + notes["offset"]
+    part = notes["part"]
+
+    # Rows are sorted by (measure, offset, midi): the last row of each
+    # (part, onset) run is the highest pitch at that onset
+    last_of_run = np.ones(len(onset), dtype=bool)
+    if len(onset) > 1:
+        last_of_run[:-1] = (part[1:] != part[:-1]) | (onset[1:] != onset[:-1])
+
+    lines = {}
+    for p in np.unique(part):
+        rows = np.flatnonzero(last_of_run & (part == p))
+        lines[int(p)] = (
+            onset[rows],
+            notes["midi"][rows].astype(np.int64),
+            measures["number"][notes["measure"][rows]],
+        )
+    return lines
+
+
+def line_tokens(onsets, midi, rhythm=True):
+    """
+    Transposition-invariant tokens: token i describes the step from note i
+    to note i + 1 (interval in semitones, and inter-onset time if `rhythm`).
+    """
+    intervals = np.diff(midi)
+    tokens = (intervals + 128).astype(np.uint64)
+    if rhythm:
+        ioi = np.rint(np.diff(onsets) * IOI_RESOLUTION).astype(np.uint64)
+        tokens = tokens * np.uint64(1 << 20) + ioi
+    return tokens + np.uint64(1)
+
+
+def rolling_hashes(tokens, n):
+    """
+    Polynomial hash of every window of n tokens, computed for all windows at
+    once with n vectorized multiply-adds (arithmetic wraps modulo 2**64).
+    """
+    count = len(tokens) - n + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.zeros(count, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(n):
+            hashes = hashes * HASH_BASE + tokens[j : j + count]
+    return hashes
+
+
+def _candidate_pairs(hashes, owners, max_occurrences):
+    """
+    Group window hashes and yield (window a, window b) pairs from different
+    parts. Hashes that occur more than max_occurrences times (ostinati,
+    repeated notes) are skipped to keep the pairing near-linear.
+    """
+    order = np.argsort(hashes, kind="stable")
+    sorted_hashes = hashes[order]
+    bounds = np.flatnonzero(np.diff(sorted_hashes)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(sorted_hashes)]))
+    for s, e in zip(starts, ends):
+        if e - s < 2 or e - s > max_occurrences:
+            continue
+        group = order[s:e]
+        for i in range(len(group)):
+            for j in range(i + 1, len(group)):
+                a, b = group[i], group[j]
+                if owners[a] != owners[b]:
+                    yield a, b
+
+
+def detect_canons(
+    index, n=6, rhythm=True, min_notes=None, max_occurrences=64, include_doublings=False
+):
+    """
+    Find imitative entries of the same line across parts.
+
+    Parameters:
+        index: score index (analysis.score_index.load_score_index)
+        n (int): n-gram length in intervals; shorter finds more, noisier entries
+        rhythm (bool): also require the same inter-onset rhythm
+        min_notes (int): shortest entry to report (default n + 1 notes)
+        max_occurrences (int): skip n-grams occurring more often than this
+        include_doublings (bool): also report parts moving together at the
+            same time (octave/unison doublings)
+
+    Returns:
+        list of dicts, one per entry, sorted by leader onset:
+        leader, follower (part names), leader_bar, follower_bar, leader_onset,
+        delay (quarters), transposition (semitones), first_note (the leader's
+        first pitch, e.g. "A4"), notes (length)
+    """
+    min_notes = min_notes or n + 1
+    lines = part_lines(index)
+
+    all_hashes, owners, positions, tokens_by_part = [], [], [], {}
+    for p, (onsets, midi, _) in lines.items():
+        tokens = line_tokens(onsets, midi, rhythm)
+        tokens_by_part[p] = tokens
+        h = rolling_hashes(tokens, n)
+        all_hashes.append(h)
+        owners.append(np.full(len(h), p))
+        positions.append(np.arange(len(h)))
+    if not all_hashes:
+        return []
+    hashes = np.concatenate(all_hashes)
+    owners = np.concatenate(owners)
+    positions = np.concatenate(positions)
+
+    # (part a, part b, shift) -> set of window positions in part a
+    diagonals = {}
+    for a, b in _candidate_pairs(hashes, owners, max_occurrences):
+        pa, pb = int(owners[a]), int(owners[b])
+        ia, ib = int(positions[a]), int(positions[b])
+        if not np.array_equal(
+            tokens_by_part[pa][ia : ia + n], tokens_by_part[pb][ib : ib + n]
+        ):
+            continue  # hash collision
+        if pa > pb:
+            pa, pb, ia, ib = pb, pa, ib, ia
+        diagonals.setdefault((pa, pb, ib - ia), set()).add(ia)
+
+    entries = []
+    for (pa, pb, shift), windows in diagonals.items():
+        run = sorted(windows)
+        start = prev = run[0]
+        for w in run[1:] + [None]:
+            if w is not None and w == prev + 1:
+                prev = w
+                continue
+            length = prev - start + n + 1  # notes covered by the chained windows
+            if length >= min_notes:
+                entry = _describe(index, lines, pa, pb, start, start + shift, length)
+                if include_doublings or entry["delay"] != 0:
+                    entries.append(entry)
+            if w is not None:
+                start = prev = w
+
+    entries.sort(key=lambda e: (e["leader_onset"], e["delay"], e["follower"]))
+    return entries
+
+
+def _describe(index, lines, pa, pb, ia, ib, length):
+    onsets_a, midi_a, bars_a = lines[pa]
+    onsets_b, midi_b, bars_b = lines[pb]
+    if onsets_b[ib] < onsets_a[ia]:
+        pa, pb, ia, ib = pb, pa, ib, ia
+        onsets_a, midi_a, bars_a, onsets_b, midi_b, bars_b = (
+            onsets_b,
+            midi_b,
+            bars_b,
+            onsets_a,
+            midi_a,
+            bars_a,
+        )
+    names = index["part_names"]
+    return {
+        "leader": names[pa],
+        "follower": names[pb],
+        "leader_bar": int(bars_a[ia]),
+        "follower_bar": int(bars_b[ib]),
+        "leader_onset": float(onsets_a[ia]),
+        "delay": float(onsets_b[ib] - onsets_a[ia]),
+        "transposition": int(midi_b[ib] - midi_a[ia]),
+        "first_note": midi_to_note(int(midi_a[ia])),
+        "notes": int(length),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Detect canonic entries across the parts of a score."
+    )
+    parser.add_argument("score")
+    parser.add_argument("-n", type=int, default=6, help="n-gram length in intervals")
+    parser.add_argument(
+        "--pitch-only", action="store_true", help="ignore rhythm when matching"
+    )
+    parser.add_argument("--min-notes", type=int, default=None)
+    parser.add_argument(
+        "--doublings", action="store_true", help="also list simultaneous doublings"
+    )
+    args = parser.parse_args(argv)
+
+    index = load_score_index(args.score, cache_dir=DEFAULT_CACHE_DIR)
+    entries = detect_canons(
+        index,
+        n=args.n,
+        rhythm=not args.pitch_only,
+        min_notes=args.min_notes,
+        include_doublings=args.doublings,
+    )
+    if not entries:
+        print("❌ No canonic entries found.")
+        return
+    print(f"🔍 {len(entries)} canonic entries:")
+    for e in entries:
+        print(
+            f" - {e['leader']} (bar {e['leader_bar']}, {e['first_note']}) -> "
+            f"{e['follower']} (bar {e['follower_bar']}): delay {e['delay']:g} q, "
+            f"transposed {e['transposition']:+d}, {e['notes']} notes"
+        )
+
+
+if __name__ == "__main__":
+    main()
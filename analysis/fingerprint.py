@@ -0,0 +1,366 @@
+# === analysis/fingerprint.py ===
+# Transposition- and tempo-invariant fingerprints for finding duplicates,
+# arrangements and excerpts across the corpus.
+#
+# Every part is reduced to its top line (see analysis.canon) and turned into
+# tokens that survive transposition and a change of tempo or note values:
+# the interval to the next note, and the ratio between successive
+# inter-onset times (log2, in half steps). Token n-grams (shingles) are
+# hashed, and each overlapping chunk of CHUNK_TOKENS tokens gets a MinHash
+# signature: the fraction of equal signature entries estimates the Jaccard
+# similarity of two chunks' shingle sets. Signatures are bucketed with
+# banded locality-sensitive hashing, so only chunks that share a bucket are
+# ever compared - no pairwise pass over the corpus. A work A is "in" work B
+# by the share of A's chunks that find a match in B:
+#   duplicate  both ways above CONTAINED (MIDI/MusicXML twins, copies)
+#   excerpt    A in B but not B in A
+#   related    shared material above RELATED (arrangements, quotations)
+#
+# Layout of a fingerprint directory:
+#   manifest.json      parameters, works, parts (work id + name)
+#   signatures.npy     (chunks, NUM_HASHES) uint32 MinHash signatures
+#   chunk_part.npy     global part id of each chunk
+#   chunk_pitch.npy    MIDI pitch of the chunk's first note (transposition)
+#   chunk_bar.npy      measure number where the chunk starts
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analysis.canon import part_lines, rolling_hashes
+from analysis.note_index import DEFAULT_CACHE_DIR, list_score_files, load_note_index
+
+DEFAULT_FINGERPRINT_DIR = os.path.join("data", "cache", "fingerprints")
+FINGERPRINT_EXTENSIONS = (".musicxml", ".xml", ".mxl", ".mid", ".midi")
+SHINGLE = 4  # tokens per shingle
+CHUNK_TOKENS = 32  # tokens per fingerprinted chunk
+CHUNK_HOP = 8  # worst-case misalignment of an excerpt is 4 tokens
+MIN_CHUNK_TOKENS = 12  # shorter lines get no chunk
+NUM_HASHES = 64
+BANDS = 16  # LSH bands of NUM_HASHES // BANDS rows
+MATCH_SIMILARITY = 0.5  # estimated Jaccard for two chunks to match
+MAX_BUCKET = 256  # larger buckets (stock figures) are not paired
+CONTAINED = 0.7
+RELATED = 0.2
+INTERVAL_CLIP = 24
+RATIO_CLIP = 6
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+_SEEDS = np.random.default_rng(2025).integers(0, 2**63, NUM_HASHES, dtype=np.uint64)
+
+
+def invariant_tokens(onsets, midi):
+    """
+    Token i describes the step from note i + 1 to note i + 2: the interval
+    (clipped to two octaves) and the ratio of the inter-onset time to the
+    previous one (log2 in half steps, clipped), so transposing the line or
+    scaling all its durations leaves the tokens unchanged.
+    """
+    if len(midi) < 3:
+        return np.empty(0, dtype=np.uint64)
+    intervals = (
+        np.clip(np.diff(midi)[1:], -INTERVAL_CLIP, INTERVAL_CLIP) + INTERVAL_CLIP
+    )
+    ioi = np.maximum(np.diff(onsets), 1e-3)
+    ratios = (
+        np.clip(np.rint(2 * np.log2(ioi[1:] / ioi[:-1])), -RATIO_CLIP, RATIO_CLIP)
+        + RATIO_CLIP
+    )
+    return (
+        intervals.astype(np.uint64) * np.uint64(2 * RATIO_CLIP + 1)
+        + ratios.astype(np.uint64)
+        + np.uint64(1)
+    )
+
+
+def _mix(x):
+    """splitmix64 finalizer, elementwise on uint64 arrays."""
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return (x ^ (x >> np.uint64(31))) & _MASK64
+
+
+def line_chunks(onsets, midi, bars):
+    """
+    MinHash signatures of the overlapping chunks of one line.
+
+    Returns:
+        (signatures (chunks, NUM_HASHES) uint32, first pitch, start bar)
+    """
+    tokens = invariant_tokens(onsets, midi)
+    if len(tokens) < MIN_CHUNK_TOKENS:
+        return (
+            np.empty((0, NUM_HASHES), dtype=np.uint32),
+            np.empty(0, np.int16),
+            np.empty(0, np.int32),
+        )
+    shingles = rolling_hashes(tokens, SHINGLE)
+    per_chunk = CHUNK_TOKENS - SHINGLE + 1
+    if len(shingles) <= per_chunk:
+        starts = np.array([0])
+        width = len(shingles)
+    else:
+        starts = np.arange(0, len(shingles) - per_chunk + 1, CHUNK_HOP)
+        if starts[-1] != len(shingles) - per_chunk:  # keep the tail covered
+            starts = np.append(starts, len(shingles) - per_chunk)
+        width = per_chunk
+
+    mixed = _mix(shingles[None, :] ^ _SEEDS[:, None])  # (hashes, shingles)
+    windows = np.lib.stride_tricks.sliding_window_view(mixed, width, axis=1)[:, starts]
+    signatures = (windows.min(axis=2).T >> np.uint64(32)).astype(np.uint32)
+    # Token i starts at note i + 1
+    return (
+        signatures,
+        midi[starts + 1].astype(np.int16),
+        bars[starts + 1].astype(np.int32),
+    )
+
+
+def _work_chunks(args):
+    path, cache_dir = args
+    try:
+        index = load_note_index(path, cache_dir=cache_dir)
+    except Exception as e:
+        print(f"[ERROR] Skipping {path}: {e}")
+        return path, None, None
+    return (
+        path,
+        index["part_names"],
+        {p: line_chunks(*line) for p, line in part_lines(index).items()},
+    )
+
+
+def build_fingerprints(
+    folder="data/xml/",
+    out_dir=DEFAULT_FINGERPRINT_DIR,
+    workers=None,
+    cache_dir=DEFAULT_CACHE_DIR,
+    extensions=FINGERPRINT_EXTENSIONS,
+):
+    """
+    Fingerprint every score in `folder` (MusicXML, compressed MusicXML and
+    MIDI; note indexes loaded or built in parallel) and write them to out_dir.
+    """
+    jobs = [(p, cache_dir) for p in list_score_files(folder, extensions)]
+    if workers == 1:
+        loaded = list(map(_work_chunks, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            loaded = list(pool.map(_work_chunks, jobs))
+
+    works, parts = [], []
+    signatures, chunk_part, chunk_pitch, chunk_bar = [], [], [], []
+    for path, part_names, chunks in loaded:
+        if chunks is None:
+            continue
+        work_id = len(works)
+        works.append(os.path.basename(path))
+        for p, (sig, pitch, bar) in chunks.items():
+            part_id = len(parts)
+            parts.append({"work": work_id, "name": part_names[p]})
+            signatures.append(sig)
+            chunk_part.append(np.full(len(sig), part_id, dtype=np.int32))
+            chunk_pitch.append(pitch)
+            chunk_bar.append(bar)
+
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {
+        "signatures": (signatures, np.uint32, (0, NUM_HASHES)),
+        "chunk_part": (chunk_part, np.int32, 0),
+        "chunk_pitch": (chunk_pitch, np.int16, 0),
+        "chunk_bar": (chunk_bar, np.int32, 0),
+    }
+    for name, (chunks, dtype, empty) in arrays.items():
+        data = (
+            np.concatenate(chunks).astype(dtype)
+            if chunks
+            else np.empty(empty, dtype=dtype)
+        )
+        np.save(os.path.join(out_dir, f"{name}.npy"), data)
+
+    manifest = {
+        "shingle": SHINGLE,
+        "chunk_tokens": CHUNK_TOKENS,
+        "chunk_hop": CHUNK_HOP,
+        "num_hashes": NUM_HASHES,
+        "works": works,
+        "parts": parts,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    n_chunks = sum(len(s) for s in signatures)
+    print(
+        f"📁 Fingerprints ({len(works)} works, {n_chunks} chunks) saved to: {out_dir}"
+    )
+    return manifest
+
+
+def open_fingerprints(fingerprint_dir=DEFAULT_FINGERPRINT_DIR):
+    with open(os.path.join(fingerprint_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    store = {"manifest": manifest}
+    for name in ("signatures", "chunk_part", "chunk_pitch", "chunk_bar"):
+        store[name] = np.load(
+            os.path.join(fingerprint_dir, f"{name}.npy"), mmap_mode="r"
+        )
+    part_work = np.array([p["work"] for p in manifest["parts"]], dtype=np.int64)
+    store["chunk_work"] = (
+        part_work[store["chunk_part"]] if len(part_work) else np.empty(0, np.int64)
+    )
+    return store
+
+
+def lsh_pairs(
+    signatures,
+    owners,
+    bands=BANDS,
+    max_bucket=MAX_BUCKET,
+    min_similarity=MATCH_SIMILARITY,
+):
+    """
+    Chunk pairs (i, j), i < j, with different owners that share at least one
+    LSH band bucket and agree on at least min_similarity of their signature.
+    Buckets with more than max_bucket chunks are skipped.
+
+    Returns:
+        (i, j, similarity) arrays
+    """
+    n, k = signatures.shape
+    rows = k // bands
+    found = []
+    for b in range(bands):
+        band = np.ascontiguousarray(signatures[:, b * rows : (b + 1) * rows])
+        keys = band.view(np.dtype((np.void, band.dtype.itemsize * rows))).ravel()
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+        starts = np.concatenate(([0], bounds))
+        sizes = np.diff(np.concatenate((starts, [n])))
+        for s, size in zip(
+            starts[(sizes > 1) & (sizes <= max_bucket)],
+            sizes[(sizes > 1) & (sizes <= max_bucket)],
+        ):
+            group = np.sort(order[s : s + size])
+            a, c = np.triu_indices(size, 1)
+            i, j = group[a], group[c]
+            keep = owners[i] != owners[j]
+            found.append(np.stack([i[keep], j[keep]], axis=1))
+    if not found:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+    pairs = np.unique(np.concatenate(found), axis=0)
+    if len(pairs) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+    i, j = pairs[:, 0], pairs[:, 1]
+    similarity = (np.asarray(signatures[i]) == np.asarray(signatures[j])).mean(axis=1)
+    keep = similarity >= min_similarity
+    return i[keep], j[keep], similarity[keep]
+
+
+def work_relations(store, contained=CONTAINED, related=RELATED):
+    """
+    Relations between works from their matching chunks.
+
+    Returns:
+        list of dicts (work_a, work_b, a_in_b, b_in_a, transposition,
+        first_bar_b, relation) sorted by overlap - a_in_b is the share of
+        work_a's distinct chunks with a match in work_b; transposition is the
+        most common pitch shift from a to b over the matches, in semitones;
+        first_bar_b is the first bar of work_b with a match (where an
+        excerpt starts)
+    """
+    works = store["manifest"]["works"]
+    # Identical chunks within a work (ostinati, repeats) count once
+    sig = np.asarray(store["signatures"])
+    chunk_work = np.asarray(store["chunk_work"])
+    _, distinct = np.unique(
+        np.column_stack([chunk_work.astype(np.uint32), sig]), axis=0, return_index=True
+    )
+    distinct = np.sort(distinct)
+    owners = chunk_work[distinct]
+    totals = np.bincount(owners, minlength=len(works))
+
+    i, j, _ = lsh_pairs(sig[distinct], owners)
+    wa, wb = owners[i], owners[j]
+    n = len(works)
+    # a chunk counts once per other work it matches
+    covered = np.zeros((n, n))
+    for src, dst, chunk in ((wa, wb, i), (wb, wa, j)):
+        hits = np.unique(np.stack([src, dst, chunk], axis=1), axis=0)
+        np.add.at(covered, (hits[:, 0], hits[:, 1]), 1)
+    shift = (
+        np.asarray(store["chunk_pitch"])[distinct[j]].astype(np.int64)
+        - np.asarray(store["chunk_pitch"])[distinct[i]]
+    )
+    bar = np.asarray(store["chunk_bar"])
+
+    out = []
+    for a, b in zip(*np.nonzero(np.triu(covered + covered.T, 1))):
+        a_in_b, b_in_a = covered[a, b] / totals[a], covered[b, a] / totals[b]
+        if a_in_b >= contained and b_in_a >= contained:
+            relation = "duplicate"
+        elif max(a_in_b, b_in_a) >= contained:
+            relation = "excerpt"
+        elif max(a_in_b, b_in_a) >= related:
+            relation = "related"
+        else:
+            continue
+        if b_in_a > a_in_b and relation == "excerpt":  # report the excerpt first
+            a, b, a_in_b, b_in_a = b, a, b_in_a, a_in_b
+        pair = (wa == a) & (wb == b)
+        flipped = (wa == b) & (wb == a)
+        shifts = np.concatenate([shift[pair], -shift[flipped]])
+        bars = np.concatenate([bar[distinct[j[pair]]], bar[distinct[i[flipped]]]])
+        values, counts = np.unique(shifts, return_counts=True)
+        out.append(
+            {
+                "work_a": works[a],
+                "work_b": works[b],
+                "a_in_b": float(a_in_b),
+                "b_in_a": float(b_in_a),
+                "transposition": int(values[np.argmax(counts)]) if len(values) else 0,
+                "first_bar_b": int(bars.min()) if len(bars) else None,
+                "relation": relation,
+            }
+        )
+    return sorted(out, key=lambda r: -max(r["a_in_b"], r["b_in_a"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find duplicate, excerpt and related works."
+    )
+    parser.add_argument("--dir", default=DEFAULT_FINGERPRINT_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Fingerprint every score in a folder")
+    build.add_argument("folder", nargs="?", default="data/xml/")
+    build.add_argument("--workers", type=int, default=None)
+    relations = sub.add_parser("relations", help="List related works")
+    relations.add_argument("--contained", type=float, default=CONTAINED)
+    relations.add_argument("--related", type=float, default=RELATED)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_fingerprints(args.folder, args.dir, workers=args.workers)
+        return
+
+    found = work_relations(open_fingerprints(args.dir), args.contained, args.related)
+    if not found:
+        print("No related works found.")
+    icons = {"duplicate": "🟰", "excerpt": "✂️", "related": "🔗"}
+    for r in found:
+        t = f", transposed {r['transposition']:+d}" if r["transposition"] else ""
+        at = f" from bar {r['first_bar_b']}" if r["relation"] == "excerpt" else ""
+        print(
+            f"{icons[r['relation']]} {r['relation']}: {r['work_a']} ↔ {r['work_b']}{at} "
+            f"({r['a_in_b']:.0%} / {r['b_in_a']:.0%}{t})"
+        )
+
+
+if __name__ == "__main__":
+    main()
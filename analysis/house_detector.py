@@ -1,7 +1,31 @@
-from music21 import stream, note, chord, meter, tempo, expressions
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from lazy_imports import lazy_import
+from memory_utils import run_with_memory_limit
+from analysis.note_index import (
+    DEFAULT_CACHE_DIR,
+    build_note_index,
+    list_score_files,
+    load_note_index,
+    per_measure_count,
+)
+
+stream = lazy_import("music21.stream")
+note = lazy_import("music21.note")
+chord = lazy_import("music21.chord")
 
 CMINOR_TRIAD = {60, 63, 67}  # MIDI numbers for C, E♭, G
 
+PULSE_PITCH_CLASS = 7  # G
+PULSE_DURATION = 0.25
+PULSE_MIN_COUNT = 4
+
+
 def is_triadic(chord_or_notes):
     """
     Checks if all given pitches are members of the C minor triad.
@@ -10,21 +34,152 @@ def is_triadic(chord_or_notes):
     if isinstance(chord_or_notes, chord.Chord):
         pitch_set = set(p.midi for p in chord_or_notes.pitches)
     else:
-        pitch_set = set(n.pitch.midi for n in chord_or_notes if isinstance(n, note.Note))
+        pitch_set = set(
+            n.pitch.midi for n in chord_or_notes if isinstance(n, note.Note)
+        )
     return all(p in CMINOR_TRIAD for p in pitch_set)
 
+
 def is_syncopated_pulse(measure):
     """
     Heuristic: look for repeated short-duration Gs (quarter notes, offset by 0.125)
     """
-    pulse_notes = [n for n in measure.notes if n.pitch.name == 'G' and n.quarterLength == 0.25]
+    pulse_notes = [
+        n for n in measure.notes if n.pitch.name == "G" and n.quarterLength == 0.25
+    ]
     return len(pulse_notes) >= 4 and all(n.offset % 0.5 != 0.0 for n in pulse_notes)
 
+
+def house_measure_mask(index):
+    """
+    Vectorized form of is_syncopated_pulse + is_triadic over a note index.
+    Returns a boolean array with one entry per measure row.
+    """
+    notes = index["notes"]
+    single = notes["chord"] == 0
+
+    pulse = (
+        single
+        & (notes["midi"] % 12 == PULSE_PITCH_CLASS)
+        & (notes["duration"] == PULSE_DURATION)
+    )
+    on_beat = pulse & (np.mod(notes["offset"], 0.5) == 0.0)
+    off_triad = single & ~np.isin(notes["midi"], list(CMINOR_TRIAD))
+
+    return (
+        (per_measure_count(index, pulse) >= PULSE_MIN_COUNT)
+        & (per_measure_count(index, on_beat) == 0)
+        & (per_measure_count(index, off_triad) == 0)
+    )
+
+
+def detect_house_in_index(index):
+    measures = index["measures"]
+    rows = np.flatnonzero(house_measure_mask(index))
+    return [
+        (index["part_names"][measures["part"][r]], int(measures["number"][r]))
+        for r in rows
+    ]
+
+
 def detect_house_sections(score: stream.Score):
-    house_measures = []
-    for part in score.parts:
-        for measure in part.getElementsByClass(stream.Measure):
-            notes = measure.notes
-            if is_syncopated_pulse(measure) and is_triadic(notes):
-                house_measures.append((part.partName, measure.measureNumber))
-    return house_measures
+    return detect_house_in_index(build_note_index(score))
+
+
+def detect_house_sections_in_file(path, cache_dir=DEFAULT_CACHE_DIR, low_memory=False):
+    return detect_house_in_index(
+        load_note_index(path, cache_dir=cache_dir, low_memory=low_memory)
+    )
+
+
+def _scan_one(args):
+    path, cache_dir, low_memory = args
+    try:
+        return path, detect_house_sections_in_file(
+            path, cache_dir=cache_dir, low_memory=low_memory
+        )
+    except Exception as e:
+        print(f"[ERROR] Skipping {path}: {e}")
+        return path, None
+
+
+def _scan_path(path, cache_dir, low_memory):
+    return _scan_one((path, cache_dir, low_memory))[1]
+
+
+def scan_corpus(
+    folder="data/xml/",
+    workers=None,
+    cache_dir=DEFAULT_CACHE_DIR,
+    low_memory=False,
+    memory_limit=None,
+):
+    """
+    Run house detection over every MusicXML file in `folder`, one file per
+    worker process. Returns {filename: [(part name, measure number), ...]};
+    files that failed to parse map to None.
+
+    low_memory reads scores part by part instead of through music21;
+    memory_limit (MB) runs each file in its own process, prints its peak
+    RSS and only starts files while their estimated memory fits.
+    """
+    paths = list_score_files(folder)
+    if memory_limit is not None:
+        scan = partial(_scan_path, cache_dir=cache_dir, low_memory=low_memory)
+        mode = "stream" if low_memory else "music21"
+        found = {}
+        for path, hits, peak in run_with_memory_limit(
+            scan, paths, memory_limit, workers, mode=mode
+        ):
+            peak_text = f"{peak:.0f} MB" if peak is not None else "n/a"
+            print(f"[INFO] {os.path.basename(path)}: peak RSS {peak_text}")
+            found[os.path.basename(path)] = hits
+        return {os.path.basename(p): found.get(os.path.basename(p)) for p in paths}
+
+    jobs = [(p, cache_dir, low_memory) for p in paths]
+    if workers == 1:
+        results = map(_scan_one, jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_scan_one, jobs))
+    return {os.path.basename(path): hits for path, hits in results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scan a score folder for house sections."
+    )
+    parser.add_argument("folder", nargs="?", default="data/xml/")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        help="Read scores part by part instead of loading them into music21",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=float,
+        default=None,
+        metavar="MB",
+        help="Limit concurrency so running workers fit under MB; reports peak RSS",
+    )
+    args = parser.parse_args(argv)
+
+    cache_dir = None if args.no_cache else DEFAULT_CACHE_DIR
+    results = scan_corpus(
+        args.folder,
+        args.workers,
+        cache_dir,
+        low_memory=args.low_memory,
+        memory_limit=args.memory_limit,
+    )
+    for filename, hits in results.items():
+        if hits:
+            print(f"🔍 {filename}:")
+            for part, measure in hits:
+                print(f" - {part}, Measure {measure}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# === analysis/key_tracker.py ===
+# Local key and modulation tracking over a note index.
+#
+# Pitch classes are weighted by duration per bar, summed over a sliding
+# window of bars with a cumulative sum, and every window is correlated with
+# all 24 key profiles (utils.KEY_PROFILES, as in estimate_key) in a single
+# matrix product. A Viterbi pass then trades correlation against a penalty
+# per key change, which turns the noisy per-bar winners into stable key
+# regions.
+
+import argparse
+
+import numpy as np
+
+from analysis.note_index import DEFAULT_CACHE_DIR
+from analysis.score_index import find_parts, load_score_index
+from utils import KEY_PROFILES, TONIC_NAMES
+
+MODES = ("major", "minor")
+KEY_NAMES = [f"{TONIC_NAMES[t]} {m}" for m in MODES for t in range(12)]
+
+
+def _key_matrix():
+    """24 x 12 profile matrix, rows ordered as KEY_NAMES, z-scored per row."""
+    rows = []
+    for mode in MODES:
+        profile = np.asarray(KEY_PROFILES[mode])
+        for tonic in range(12):
+            rows.append(np.roll(profile, tonic))  # profile[0] lands on the tonic
+    keys = np.asarray(rows)
+    return (keys - keys.mean(axis=1, keepdims=True)) / keys.std(axis=1, keepdims=True)
+
+
+KEY_MATRIX = _key_matrix()
+
+
+def measure_profiles(index, parts=None):
+    """
+    Duration-weighted pitch-class profile per bar, summed over parts.
+
+    Parameters:
+        parts (list): part ids or a voice name (see score_index.find_parts);
+            default: every part
+
+    Returns:
+        (bar numbers, profiles array of shape (bars, 12))
+    """
+    notes = index["notes"]
+    measures = index["measures"]
+    if isinstance(parts, str):
+        parts = find_parts(index, parts)
+    mask = (
+        np.ones(len(notes["midi"]), dtype=bool)
+        if parts is None
+        else np.isin(notes["part"], parts)
+    )
+
+    bars = np.unique(measures["number"])
+    bar_of_note = np.searchsorted(bars, measures["number"][notes["measure"][mask]])
+    profiles = np.zeros((len(bars), 12))
+    np.add.at(
+        profiles, (bar_of_note, notes["midi"][mask] % 12), notes["duration"][mask]
+    )
+    return bars, profiles
+
+
+def window_profiles(profiles, window=4):
+    """
+    Sum profiles over a window of `window` bars centred on each bar, using
+    one cumulative sum (O(bars) regardless of the window size).
+    """
+    before = (window - 1) // 2
+    after = window - 1 - before
+    padded = np.concatenate([np.zeros((1, 12)), np.cumsum(profiles, axis=0)])
+    n = len(profiles)
+    lo = np.clip(np.arange(n) - before, 0, n)
+    hi = np.clip(np.arange(n) + after + 1, 0, n)
+    return padded[hi] - padded[lo]
+
+
+def key_correlations(profiles):
+    """
+    Correlation of every profile row with all 24 keys: shape (rows, 24),
+    columns ordered as KEY_NAMES. Empty rows score 0 for every key.
+    """
+    centred = profiles - profiles.mean(axis=1, keepdims=True)
+    std = profiles.std(axis=1, keepdims=True)
+    z = np.divide(centred, std, out=np.zeros_like(centred), where=std > 0)
+    return z @ KEY_MATRIX.T / 12
+
+
+def smooth_keys(scores, switch_penalty=0.2):
+    """
+    Best key path through the per-bar scores (Viterbi): maximise the summed
+    correlation minus switch_penalty for each key change.
+    Returns one key column index per bar.
+    """
+    n, k = scores.shape
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    total = scores[0].copy()
+    back = np.zeros((n, k), dtype=np.int64)
+    for i in range(1, n):
+        best_prev = int(np.argmax(total))
+        switch = total[best_prev] - switch_penalty
+        stay = total >= switch
+        back[i] = np.where(stay, np.arange(k), best_prev)
+        total = np.where(stay, total, switch) + scores[i]
+    path = np.zeros(n, dtype=np.int64)
+    path[-1] = int(np.argmax(total))
+    for i in range(n - 1, 0, -1):
+        path[i - 1] = back[i, path[i]]
+    return path
+
+
+def key_regions(bars, path):
+    """Collapse a per-bar key path into [{start_bar, end_bar, key}]."""
+    regions = []
+    for bar, state in zip(bars.tolist(), path.tolist()):
+        if regions and regions[-1]["key"] == KEY_NAMES[state]:
+            regions[-1]["end_bar"] = bar
+        else:
+            regions.append({"start_bar": bar, "end_bar": bar, "key": KEY_NAMES[state]})
+    return regions
+
+
+def track_keys(index, window=4, switch_penalty=0.2, parts=None):
+    """
+    Local keys of a score.
+
+    Returns:
+        dict with bars (numbers), keys (smoothed key name per bar), raw_keys
+        (best key per window before smoothing), scores (bars x 24) and
+        regions (see key_regions)
+    """
+    bars, profiles = measure_profiles(index, parts)
+    scores = key_correlations(window_profiles(profiles, window))
+    path = smooth_keys(scores, switch_penalty)
+    return {
+        "bars": bars,
+        "keys": [KEY_NAMES[s] for s in path],
+        "raw_keys": [KEY_NAMES[s] for s in np.argmax(scores, axis=1)],
+        "scores": scores,
+        "regions": key_regions(bars, path),
+    }
+
+
+def key_at(tracked, bar):
+    """Smoothed key name at a bar number (the nearest earlier bar if absent)."""
+    i = int(np.searchsorted(tracked["bars"], bar, side="right")) - 1
+    return tracked["keys"][max(i, 0)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Track local keys and modulations through a score."
+    )
+    parser.add_argument("score")
+    parser.add_argument(
+        "-w", "--window", type=int, default=4, help="window length in bars"
+    )
+    parser.add_argument(
+        "-p", "--penalty", type=float, default=0.2, help="cost of a key change"
+    )
+    parser.add_argument("--parts", help="only use parts matching this name")
+    args = parser.parse_args(argv)
+
+    index = load_score_index(args.score, cache_dir=DEFAULT_CACHE_DIR)
+    tracked = track_keys(index, args.window, args.penalty, args.parts)
+    print(f"🔑 {len(tracked['regions'])} key regions:")
+    for r in tracked["regions"]:
+        print(f" - bars {r['start_bar']}-{r['end_bar']}: {r['key']}")
+
+
+if __name__ == "__main__":
+    main()
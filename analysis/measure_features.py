@@ -0,0 +1,379 @@
+# === analysis/measure_features.py ===
+# Per-measure feature time series for the whole corpus.
+#
+# StyleFinder rows describe a whole work. Here every measure gets a feature
+# row, twice: once per part (a part's own trajectory) and once per work
+# (all parts together, one row per measure number). The rows of all works
+# are concatenated into float32 matrices saved as .npy and opened with
+# mmap_mode="r"; an offset index gives each work's (and part's) slice, so a
+# trajectory is a pair of array lookups and corpus-wide queries are plain
+# vectorized operations over the memory-mapped columns.
+#
+# Layout of a feature directory:
+#   manifest.json        features, works (name, part names), rows per level
+#   work_features.npy    (rows, features) float32, one row per work measure
+#   work_measure.npy     measure number per row
+#   work_offset.npy      quarter-note offset of the measure in its work
+#   work_index.npy       row offsets: work w is rows [work_index[w], work_index[w + 1])
+#   part_features.npy / part_measure.npy / part_offset.npy   same per part
+#   part_index.npy       row offsets per global part id
+#   part_work.npy        work id of each global part
+
+import argparse
+import json
+import numbers
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analysis.note_index import DEFAULT_CACHE_DIR, list_score_files, load_note_index
+
+DEFAULT_FEATURES_DIR = os.path.join("data", "cache", "measure_features")
+FEATURES = [
+    "notes",  # sounding pitches starting in the measure
+    "density",  # notes per quarter note
+    "pitch_mean",
+    "pitch_min",
+    "pitch_max",
+    "pitch_range",
+    "avg_interval",  # mean |step| between the top notes of successive onsets
+    "avg_duration",
+    "chord_share",  # share of notes that belong to a chord
+    "pitch_classes",  # distinct pitch classes
+    "active_parts",  # parts with notes in the measure (1 at part level)
+]
+
+
+def _group_features(group, n_groups, length, onset, midi, duration, chord, part):
+    """
+    Feature matrix (n_groups, len(FEATURES)) for notes assigned to groups.
+    `onset` only needs to order notes within a group.
+    """
+    out = np.zeros((n_groups, len(FEATURES)), dtype=np.float32)
+    if n_groups == 0:
+        return out
+    col = {name: i for i, name in enumerate(FEATURES)}
+    midi = midi.astype(np.float64)
+    count = np.bincount(group, minlength=n_groups).astype(np.float64)
+    has = count > 0
+    safe = np.where(has, count, 1.0)
+
+    out[:, col["notes"]] = count
+    out[:, col["density"]] = np.divide(
+        count, length, out=np.zeros(n_groups), where=length > 0
+    )
+    out[:, col["pitch_mean"]] = (
+        np.bincount(group, weights=midi, minlength=n_groups) / safe
+    )
+    lo = np.full(n_groups, np.inf)
+    hi = np.full(n_groups, -np.inf)
+    np.minimum.at(lo, group, midi)
+    np.maximum.at(hi, group, midi)
+    out[:, col["pitch_min"]] = np.where(has, lo, 0)
+    out[:, col["pitch_max"]] = np.where(has, hi, 0)
+    out[:, col["pitch_range"]] = np.where(has, hi - lo, 0)
+    out[:, col["avg_duration"]] = (
+        np.bincount(group, weights=duration, minlength=n_groups) / safe
+    )
+    out[:, col["chord_share"]] = (
+        np.bincount(group, weights=chord, minlength=n_groups) / safe
+    )
+
+    pcs = np.unique(group.astype(np.int64) * 12 + midi.astype(np.int64) % 12)
+    out[:, col["pitch_classes"]] = np.bincount(pcs // 12, minlength=n_groups)
+    n_parts = int(part.max()) + 1 if len(part) else 1
+    active = np.unique(group.astype(np.int64) * n_parts + part)
+    out[:, col["active_parts"]] = np.bincount(active // n_parts, minlength=n_groups)
+
+    # Top note of each onset, then steps between successive onsets in a group
+    order = np.lexsort((midi, onset, group))
+    g, o, m = group[order], onset[order], midi[order]
+    last_of_onset = np.append((g[1:] != g[:-1]) | (o[1:] != o[:-1]), True)
+    g, m = g[last_of_onset], m[last_of_onset]
+    same = g[1:] == g[:-1]
+    steps = np.abs(np.diff(m))[same]
+    step_group = g[1:][same]
+    n_steps = np.bincount(step_group, minlength=n_groups)
+    out[:, col["avg_interval"]] = np.divide(
+        np.bincount(step_group, weights=steps, minlength=n_groups),
+        n_steps,
+        out=np.zeros(n_groups),
+        where=n_steps > 0,
+    )
+    return out
+
+
+def measure_features(index):
+    """
+    Feature time series of one note index.
+
+    Returns:
+        dict with
+            part: (part ids, measure numbers, offsets, features) - one row per
+                part measure, in index order (part by part)
+            work: (measure numbers, offsets, features) - one row per distinct
+                measure number, all parts together
+    """
+    notes, measures = index["notes"], index["measures"]
+    m_row = notes["measure"].astype(np.int64)
+    onset = measures["offset"][m_row] + notes["offset"]
+    args = (
+        notes["midi"],
+        notes["duration"],
+        notes["chord"].astype(np.float64),
+        notes["part"].astype(np.int64),
+    )
+
+    n_rows = len(measures["number"])
+    part_feats = _group_features(m_row, n_rows, measures["length"], onset, *args)
+
+    numbers, bar_of_row = np.unique(measures["number"], return_inverse=True)
+    bar_length = np.zeros(len(numbers))
+    np.maximum.at(bar_length, bar_of_row, measures["length"])
+    bar_offset = np.full(len(numbers), np.inf)
+    np.minimum.at(bar_offset, bar_of_row, measures["offset"])
+    work_feats = _group_features(
+        bar_of_row[m_row], len(numbers), bar_length, onset, *args
+    )
+
+    return {
+        "part": (measures["part"], measures["number"], measures["offset"], part_feats),
+        "work": (numbers, bar_offset, work_feats),
+    }
+
+
+def _work_series(args):
+    path, cache_dir = args
+    try:
+        index = load_note_index(path, cache_dir=cache_dir)
+    except Exception as e:
+        print(f"[ERROR] Skipping {path}: {e}")
+        return path, None, None
+    return path, index["part_names"], measure_features(index)
+
+
+def build_measure_features(
+    folder="data/xml/",
+    out_dir=DEFAULT_FEATURES_DIR,
+    workers=None,
+    cache_dir=DEFAULT_CACHE_DIR,
+):
+    """
+    Compute the per-measure series of every score in `folder` (note indexes
+    loaded or built in parallel) and write them to out_dir.
+    """
+    jobs = [(p, cache_dir) for p in list_score_files(folder)]
+    if workers == 1:
+        loaded = list(map(_work_series, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            loaded = list(pool.map(_work_series, jobs))
+
+    works = []
+    cols = {
+        k: []
+        for k in (
+            "work_features",
+            "work_measure",
+            "work_offset",
+            "part_features",
+            "part_measure",
+            "part_offset",
+        )
+    }
+    work_index, part_index, part_work = [0], [0], []
+    for path, part_names, series in loaded:
+        if series is None:
+            continue
+        work_id = len(works)
+        works.append({"name": os.path.basename(path), "parts": part_names})
+
+        numbers, offsets, feats = series["work"]
+        cols["work_features"].append(feats)
+        cols["work_measure"].append(numbers)
+        cols["work_offset"].append(offsets)
+        work_index.append(work_index[-1] + len(numbers))
+
+        parts, numbers, offsets, feats = series["part"]
+        # Rows are grouped part by part; split them at the part boundaries
+        for p in range(len(part_names)):
+            rows = np.flatnonzero(parts == p)
+            cols["part_features"].append(feats[rows])
+            cols["part_measure"].append(numbers[rows])
+            cols["part_offset"].append(offsets[rows])
+            part_index.append(part_index[-1] + len(rows))
+            part_work.append(work_id)
+
+    os.makedirs(out_dir, exist_ok=True)
+    dtypes = {"features": np.float32, "measure": np.int32, "offset": np.float64}
+    for name, chunks in cols.items():
+        dtype = dtypes[name.split("_", 1)[1]]
+        empty = np.empty(
+            (0, len(FEATURES)) if name.endswith("features") else 0, dtype=dtype
+        )
+        data = np.concatenate(chunks).astype(dtype) if chunks else empty
+        np.save(os.path.join(out_dir, f"{name}.npy"), data)
+    np.save(
+        os.path.join(out_dir, "work_index.npy"), np.asarray(work_index, dtype=np.int64)
+    )
+    np.save(
+        os.path.join(out_dir, "part_index.npy"), np.asarray(part_index, dtype=np.int64)
+    )
+    np.save(
+        os.path.join(out_dir, "part_work.npy"), np.asarray(part_work, dtype=np.int32)
+    )
+
+    manifest = {
+        "features": FEATURES,
+        "works": works,
+        "work_rows": work_index[-1],
+        "part_rows": part_index[-1],
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    print(
+        f"📁 Measure features ({len(works)} works, {work_index[-1]} measures, "
+        f"{part_index[-1]} part measures) saved to: {out_dir}"
+    )
+    return manifest
+
+
+def open_measure_features(features_dir=DEFAULT_FEATURES_DIR):
+    """Open a built feature store with every array memory-mapped read-only."""
+    with open(os.path.join(features_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    store = {"manifest": manifest}
+    for level in ("work", "part"):
+        for name in ("features", "measure", "offset", "index"):
+            store[f"{level}_{name}"] = np.load(
+                os.path.join(features_dir, f"{level}_{name}.npy"), mmap_mode="r"
+            )
+    store["part_work"] = np.load(
+        os.path.join(features_dir, "part_work.npy"), mmap_mode="r"
+    )
+    return store
+
+
+def find_work(store, name):
+    """Work id by exact file name, else by case-insensitive substring."""
+    works = [w["name"] for w in store["manifest"]["works"]]
+    if name in works:
+        return works.index(name)
+    matches = [i for i, w in enumerate(works) if name.lower() in w.lower()]
+    if len(matches) != 1:
+        raise ValueError(f"'{name}' matches {len(matches)} works.")
+    return matches[0]
+
+
+def work_series(store, work, part=None):
+    """
+    One work's trajectory (slices of the memory-mapped arrays, no copy).
+
+    Parameters:
+        work (int or str): work id or name (see find_work)
+        part (int or str): part number within the work, or a part-name
+            substring; default: all parts together
+
+    Returns:
+        dict with measure (numbers), offset and features (rows x FEATURES)
+    """
+    n_works = len(store["manifest"]["works"])
+    w = int(work) if isinstance(work, numbers.Integral) else find_work(store, work)
+    if not 0 <= w < n_works:
+        raise ValueError(f"Work id {w} out of range ({n_works} works).")
+    if part is None:
+        lo, hi = store["work_index"][w], store["work_index"][w + 1]
+        level = "work"
+    else:
+        names = store["manifest"]["works"][w]["parts"]
+        if not isinstance(part, numbers.Integral):
+            matches = [
+                i for i, n in enumerate(names) if part.lower() in (n or "").lower()
+            ]
+            if not matches:
+                raise ValueError(f"No part matching '{part}' in {names}.")
+            part = matches[0]
+        if not 0 <= part < len(names):
+            raise ValueError(f"Part {part} out of range; work has parts {names}.")
+        part = int(part)
+        first = int(np.searchsorted(store["part_work"], w))
+        lo, hi = (
+            store["part_index"][first + part],
+            store["part_index"][first + part + 1],
+        )
+        level = "part"
+    return {
+        "measure": store[f"{level}_measure"][lo:hi],
+        "offset": store[f"{level}_offset"][lo:hi],
+        "features": store[f"{level}_features"][lo:hi],
+    }
+
+
+def top_measures(store, feature, n=10, level="work"):
+    """
+    The n corpus rows with the highest value of a feature, as
+    (work name, measure number, value), highest first.
+    """
+    col = store["manifest"]["features"].index(feature)
+    values = store[f"{level}_features"][:, col]
+    n = min(n, len(values))
+    if n == 0:
+        return []
+    rows = np.argpartition(-values, n - 1)[:n]
+    rows = rows[np.argsort(-values[rows], kind="stable")]
+    if level == "work":
+        work_of_row = np.searchsorted(store["work_index"], rows, side="right") - 1
+    else:
+        part_of_row = np.searchsorted(store["part_index"], rows, side="right") - 1
+        work_of_row = store["part_work"][part_of_row]
+    works = store["manifest"]["works"]
+    return [
+        (works[int(w)]["name"], int(store[f"{level}_measure"][r]), float(values[r]))
+        for w, r in zip(work_of_row, rows)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Per-measure feature time series of the corpus."
+    )
+    parser.add_argument("--dir", default=DEFAULT_FEATURES_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser(
+        "build", help="Compute the series for every score in a folder"
+    )
+    build.add_argument("folder", nargs="?", default="data/xml/")
+    build.add_argument("--workers", type=int, default=None)
+    show = sub.add_parser("show", help="Print one work's trajectory of a feature")
+    show.add_argument("work")
+    show.add_argument("-f", "--feature", default="density", choices=FEATURES)
+    show.add_argument("--part", help="part name instead of all parts")
+    top = sub.add_parser("top", help="Measures with the highest value of a feature")
+    top.add_argument("-f", "--feature", default="density", choices=FEATURES)
+    top.add_argument("-n", type=int, default=10)
+    top.add_argument("--parts", action="store_true", help="rank part measures")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_measure_features(args.folder, args.dir, workers=args.workers)
+        return
+
+    store = open_measure_features(args.dir)
+    col = FEATURES.index(args.feature)
+    if args.command == "show":
+        series = work_series(store, args.work, args.part)
+        values = series["features"][:, col]
+        scale = values.max() if len(values) and values.max() > 0 else 1.0
+        print(f"📈 {args.feature} by measure:")
+        for bar, value in zip(series["measure"], values):
+            print(f" {int(bar):4d} {value:8.2f} {'█' * int(round(30 * value / scale))}")
+    else:
+        level = "part" if args.parts else "work"
+        print(f"🔝 Highest {args.feature}:")
+        for work, bar, value in top_measures(store, args.feature, args.n, level):
+            print(f" - {work} | bar {bar}: {value:.2f}")
+
+
+if __name__ == "__main__":
+    main()
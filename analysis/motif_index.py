@@ -0,0 +1,268 @@
+# === analysis/motif_index.py ===
+# Corpus-wide inverted index from melodic n-grams to where they occur.
+#
+# Every part of every score is reduced to its top line (see analysis.canon).
+# The lines are concatenated into flat arrays, and each window of n intervals
+# is hashed twice: once on intervals only (rhythm-agnostic) and once on
+# intervals + inter-onset times. Each hash table is stored sorted next to
+# the line position it came from, so a query is a binary search plus a
+# vectorized check of the candidates. All arrays are .npy files opened with
+# mmap_mode="r", so queries touch only the pages they need.
+#
+# Layout of an index directory:
+#   manifest.json          n, works, parts (work id + part name per part)
+#   line_midi.npy          MIDI pitch per line note
+#   line_onset.npy         onset in quarters from the start of the work
+#   line_measure.npy       measure number
+#   line_part.npy          global part id
+#   keys_pitch.npy / pos_pitch.npy     sorted interval hashes -> line position
+#   keys_rhythm.npy / pos_rhythm.npy   sorted interval+rhythm hashes -> position
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analysis.canon import line_tokens, part_lines, rolling_hashes
+from analysis.note_index import DEFAULT_CACHE_DIR, list_score_files, load_note_index
+from utils import midi_to_note, note_to_midi
+
+DEFAULT_INDEX_DIR = os.path.join("data", "cache", "motif_index")
+DEFAULT_N = 4
+
+
+def _work_lines(args):
+    path, cache_dir = args
+    try:
+        index = load_note_index(path, cache_dir=cache_dir)
+    except Exception as e:
+        print(f"[ERROR] Skipping {path}: {e}")
+        return path, None, None
+    lines = part_lines(index)
+    return path, index["part_names"], lines
+
+
+def build_motif_index(
+    folder="data/xml/",
+    out_dir=DEFAULT_INDEX_DIR,
+    n=DEFAULT_N,
+    workers=None,
+    cache_dir=DEFAULT_CACHE_DIR,
+):
+    """
+    Build the motif index for every score in `folder` and write it to out_dir.
+    Note indexes are loaded (or built) in parallel, one file per worker.
+    """
+    jobs = [(p, cache_dir) for p in list_score_files(folder)]
+    if workers == 1:
+        loaded = list(map(_work_lines, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            loaded = list(pool.map(_work_lines, jobs))
+
+    works, parts = [], []
+    midi, onset, measure, part_col = [], [], [], []
+    keys = {"pitch": [], "rhythm": []}
+    positions = {"pitch": [], "rhythm": []}
+    cursor = 0
+
+    for path, part_names, lines in loaded:
+        if lines is None:
+            continue
+        work_id = len(works)
+        works.append(os.path.basename(path))
+        for p, (l_onset, l_midi, l_bars) in lines.items():
+            part_id = len(parts)
+            parts.append({"work": work_id, "name": part_names[p]})
+            midi.append(l_midi.astype(np.int16))
+            onset.append(l_onset)
+            measure.append(l_bars.astype(np.int32))
+            part_col.append(np.full(len(l_midi), part_id, dtype=np.int32))
+            for mode, rhythm in (("pitch", False), ("rhythm", True)):
+                h = rolling_hashes(line_tokens(l_onset, l_midi, rhythm), n)
+                keys[mode].append(h)
+                positions[mode].append(cursor + np.arange(len(h), dtype=np.int64))
+            cursor += len(l_midi)
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    def concat(chunks, dtype):
+        return (
+            np.concatenate(chunks).astype(dtype) if chunks else np.empty(0, dtype=dtype)
+        )
+
+    np.save(os.path.join(out_dir, "line_midi.npy"), concat(midi, np.int16))
+    np.save(os.path.join(out_dir, "line_onset.npy"), concat(onset, np.float64))
+    np.save(os.path.join(out_dir, "line_measure.npy"), concat(measure, np.int32))
+    np.save(os.path.join(out_dir, "line_part.npy"), concat(part_col, np.int32))
+    for mode in ("pitch", "rhythm"):
+        k = concat(keys[mode], np.uint64)
+        pos = concat(positions[mode], np.int64)
+        order = np.argsort(k, kind="stable")
+        np.save(os.path.join(out_dir, f"keys_{mode}.npy"), k[order])
+        np.save(os.path.join(out_dir, f"pos_{mode}.npy"), pos[order])
+
+    manifest = {"n": n, "works": works, "parts": parts, "notes": cursor}
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    print(
+        f"📁 Motif index ({len(works)} works, {cursor} line notes) saved to: {out_dir}"
+    )
+    return manifest
+
+
+def open_motif_index(index_dir=DEFAULT_INDEX_DIR):
+    """
+    Open a built index with every array memory-mapped read-only.
+    """
+    with open(os.path.join(index_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    arrays = {}
+    for name in (
+        "line_midi",
+        "line_onset",
+        "line_measure",
+        "line_part",
+        "keys_pitch",
+        "pos_pitch",
+        "keys_rhythm",
+        "pos_rhythm",
+    ):
+        arrays[name] = np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+    return {"manifest": manifest, **arrays}
+
+
+def _query_arrays(notes, durations=None):
+    midi = np.array(
+        [note_to_midi(n) if isinstance(n, str) else int(n) for n in notes],
+        dtype=np.int64,
+    )
+    if durations is None:
+        durations = [1.0] * len(midi)
+    onsets = np.concatenate(([0.0], np.cumsum(np.asarray(durations, dtype=float))[:-1]))
+    return midi, onsets
+
+
+def search_motif(
+    index, notes, durations=None, transpose=True, rhythm=False, limit=None
+):
+    """
+    Find every occurrence of a melodic figure.
+
+    Parameters:
+        index: opened motif index (open_motif_index)
+        notes (list): note names ("D5") or MIDI numbers
+        durations (list): note lengths in quarters; only used when rhythm=True
+        transpose (bool): match at any transposition (False: exact pitches)
+        rhythm (bool): also require the same inter-onset rhythm
+        limit (int): stop after this many hits
+
+    Returns:
+        list of dicts: work, part, measure, onset, transposition, first_note
+    """
+    n = index["manifest"]["n"]
+    midi, onsets = _query_arrays(notes, durations)
+    if len(midi) < n + 1:
+        raise ValueError(
+            f"Query needs at least {n + 1} notes (index built with n={n})."
+        )
+
+    mode = "rhythm" if rhythm else "pitch"
+    tokens = line_tokens(onsets, midi, rhythm)
+    key = rolling_hashes(tokens[:n], n)[0]
+    keys = index[f"keys_{mode}"]
+    lo = np.searchsorted(keys, key, side="left")
+    hi = np.searchsorted(keys, key, side="right")
+    starts = np.asarray(index[f"pos_{mode}"][lo:hi])
+    if not len(starts):
+        return []
+
+    # Verify the whole query (not just the first n-gram) against the lines
+    span = np.arange(len(midi))
+    rows = starts[:, None] + span[None, :]
+    valid = rows[:, -1] < len(index["line_midi"])
+    starts, rows = starts[valid], rows[valid]
+    line_midi = np.asarray(index["line_midi"][rows], dtype=np.int64)
+    line_part = np.asarray(index["line_part"][rows])
+    ok = (line_part == line_part[:, :1]).all(axis=1)
+    ok &= (np.diff(line_midi, axis=1) == np.diff(midi)[None, :]).all(axis=1)
+    if not transpose:
+        ok &= line_midi[:, 0] == midi[0]
+    if rhythm:
+        line_onset = np.asarray(index["line_onset"][rows])
+        ok &= np.isclose(np.diff(line_onset, axis=1), np.diff(onsets)[None, :]).all(
+            axis=1
+        )
+
+    hits = []
+    works = index["manifest"]["works"]
+    parts = index["manifest"]["parts"]
+    for pos, first in zip(starts[ok], line_midi[ok, 0]):
+        part = parts[int(index["line_part"][pos])]
+        hits.append(
+            {
+                "work": works[part["work"]],
+                "part": part["name"],
+                "measure": int(index["line_measure"][pos]),
+                "onset": float(index["line_onset"][pos]),
+                "transposition": int(first - midi[0]),
+                "first_note": midi_to_note(int(first)),
+            }
+        )
+    hits.sort(key=lambda h: (h["work"], h["onset"], h["part"]))
+    return hits[:limit] if limit else hits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Melodic n-gram index over the score corpus."
+    )
+    parser.add_argument("--index", default=DEFAULT_INDEX_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index every score in a folder")
+    build.add_argument("folder", nargs="?", default="data/xml/")
+    build.add_argument(
+        "-n", type=int, default=DEFAULT_N, help="n-gram length in intervals"
+    )
+    build.add_argument("--workers", type=int, default=None)
+    search = sub.add_parser("search", help="Find a motif, e.g. 'A4 G4 F4 E4 D4'")
+    search.add_argument("notes")
+    search.add_argument(
+        "--durations", help="Space-separated quarter lengths (implies --rhythm)"
+    )
+    search.add_argument("--rhythm", action="store_true")
+    search.add_argument("--exact-pitch", action="store_true", help="no transposition")
+    search.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_motif_index(args.folder, args.index, n=args.n, workers=args.workers)
+        return
+
+    index = open_motif_index(args.index)
+    try:
+        durations = (
+            [float(d) for d in args.durations.split()] if args.durations else None
+        )
+        hits = search_motif(
+            index,
+            args.notes.split(),
+            durations=durations,
+            transpose=not args.exact_pitch,
+            rhythm=args.rhythm or durations is not None,
+            limit=args.limit,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"🔍 {len(hits)} occurrences")
+    for h in hits:
+        print(
+            f" - {h['work']} | {h['part']} | bar {h['measure']} "
+            f"(starts {h['first_note']}, {h['transposition']:+d})"
+        )
+
+
+if __name__ == "__main__":
+    main()
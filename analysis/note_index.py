@@ -0,0 +1,232 @@
+# === analysis/note_index.py ===
+# Flat, measure-indexed note arrays for fast bar-level analysis.
+#
+# A note index is a plain dict:
+#   - source: path of the score it was built from (or None)
+#   - part_names, part_instruments: one entry per part
+#   - measures: dict of arrays, one row per measure
+#       part, number, offset (from part start), length (quarter lengths)
+#   - notes: dict of arrays, one row per sounding pitch, sorted by
+#       (part, measure row, offset)
+#       part, measure (row in `measures`), offset (within the measure),
+#       duration, midi, chord (1 if the pitch belongs to a chord),
+#       tie (TIE_TYPES code: 0 untied, 1 start, 2 continue, 3 stop)
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from lazy_imports import lazy_import
+from xml_stream import iter_parts
+
+converter = lazy_import("music21.converter")
+stream = lazy_import("music21.stream")
+chord = lazy_import("music21.chord")
+
+NOTE_FIELDS = {
+    "part": np.int32,
+    "measure": np.int32,
+    "offset": np.float64,
+    "duration": np.float64,
+    "midi": np.int16,
+    "chord": np.int8,
+    "tie": np.int8,
+}
+MEASURE_FIELDS = {
+    "part": np.int32,
+    "number": np.int32,
+    "offset": np.float64,
+    "length": np.float64,
+}
+
+TIE_TYPES = {"start": 1, "continue": 2, "stop": 3}  # anything else: 0
+
+DEFAULT_CACHE_DIR = os.path.join("data", "cache", "note_index")
+# Part of the cache key: bump when the fields above change
+CACHE_VERSION = 2
+SCORE_EXTENSIONS = (".musicxml", ".xml")
+
+
+def _offset_in_measure(el, measure):
+    offset = float(el.offset)
+    site = el.activeSite
+    if site is not None and site is not measure:
+        offset += float(site.offset)  # notes inside a Voice
+    return offset
+
+
+def build_note_index(score, source=None):
+    """
+    Walk every part and measure of a music21 score once and return a note
+    index (see module header).
+    """
+    note_cols = {k: [] for k in NOTE_FIELDS}
+    measure_cols = {k: [] for k in MEASURE_FIELDS}
+    part_names, part_instruments = [], []
+
+    for p_idx, part in enumerate(score.parts):
+        part_names.append(part.partName or part.id)
+        inst = part.getInstrument(returnDefault=False)
+        part_instruments.append(inst.instrumentName if inst is not None else None)
+
+        measures = list(part.getElementsByClass(stream.Measure))
+        if measures:
+            spans = [
+                (m, m.measureNumber, float(m.offset), float(m.quarterLength))
+                for m in measures
+            ]
+        else:
+            spans = [(part, 0, 0.0, float(part.quarterLength))]
+
+        for m, number, m_offset, m_length in spans:
+            m_row = len(measure_cols["part"])
+            measure_cols["part"].append(p_idx)
+            measure_cols["number"].append(number)
+            measure_cols["offset"].append(m_offset)
+            measure_cols["length"].append(m_length)
+
+            for el in m.recurse().notes:
+                offset = _offset_in_measure(el, m)
+                duration = float(el.quarterLength)
+                is_chord = isinstance(el, chord.Chord)
+                ties = [n.tie for n in el.notes] if is_chord else [el.tie]
+                for p, tie in zip(el.pitches, ties):
+                    note_cols["part"].append(p_idx)
+                    note_cols["measure"].append(m_row)
+                    note_cols["offset"].append(offset)
+                    note_cols["duration"].append(duration)
+                    note_cols["midi"].append(p.midi)
+                    note_cols["chord"].append(1 if is_chord else 0)
+                    note_cols["tie"].append(
+                        TIE_TYPES.get(tie.type, 0) if tie is not None else 0
+                    )
+
+    notes = {k: np.asarray(v, dtype=NOTE_FIELDS[k]) for k, v in note_cols.items()}
+    order = np.lexsort((notes["midi"], notes["offset"], notes["measure"]))
+    notes = {k: v[order] for k, v in notes.items()}
+
+    return {
+        "source": source,
+        "part_names": part_names,
+        "part_instruments": part_instruments,
+        "measures": {
+            k: np.asarray(v, dtype=MEASURE_FIELDS[k]) for k, v in measure_cols.items()
+        },
+        "notes": notes,
+    }
+
+
+def build_note_index_streaming(path):
+    """
+    Same result as build_note_index(converter.parse(path)), but read one part
+    at a time with xml_stream instead of building the music21 object tree.
+    """
+    note_cols = {k: [] for k in NOTE_FIELDS}
+    measure_cols = {k: [] for k in MEASURE_FIELDS}
+    part_names, part_instruments = [], []
+
+    for p_idx, part in enumerate(iter_parts(path)):
+        part_names.append(part["name"])
+        part_instruments.append(part["instrument"])
+        first_row = len(measure_cols["part"])
+        for number, m_offset, m_length in part["measures"]:
+            measure_cols["part"].append(p_idx)
+            measure_cols["number"].append(number)
+            measure_cols["offset"].append(m_offset)
+            measure_cols["length"].append(m_length)
+        for m_row, offset, duration, midi, is_chord, tie in part["notes"]:
+            note_cols["part"].append(p_idx)
+            note_cols["measure"].append(first_row + m_row)
+            note_cols["offset"].append(offset)
+            note_cols["duration"].append(duration)
+            note_cols["midi"].append(midi)
+            note_cols["chord"].append(1 if is_chord else 0)
+            note_cols["tie"].append(TIE_TYPES.get(tie, 0))
+        del part
+
+    notes = {k: np.asarray(v, dtype=NOTE_FIELDS[k]) for k, v in note_cols.items()}
+    order = np.lexsort((notes["midi"], notes["offset"], notes["measure"]))
+    notes = {k: v[order] for k, v in notes.items()}
+
+    return {
+        "source": path,
+        "part_names": part_names,
+        "part_instruments": part_instruments,
+        "measures": {
+            k: np.asarray(v, dtype=MEASURE_FIELDS[k]) for k, v in measure_cols.items()
+        },
+        "notes": notes,
+    }
+
+
+def list_score_files(folder, extensions=SCORE_EXTENSIONS):
+    return sorted(
+        os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(extensions)
+    )
+
+
+def _cache_path(path, cache_dir):
+    st = os.stat(path)
+    key = f"{CACHE_VERSION}|{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{digest}.npz")
+
+
+def save_note_index(index, path):
+    arrays = {f"notes_{k}": v for k, v in index["notes"].items()}
+    arrays.update({f"measures_{k}": v for k, v in index["measures"].items()})
+    header = {
+        "source": index["source"],
+        "part_names": index["part_names"],
+        "part_instruments": index["part_instruments"],
+    }
+    arrays["header"] = np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)
+    np.savez(path, **arrays)
+
+
+def load_saved_note_index(path):
+    with np.load(path) as data:
+        header = json.loads(data["header"].tobytes().decode("utf-8"))
+        return {
+            "source": header["source"],
+            "part_names": header["part_names"],
+            "part_instruments": header["part_instruments"],
+            "measures": {k: data[f"measures_{k}"] for k in MEASURE_FIELDS},
+            "notes": {k: data[f"notes_{k}"] for k in NOTE_FIELDS},
+        }
+
+
+def load_note_index(path, cache_dir=DEFAULT_CACHE_DIR, low_memory=False):
+    """
+    Build (or reuse) the note index for a score file.
+
+    The index is cached as .npz under `cache_dir`, keyed on the file's path,
+    size and modification time, so only new or changed scores are parsed
+    with music21. Pass cache_dir=None to always rebuild. With low_memory,
+    files are read part by part (build_note_index_streaming) instead.
+    """
+    cached = _cache_path(path, cache_dir) if cache_dir else None
+    if cached and os.path.exists(cached):
+        try:
+            return load_saved_note_index(cached)
+        except Exception as e:
+            print(f"[WARN] Ignoring unreadable index cache {cached}: {e}")
+
+    if low_memory:
+        index = build_note_index_streaming(path)
+    else:
+        index = build_note_index(converter.parse(path), source=path)
+    if cached:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_note_index(index, cached)
+    return index
+
+
+def per_measure_count(index, mask):
+    """
+    Count rows of `mask` (a boolean array over notes) per measure row.
+    """
+    n_measures = len(index["measures"]["number"])
+    return np.bincount(index["notes"]["measure"][mask], minlength=n_measures)
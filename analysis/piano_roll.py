@@ -0,0 +1,336 @@
+# === analysis/piano_roll.py ===
+# Piano-roll export of the corpus for model training.
+#
+# Every part of every work (or every work with its parts merged) is rendered
+# to a (time steps, pitches) uint8 roll at a fixed number of steps per
+# quarter note: ONSET where a note starts, HOLD while it sounds, 0 for
+# silence. Rolls are packed back to back into shard files of at most
+# shard_steps rows (a roll never straddles two shards; one longer than a
+# shard gets a shard of its own) and described by a manifest, so a reader
+# maps one shard at a time and never holds the corpus in memory.
+#
+# A tied chain (e.g. a note tied across a barline) is one attack: its
+# continuations (tie "continue"/"stop" in the note index) are rendered as
+# HOLD, so ONSET always marks a new attack.
+#
+# Layout of a roll directory:
+#   manifest.json      resolution, pitch range, ties_merged, shards (file,
+#                      steps), items (work, part, shard, start, steps) in
+#                      corpus order
+#   roll_00000.npy     (steps, pitches) uint8, opened with mmap_mode="r"
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analysis.note_index import (
+    DEFAULT_CACHE_DIR,
+    TIE_TYPES,
+    list_score_files,
+    load_note_index,
+)
+
+DEFAULT_ROLL_DIR = os.path.join("data", "cache", "piano_roll")
+DEFAULT_RESOLUTION = 4  # steps per quarter note (sixteenths)
+DEFAULT_PITCH_RANGE = (21, 108)  # piano keys, inclusive
+DEFAULT_SHARD_STEPS = 1 << 20
+HOLD, ONSET = 1, 2
+
+
+def render_roll(
+    index,
+    resolution=DEFAULT_RESOLUTION,
+    pitch_range=DEFAULT_PITCH_RANGE,
+    merge_parts=False,
+):
+    """
+    Piano rolls of one note index.
+
+    Parameters:
+        resolution (int): time steps per quarter note
+        pitch_range (tuple): lowest and highest MIDI pitch kept (inclusive)
+        merge_parts (bool): one roll for the whole work instead of one per part
+
+    Returns:
+        list of (part number or None when merged, roll) - roll is a
+        (steps, pitches) uint8 array; tied continuations are HOLD
+    """
+    notes, measures = index["notes"], index["measures"]
+    low, high = pitch_range
+    n_parts = 1 if merge_parts else len(index["part_names"])
+    part_of_measure = (
+        np.zeros(len(measures["part"]), dtype=np.int64)
+        if merge_parts
+        else measures["part"].astype(np.int64)
+    )
+    ends = measures["offset"] + measures["length"]
+    length = np.zeros(n_parts)
+    np.maximum.at(length, part_of_measure, ends)
+    steps = np.ceil(np.round(length * resolution, 6)).astype(np.int64)
+
+    m_row = notes["measure"].astype(np.int64)
+    start = measures["offset"][m_row] + notes["offset"]
+    on = np.round(start * resolution).astype(np.int64)
+    off = np.maximum(
+        np.round((start + notes["duration"]) * resolution).astype(np.int64), on + 1
+    )
+    keep = (notes["duration"] > 0) & (notes["midi"] >= low) & (notes["midi"] <= high)
+    part = part_of_measure[m_row][keep]
+    on, off, pitch = on[keep], off[keep], notes["midi"][keep].astype(np.int64) - low
+    attack = ~np.isin(notes["tie"][keep], [TIE_TYPES["continue"], TIE_TYPES["stop"]])
+
+    rolls = []
+    for p in range(n_parts):
+        mine = part == p
+        p_on, p_pitch, p_attack = on[mine], pitch[mine], attack[mine]
+        p_off = np.minimum(off[mine], steps[p])
+        # Sounding notes via a difference array: +1 at the onset, -1 at the end
+        width = high - low + 1
+        diff = np.zeros((steps[p] + 1, width), dtype=np.int32)
+        np.add.at(diff, (p_on, p_pitch), 1)
+        np.add.at(diff, (p_off, p_pitch), -1)
+        roll = (np.cumsum(diff[:-1], axis=0) > 0).astype(np.uint8) * HOLD
+        roll[p_on[p_attack], p_pitch[p_attack]] = ONSET
+        rolls.append((None if merge_parts else p, roll))
+    return rolls
+
+
+def _work_rolls(args):
+    path, cache_dir, resolution, pitch_range, merge_parts = args
+    try:
+        index = load_note_index(path, cache_dir=cache_dir)
+    except Exception as e:
+        print(f"[ERROR] Skipping {path}: {e}")
+        return path, None, None
+    return (
+        path,
+        index["part_names"],
+        render_roll(index, resolution, pitch_range, merge_parts),
+    )
+
+
+def build_piano_rolls(
+    folder="data/xml/",
+    out_dir=DEFAULT_ROLL_DIR,
+    resolution=DEFAULT_RESOLUTION,
+    pitch_range=DEFAULT_PITCH_RANGE,
+    merge_parts=False,
+    shard_steps=DEFAULT_SHARD_STEPS,
+    workers=None,
+    cache_dir=DEFAULT_CACHE_DIR,
+):
+    """
+    Render every score in `folder` (in parallel, one file per worker) and
+    write the rolls to out_dir as shards plus manifest.json. Shards are
+    written as soon as they fill up, so only one shard's worth of rolls is
+    held at a time.
+    """
+    jobs = [
+        (p, cache_dir, resolution, tuple(pitch_range), merge_parts)
+        for p in list_score_files(folder)
+    ]
+    os.makedirs(out_dir, exist_ok=True)
+    width = pitch_range[1] - pitch_range[0] + 1
+    works, items, shards = [], [], []
+    pending, pending_steps = [], 0
+
+    def flush():
+        nonlocal pending, pending_steps
+        if not pending:
+            return
+        name = f"roll_{len(shards):05d}.npy"
+        np.save(os.path.join(out_dir, name), np.concatenate(pending))
+        shards.append({"file": name, "steps": pending_steps})
+        pending, pending_steps = [], 0
+
+    def consume(results):
+        nonlocal pending_steps
+        for path, part_names, rolls in results:
+            if rolls is None:
+                continue
+            work_id = len(works)
+            works.append(os.path.basename(path))
+            for p, roll in rolls:
+                if pending_steps and pending_steps + len(roll) > shard_steps:
+                    flush()
+                items.append(
+                    {
+                        "work": work_id,
+                        "part": None if p is None else part_names[p],
+                        "shard": len(shards),
+                        "start": pending_steps,
+                        "steps": len(roll),
+                    }
+                )
+                pending.append(roll)
+                pending_steps += len(roll)
+
+    if workers == 1:
+        consume(map(_work_rolls, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            consume(pool.map(_work_rolls, jobs))
+    flush()
+
+    for old in os.listdir(out_dir):  # shards left over from a bigger earlier build
+        if (
+            old.startswith("roll_")
+            and old.endswith(".npy")
+            and old not in {s["file"] for s in shards}
+        ):
+            os.remove(os.path.join(out_dir, old))
+
+    manifest = {
+        "resolution": resolution,
+        "pitch_low": pitch_range[0],
+        "pitch_high": pitch_range[1],
+        "pitches": width,
+        "merged_parts": merge_parts,
+        "ties_merged": True,  # tied continuations are HOLD, not ONSET
+        "works": works,
+        "shards": shards,
+        "items": items,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    total = sum(s["steps"] for s in shards)
+    print(
+        f"📁 Piano rolls ({len(items)} rolls, {total} steps x {width} pitches, "
+        f"{len(shards)} shards) saved to: {out_dir}"
+    )
+    return manifest
+
+
+def open_piano_rolls(roll_dir=DEFAULT_ROLL_DIR):
+    """Manifest of a roll directory (shards are mapped on demand by load_roll)."""
+    with open(os.path.join(roll_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["dir"] = roll_dir
+    return manifest
+
+
+def _shard(manifest, shard, cache=None):
+    if cache is not None and cache.get("id") == shard:
+        return cache["array"]
+    array = np.load(
+        os.path.join(manifest["dir"], manifest["shards"][shard]["file"]), mmap_mode="r"
+    )
+    if cache is not None:
+        cache.update(id=shard, array=array)
+    return array
+
+
+def load_roll(manifest, item):
+    """Roll of one item (index into manifest["items"]), memory-mapped."""
+    entry = manifest["items"][item]
+    return _shard(manifest, entry["shard"])[
+        entry["start"] : entry["start"] + entry["steps"]
+    ]
+
+
+def iter_batches(
+    manifest,
+    batch_size=32,
+    window=64,
+    hop=None,
+    shuffle=False,
+    seed=None,
+    drop_last=False,
+):
+    """
+    Stream (batch, window, pitches) uint8 arrays of roll windows.
+
+    Windows of `window` steps are cut every `hop` steps (default: window)
+    within each roll, never across rolls; a roll shorter than one window is
+    skipped. Shards are visited one at a time, so memory use is one shard
+    mapping plus one batch. With shuffle, the shard order and the windows
+    within each shard are shuffled.
+
+    Yields:
+        (batch, refs) - refs is a (batch, 2) int array of (item, start step)
+    """
+    hop = hop or window
+    rng = np.random.default_rng(seed)
+    by_shard = {}
+    for i, entry in enumerate(manifest["items"]):
+        starts = np.arange(0, entry["steps"] - window + 1, hop)
+        if len(starts):
+            by_shard.setdefault(entry["shard"], []).append(
+                np.column_stack([np.full(len(starts), i), starts])
+            )
+
+    shard_order = sorted(by_shard)
+    if shuffle:
+        rng.shuffle(shard_order)
+    cache = {}
+    buffer, refs = [], []
+    for shard in shard_order:
+        windows = np.concatenate(by_shard[shard])
+        if shuffle:
+            windows = windows[rng.permutation(len(windows))]
+        array = _shard(manifest, shard, cache)
+        for item, start in windows:
+            begin = manifest["items"][item]["start"] + start
+            buffer.append(array[begin : begin + window])
+            refs.append((item, start))
+            if len(buffer) == batch_size:
+                yield np.stack(buffer), np.asarray(refs)
+                buffer, refs = [], []
+    if buffer and not drop_last:
+        yield np.stack(buffer), np.asarray(refs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Piano-roll export of the corpus.")
+    parser.add_argument("--dir", default=DEFAULT_ROLL_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Render every score in a folder")
+    build.add_argument("folder", nargs="?", default="data/xml/")
+    build.add_argument(
+        "-r",
+        "--resolution",
+        type=int,
+        default=DEFAULT_RESOLUTION,
+        help="steps per quarter note",
+    )
+    build.add_argument("--low", type=int, default=DEFAULT_PITCH_RANGE[0])
+    build.add_argument("--high", type=int, default=DEFAULT_PITCH_RANGE[1])
+    build.add_argument("--merge-parts", action="store_true", help="one roll per work")
+    build.add_argument("--shard-steps", type=int, default=DEFAULT_SHARD_STEPS)
+    build.add_argument("--workers", type=int, default=None)
+    info = sub.add_parser("info", help="Summarize a built export")
+    info.add_argument("--window", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_piano_rolls(
+            args.folder,
+            args.dir,
+            args.resolution,
+            (args.low, args.high),
+            args.merge_parts,
+            args.shard_steps,
+            args.workers,
+        )
+        return
+
+    manifest = open_piano_rolls(args.dir)
+    steps = sum(s["steps"] for s in manifest["shards"])
+    windows = sum(
+        max(0, (i["steps"] - args.window) // args.window + 1) for i in manifest["items"]
+    )
+    print(
+        f"🎹 {len(manifest['items'])} rolls from {len(manifest['works'])} works, "
+        f"{steps} steps at {manifest['resolution']} per quarter, "
+        f"pitches {manifest['pitch_low']}-{manifest['pitch_high']}"
+    )
+    print(
+        f"   {len(manifest['shards'])} shards, {windows} windows of {args.window} steps"
+    )
+
+
+if __name__ == "__main__":
+    main()
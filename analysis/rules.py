@@ -0,0 +1,318 @@
+# === analysis/rules.py ===
+# Declarative voice-leading rules evaluated over the score index.
+#
+# A rule is plain data (a dict, or an entry in a JSON list):
+#
+#   {
+#       "name": "house_bass_third",
+#       "upper": {"voice": "horn", "bar": 0, "select": "last", "lookback": 2},
+#       "lower": {"voice": "piano", "bar": 1, "select": "lowest", "lookahead": 1},
+#       "intervals": ["m3", "M3"],
+#       "direction": "below",          # lower voice must be below ("any" to ignore)
+#       "bars": [9, 24, 38]            # optional; default: every bar of the upper voice
+#   }
+#
+# reads "the interval from the lowest piano note in bars N+1..N+2 up to the
+# last horn note in bars N-2..N is a minor or major third (any octave)".
+# "lookback" only applies to "last"; "lookahead" widens any selector to the
+# following bars.
+#
+# Selectors: "first", "last", "lowest", "highest". A voice name matches part
+# or instrument names like analysis.score_index.find_parts; several matching
+# parts (e.g. both piano staves) are combined into one voice.
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lazy_imports import lazy_import
+from analysis.note_index import DEFAULT_CACHE_DIR, list_score_files
+from analysis.score_index import find_parts, load_score_index
+from utils import midi_to_note
+
+pd = lazy_import("pandas")
+
+INTERVAL_SEMITONES = {
+    "P1": 0,
+    "m2": 1,
+    "M2": 2,
+    "m3": 3,
+    "M3": 4,
+    "P4": 5,
+    "A4": 6,
+    "d5": 6,
+    "P5": 7,
+    "m6": 8,
+    "M6": 9,
+    "m7": 10,
+    "M7": 11,
+}
+
+SELECTORS = ("first", "last", "lowest", "highest")
+
+HOUSE_BASS_RULE = {
+    "name": "house_bass_third",
+    "upper": {"voice": "horn", "bar": 0, "select": "last", "lookback": 2},
+    "lower": {"voice": "piano", "bar": 1, "select": "lowest", "lookahead": 1},
+    "intervals": ["m3", "M3"],
+    "direction": "below",
+}
+
+RESULT_COLUMNS = [
+    "score",
+    "rule",
+    "bar",
+    "upper_note",
+    "upper_bar",
+    "lower_note",
+    "lower_bar",
+    "semitones",
+    "passed",
+]
+
+
+def compile_rule(rule):
+    """
+    Validate a rule dict and normalise it for evaluation.
+
+    Raises:
+        ValueError for unknown selectors, intervals or directions
+    """
+    compiled = {"name": rule.get("name", "rule")}
+    for side in ("upper", "lower"):
+        spec = dict(rule[side])
+        if "voice" not in spec:
+            raise ValueError(f"Rule '{compiled['name']}': {side} needs a voice.")
+        spec.setdefault("bar", 0)
+        spec.setdefault("select", "last")
+        spec.setdefault("lookback", 0)
+        spec.setdefault("lookahead", 0)
+        if spec["select"] not in SELECTORS:
+            raise ValueError(
+                f"Rule '{compiled['name']}': unknown selector '{spec['select']}'."
+            )
+        compiled[side] = spec
+
+    allowed = set()
+    for name in rule.get("intervals", []):
+        if isinstance(name, int):
+            allowed.add(name % 12)
+        elif name in INTERVAL_SEMITONES:
+            allowed.add(INTERVAL_SEMITONES[name])
+        else:
+            raise ValueError(f"Rule '{compiled['name']}': unknown interval '{name}'.")
+    if not allowed:
+        raise ValueError(f"Rule '{compiled['name']}' has no intervals.")
+    compiled["allowed"] = np.array(sorted(allowed))
+
+    compiled["direction"] = rule.get("direction", "any")
+    if compiled["direction"] not in ("below", "any"):
+        raise ValueError(
+            f"Rule '{compiled['name']}': direction must be 'below' or 'any'."
+        )
+    compiled["bars"] = rule.get("bars")
+    return compiled
+
+
+def load_rules(path):
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    return rules if isinstance(rules, list) else [rules]
+
+
+def _bar_to_measure_rows(index, part, bars):
+    """Map an array of bar numbers to measure rows of `part` (-1 if absent)."""
+    measures = index["measures"]
+    part_rows = np.flatnonzero(measures["part"] == part)
+    numbers = measures["number"][part_rows]
+    if not len(part_rows):
+        return np.full(len(bars), -1)
+    lo, hi = numbers.min(), numbers.max()
+    dense = np.full(hi - lo + 1, -1, dtype=np.int64)
+    dense[(numbers - lo)[::-1]] = part_rows[::-1]  # first occurrence wins
+    inside = (bars >= lo) & (bars <= hi)
+    rows = np.full(len(bars), -1, dtype=np.int64)
+    rows[inside] = dense[bars[inside] - lo]
+    return rows
+
+
+def _select_voice(index, spec, bars):
+    """
+    Return note rows (one per bar, -1 where nothing qualifies) for a voice spec.
+    """
+    lookup = index["lookup"]
+    notes = index["notes"]
+    measures = index["measures"]
+    onset = measures["offset"][notes["measure"]] + notes["offset"]
+
+    best = np.full(len(bars), -1, dtype=np.int64)
+    select = spec["select"]
+
+    # Every part of the voice, in every bar of the window N+bar..N+bar+lookahead
+    for part in find_parts(index, spec["voice"]):
+        for ahead in range(spec["lookahead"] + 1):
+            target = bars + spec["bar"] + ahead
+            m_rows = _bar_to_measure_rows(index, part, target)
+            present = m_rows >= 0
+            rows = np.full(len(bars), -1, dtype=np.int64)
+
+            if select == "last":
+                here = lookup["last_note"][m_rows[present]]
+                before = lookup["last_note_before"][m_rows[present]]
+                candidate = np.where(here >= 0, here, before)
+                if spec["lookback"] is not None:
+                    found_bar = np.where(
+                        candidate >= 0,
+                        measures["number"][notes["measure"][candidate]],
+                        -1,
+                    )
+                    candidate = np.where(
+                        found_bar >= target[present] - spec["lookback"], candidate, -1
+                    )
+                rows[present] = candidate
+            elif select == "first":
+                start = lookup["note_start"][m_rows[present]]
+                end = lookup["note_end"][m_rows[present]]
+                rows[present] = np.where(end > start, start, -1)
+            else:
+                rows[present] = lookup[f"{select}_note"][m_rows[present]]
+
+            # Combine with the other parts and bars of the same voice
+            has_new = rows >= 0
+            has_old = best >= 0
+            take = has_new & ~has_old
+            both = has_new & has_old
+            if select == "lowest":
+                take |= both & (notes["midi"][rows] < notes["midi"][best])
+            elif select == "highest":
+                take |= both & (notes["midi"][rows] > notes["midi"][best])
+            elif select == "last":
+                take |= both & (onset[rows] > onset[best])
+            else:
+                take |= both & (onset[rows] < onset[best])
+            best = np.where(take, rows, best)
+
+    return best
+
+
+def evaluate_rule(index, rule, score_name=None):
+    """
+    Evaluate one rule over a score index. Returns a list of result rows
+    (dicts with RESULT_COLUMNS); empty if either voice is missing.
+    """
+    compiled = rule if "allowed" in rule else compile_rule(rule)
+    upper_parts = find_parts(index, compiled["upper"]["voice"])
+    if not upper_parts or not find_parts(index, compiled["lower"]["voice"]):
+        return []
+
+    if compiled["bars"] is not None:
+        bars = np.asarray(compiled["bars"], dtype=np.int64)
+    else:
+        measures = index["measures"]
+        bars = np.unique(
+            measures["number"][np.isin(measures["part"], upper_parts)]
+        ).astype(np.int64)
+
+    upper = _select_voice(index, compiled["upper"], bars)
+    lower = _select_voice(index, compiled["lower"], bars)
+    midi = index["notes"]["midi"].astype(np.int64)
+    measure_numbers = index["measures"]["number"][index["notes"]["measure"]]
+
+    found = (upper >= 0) & (lower >= 0)
+    semitones = np.where(found, midi[upper] - midi[lower], 0)
+    passed = found & np.isin(np.mod(semitones, 12), compiled["allowed"])
+    if compiled["direction"] == "below":
+        passed &= semitones > 0
+
+    score_name = score_name or os.path.basename(index.get("source") or "")
+    results = []
+    for i, bar in enumerate(bars.tolist()):
+        u, l = upper[i], lower[i]
+        results.append(
+            {
+                "score": score_name,
+                "rule": compiled["name"],
+                "bar": bar,
+                "upper_note": midi_to_note(int(midi[u])) if u >= 0 else None,
+                "upper_bar": int(measure_numbers[u]) if u >= 0 else None,
+                "lower_note": midi_to_note(int(midi[l])) if l >= 0 else None,
+                "lower_bar": int(measure_numbers[l]) if l >= 0 else None,
+                "semitones": int(semitones[i]) if found[i] else None,
+                "passed": bool(passed[i]),
+            }
+        )
+    return results
+
+
+def _evaluate_file(args):
+    path, rules, cache_dir = args
+    try:
+        index = load_score_index(path, cache_dir=cache_dir)
+    except Exception as e:
+        print(f"[ERROR] Skipping {path}: {e}")
+        return []
+    rows = []
+    for rule in rules:
+        rows.extend(evaluate_rule(index, rule, score_name=os.path.basename(path)))
+    return rows
+
+
+def run_rules(paths, rules, workers=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Evaluate rules over score files, one file per worker process.
+    Returns a pandas DataFrame with RESULT_COLUMNS.
+    """
+    compiled = [compile_rule(r) for r in rules]
+    jobs = [(p, compiled, cache_dir) for p in paths]
+    if workers == 1:
+        chunks = list(map(_evaluate_file, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_evaluate_file, jobs))
+    rows = [row for chunk in chunks for row in chunk]
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def run_rules_on_corpus(
+    folder="data/xml/", rules=None, workers=None, cache_dir=DEFAULT_CACHE_DIR
+):
+    return run_rules(
+        list_score_files(folder), rules or [HOUSE_BASS_RULE], workers, cache_dir
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Evaluate voice-leading rules over a score corpus."
+    )
+    parser.add_argument(
+        "paths", nargs="*", default=["data/xml/"], help="Score files or folders"
+    )
+    parser.add_argument("--rules", help="JSON file with a rule or a list of rules")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", help="Write the result table to this CSV file")
+    parser.add_argument(
+        "--failures", action="store_true", help="Only show rows that fail"
+    )
+    args = parser.parse_args(argv)
+
+    rules = load_rules(args.rules) if args.rules else [HOUSE_BASS_RULE]
+    paths = []
+    for p in args.paths:
+        paths.extend(list_score_files(p) if os.path.isdir(p) else [p])
+
+    df = run_rules(paths, rules, workers=args.workers)
+    if args.failures:
+        df = df[~df["passed"]]
+    if args.out:
+        df.to_csv(args.out, index=False)
+        print(f"📁 {len(df)} rows saved to: {args.out}")
+    else:
+        print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# === analysis/score_index.py ===
+# Constant-time lookups on top of a note index (see analysis/note_index.py):
+# parts by name or instrument, measures by number, and per-bar note queries.
+
+import numpy as np
+
+from analysis.note_index import DEFAULT_CACHE_DIR, load_note_index
+from utils import midi_to_note
+
+
+def _first_per_measure(measure_col, order, n_measures):
+    rows = np.full(n_measures, -1, dtype=np.int64)
+    sorted_measures = measure_col[order]
+    uniq, first = np.unique(sorted_measures, return_index=True)
+    rows[uniq] = order[first]
+    return rows
+
+
+def build_score_index(index):
+    """
+    Add a "lookup" table to a note index. All per-bar answers are
+    precomputed here with a few array passes, so the query functions below
+    are dictionary/array lookups.
+
+    Returns the same index dict, with index["lookup"] holding:
+        - parts_by_name / parts_by_instrument: lowercase name -> [part ids]
+        - measure_rows: (part id, measure number) -> measure row
+        - note_start, note_end: note row range of each measure row
+        - last_note: last note row of each measure (-1 if empty)
+        - last_note_before: last note row strictly before each measure in
+          the same part (-1 if none)
+        - lowest_note / highest_note: lowest- and highest-pitched note row
+          of each measure (-1 if empty)
+    """
+    notes = index["notes"]
+    measures = index["measures"]
+    n_measures = len(measures["number"])
+    measure_col = notes["measure"]
+
+    parts_by_name, parts_by_instrument = {}, {}
+    for p_idx, (name, inst) in enumerate(
+        zip(index["part_names"], index["part_instruments"])
+    ):
+        if name:
+            parts_by_name.setdefault(name.lower(), []).append(p_idx)
+        if inst:
+            parts_by_instrument.setdefault(inst.lower(), []).append(p_idx)
+
+    measure_rows = {}
+    for row, (part, number) in enumerate(
+        zip(measures["part"].tolist(), measures["number"].tolist())
+    ):
+        measure_rows.setdefault((part, number), row)
+
+    rows = np.arange(n_measures)
+    note_start = np.searchsorted(measure_col, rows, side="left")
+    note_end = np.searchsorted(measure_col, rows, side="right")
+    last_note = np.where(note_end > note_start, note_end - 1, -1)
+
+    # Carry the last note of each measure forward within its part
+    last_note_before = np.full(n_measures, -1, dtype=np.int64)
+    for part in np.unique(measures["part"]):
+        part_rows = np.flatnonzero(measures["part"] == part)
+        carried = np.maximum.accumulate(last_note[part_rows])
+        last_note_before[part_rows[1:]] = carried[:-1]
+
+    by_pitch = np.lexsort((notes["offset"], notes["midi"], measure_col))
+    lowest_note = _first_per_measure(measure_col, by_pitch, n_measures)
+    by_pitch_desc = np.lexsort(
+        (notes["offset"], -notes["midi"].astype(np.int32), measure_col)
+    )
+    highest_note = _first_per_measure(measure_col, by_pitch_desc, n_measures)
+
+    index["lookup"] = {
+        "parts_by_name": parts_by_name,
+        "parts_by_instrument": parts_by_instrument,
+        "measure_rows": measure_rows,
+        "note_start": note_start,
+        "note_end": note_end,
+        "last_note": last_note,
+        "last_note_before": last_note_before,
+        "lowest_note": lowest_note,
+        "highest_note": highest_note,
+    }
+    return index
+
+
+def load_score_index(path, cache_dir=DEFAULT_CACHE_DIR):
+    return build_score_index(load_note_index(path, cache_dir=cache_dir))
+
+
+def find_parts(index, name):
+    """
+    Return the part ids whose part name or instrument name is `name`
+    (case-insensitive). Falls back to a substring match, so "piano" finds
+    both staves of a piano and "horn" finds "French Horn (F)".
+    """
+    lookup = index["lookup"]
+    wanted = name.lower()
+    exact = lookup["parts_by_name"].get(wanted, []) + lookup["parts_by_instrument"].get(
+        wanted, []
+    )
+    if exact:
+        return sorted(set(exact))
+    found = set()
+    for table in (lookup["parts_by_name"], lookup["parts_by_instrument"]):
+        for key, ids in table.items():
+            if wanted in key:
+                found.update(ids)
+    return sorted(found)
+
+
+def find_part(index, name):
+    parts = find_parts(index, name)
+    if not parts:
+        raise ValueError(f"No part matching '{name}' in {index['part_names']}.")
+    return parts[0]
+
+
+def measure_row(index, part, number):
+    """
+    Row of measure `number` in `part`, or None if the part has no such bar.
+    """
+    return index["lookup"]["measure_rows"].get((part, number))
+
+
+def note_at(index, row):
+    """
+    Describe a note row as a dict (midi, name, part, measure, offset, duration),
+    or None for row -1.
+    """
+    if row is None or row < 0:
+        return None
+    notes = index["notes"]
+    midi = int(notes["midi"][row])
+    return {
+        "midi": midi,
+        "name": midi_to_note(midi),
+        "part": int(notes["part"][row]),
+        "measure": int(index["measures"]["number"][notes["measure"][row]]),
+        "offset": float(notes["offset"][row]),
+        "duration": float(notes["duration"][row]),
+    }
+
+
+def measure_notes(index, part, number):
+    """
+    Row range (start, end) of the notes in bar `number` of `part`.
+    """
+    row = measure_row(index, part, number)
+    if row is None:
+        return 0, 0
+    lookup = index["lookup"]
+    return int(lookup["note_start"][row]), int(lookup["note_end"][row])
+
+
+def last_note_in_bar(index, part, number):
+    row = measure_row(index, part, number)
+    return None if row is None else note_at(index, index["lookup"]["last_note"][row])
+
+
+def last_note_before_bar(index, part, number):
+    """
+    Last note of `part` that starts before bar `number` (in any earlier bar).
+    """
+    row = measure_row(index, part, number)
+    return (
+        None
+        if row is None
+        else note_at(index, index["lookup"]["last_note_before"][row])
+    )
+
+
+def lowest_note_in_bar(index, parts, number):
+    """
+    Lowest note sounding in bar `number` across one part id or a list of ids.
+    """
+    if isinstance(parts, (int, np.integer)):
+        parts = [parts]
+    best = None
+    for part in parts:
+        row = measure_row(index, part, number)
+        if row is None:
+            continue
+        n = note_at(index, index["lookup"]["lowest_note"][row])
+        if n is not None and (best is None or n["midi"] < best["midi"]):
+            best = n
+    return best
@@ -0,0 +1,417 @@
+# === harmonizer_service.py ===
+# Long-running local HTTP service around the harmonizer.
+#
+# One asyncio event loop accepts connections and parses requests; the
+# harmonization itself (structure, M-parallel, T-voice, music21 score
+# building and export) runs in a pool of worker processes that import
+# music21 once at start-up and keep their own hot caches. Melodies extracted
+# from score files are cached in the server process, keyed on path, mtime
+# and part, so repeated requests for the same file skip parsing entirely.
+#
+# Endpoints (JSON in, JSON out):
+#   GET  /health      -> {"status": "ok", "workers": n}
+#   POST /harmonize   -> melody layers, optionally MusicXML/MIDI as base64
+#
+# Request body for /harmonize:
+#   {
+#     "melody": "A4 G4 F4 E4" or ["A4", "G4", null, "E4"],
+#     "source": {"path": "data/xml/x.musicxml", "part": "Violin"},  # instead of melody
+#                                         # ("part": "auto" picks the melody line)
+#     "key": "D", "mode": "minor",        # default: detected (source) or C major
+#     "structure": ["retrograde"],        # apply_structure command, default ["none"]
+#     "axis_pitch": "D4",
+#     "m_parallel": [3, -4],              # semitone offsets
+#     "t_level": 1, "t_direction": "below",
+#     "every_other": false,               # T-voice on every other note only
+#     "voicing": false,                   # re-choose T/M-parallel octaves (voicing.py)
+#     "formats": ["musicxml", "midi"]     # optional exported files
+#   }
+#
+# Run: python harmonizer_service.py --port 8765 --workers 4
+
+import argparse
+import asyncio
+import base64
+import functools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from output_cache import DEFAULT_CACHE_DIR, OutputCache, export_bytes, job_key
+from utils import MAJOR_SCALES, MINOR_SCALES
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY = 4 * 1024 * 1024
+SOURCE_CACHE_SIZE = 64
+
+SUPPORTED_KEYS = {(k, "major") for k in MAJOR_SCALES} | {
+    (k, "minor") for k in MINOR_SCALES
+}
+# apply_structure commands that work on a melody of note names; mirror and
+# combo expect MIDI tuples and transposition is not implemented yet
+STRUCTURES = ("none", "retrograde")
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+# --- Worker side ---------------------------------------------------------
+
+_transpose_cached = None
+_output_cache = None
+
+
+def _warm_worker(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Process-pool initializer: import music21 and build the hot caches.
+    cache_dir=None turns the exported-file cache off.
+    """
+    global _transpose_cached, _output_cache
+    from melody_utils import transpose_note_by_semitones
+    import main as harmonizer  # noqa: F401  (imports the pipeline once)
+
+    _output_cache = OutputCache(cache_dir) if cache_dir else None
+
+    # Semitone transposition goes through a music21 Note per call; the same
+    # (note, interval) pairs recur constantly, so keep them in a table
+    _transpose_cached = functools.lru_cache(maxsize=8192)(transpose_note_by_semitones)
+    harmonizer.build_tintinnabuli_score(
+        ["C4"], ["G3"]
+    )  # touch music21's stream/note code paths
+
+
+def harmonize_job(job):
+    """
+    Run one harmonization (in a worker process). `job` is a validated
+    request dict with an explicit melody/rhythm/key/mode.
+    """
+    import main as harmonizer
+    from structure_utils import apply_structure
+
+    if _transpose_cached is None:
+        _warm_worker()
+
+    melody, rhythm = apply_structure(
+        job["melody"],
+        job["rhythm"],
+        tuple(job["structure"]),
+        key=job["key"],
+        mode=job["mode"],
+        axis_pitch=job.get("axis_pitch"),
+    )
+    m_parallel = [
+        [None if n is None else _transpose_cached(n, interval) for n in melody]
+        for interval in job["m_parallel"]
+    ]
+    pattern = [True, False] if job["every_other"] else None
+    t_voice = harmonizer.apply_t_voice_with_pattern(
+        melody,
+        job["key"],
+        job["mode"],
+        triad_level=job["t_level"],
+        direction=job["t_direction"],
+        bind_pattern=pattern,
+    )
+    if job["voicing"]:
+        from voicing import voice_layers
+
+        layers, directions = {"t_voice": t_voice}, {"t_voice": job["t_direction"]}
+        for i, (interval, line) in enumerate(zip(job["m_parallel"], m_parallel)):
+            layers[i] = line
+            directions[i] = "above" if interval > 0 else "below"
+        voiced = voice_layers(melody, layers, directions)
+        t_voice = voiced["t_voice"]
+        m_parallel = [voiced[i] for i in range(len(m_parallel))]
+
+    result = {
+        "key": job["key"],
+        "mode": job["mode"],
+        "melody": melody,
+        "rhythm": rhythm,
+        "t_voice": t_voice,
+        "m_parallel": m_parallel,
+    }
+    if job["formats"]:
+        # Exported files are served from the output cache when unchanged
+        cache_key = job_key({k: v for k, v in job.items() if k != "formats"})
+        files = _output_cache.read(cache_key, job["formats"]) if _output_cache else None
+        if files is None:
+            score = harmonizer.build_tintinnabuli_score(
+                melody=melody, t_voice=t_voice, key_sig=job["key"], mode=job["mode"]
+            )
+            files = {fmt: export_bytes(score, fmt) for fmt in job["formats"]}
+            if _output_cache:
+                _output_cache.put(cache_key, files)
+        result["files"] = {
+            fmt: base64.b64encode(data).decode("ascii") for fmt, data in files.items()
+        }
+    return result
+
+
+def check_structure(structure):
+    """
+    Validated apply_structure command for a job.
+
+    Raises:
+        ValueError unless it is a list whose first item is one of STRUCTURES
+    """
+    if not isinstance(structure, list) or not structure:
+        raise ValueError("'structure' must be a list such as [\"retrograde\"].")
+    if structure[0] not in STRUCTURES:
+        raise ValueError(
+            f"Unsupported structure {structure[0]!r} "
+            f"(supported: {', '.join(STRUCTURES)})."
+        )
+    return list(structure)
+
+
+def extract_source(path, part):
+    """Worker-side melody extraction from a MusicXML or MIDI file."""
+    if path.lower().endswith((".mid", ".midi")):
+        from midi_utils import extract_melody_from_midi
+
+        return extract_melody_from_midi(path, track=part)
+    if isinstance(part, str) and part.lower() == "auto":
+        from melody_extraction import extract_main_melody
+
+        # Already running in a pool worker: reduce the parts in-process
+        data = extract_main_melody(path, workers=1)
+        data.pop("candidates")
+        return data
+    from xml_utils import extract_melody_from_xml
+
+    return extract_melody_from_xml(path, part=part)
+
+
+# --- Server side ---------------------------------------------------------
+
+
+class HarmonizerService:
+    def __init__(self, workers=None, cache_dir=DEFAULT_CACHE_DIR):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_warm_worker, initargs=(cache_dir,)
+        )
+        self.sources = {}  # (path, mtime, part) -> extracted melody dict
+        self.requests = 0
+
+    async def warm_up(self):
+        # Start every worker now rather than on the first requests
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(self.pool, time.sleep, 0.01)
+                for _ in range(self.workers)
+            )
+        )
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    async def _load_source(self, source):
+        path = source.get("path")
+        if not path or not os.path.exists(path):
+            raise ValueError(f"Source file not found: {path}")
+        part = source.get("part")
+        cache_key = (os.path.abspath(path), os.stat(path).st_mtime_ns, part)
+        if cache_key not in self.sources:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(self.pool, extract_source, path, part)
+            if len(self.sources) >= SOURCE_CACHE_SIZE:
+                self.sources.pop(next(iter(self.sources)))
+            self.sources[cache_key] = data
+        return self.sources[cache_key]
+
+    async def _build_job(self, body):
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object.")
+        detected = None
+        if "source" in body:
+            if not isinstance(body["source"], dict):
+                raise ValueError("'source' must be an object with a 'path'.")
+            detected = await self._load_source(body["source"])
+            melody, rhythm = detected["melody"], detected["rhythm"]
+        else:
+            melody = body.get("melody")
+            if isinstance(melody, str):
+                melody = melody.split()
+            if not isinstance(melody, list) or not melody:
+                raise ValueError("Request needs a non-empty 'melody' or a 'source'.")
+            rhythm = body.get("rhythm") or [1.0] * len(melody)
+            if len(rhythm) != len(melody):
+                raise ValueError("'rhythm' must have one value per melody note.")
+
+        key = body.get("key") or (detected["key"] if detected else "C")
+        mode = (body.get("mode") or (detected["mode"] if detected else "major")).lower()
+        key = key.capitalize()
+        if (key, mode) not in SUPPORTED_KEYS:
+            raise ValueError(f"Unsupported key/mode: {key} {mode}")
+
+        formats = body.get("formats") or []
+        unknown = set(formats) - {"musicxml", "midi"}
+        if unknown:
+            raise ValueError(f"Unknown formats: {sorted(unknown)}")
+        direction = body.get("t_direction", "below")
+        if direction not in ("below", "above"):
+            raise ValueError("'t_direction' must be 'below' or 'above'.")
+
+        return {
+            "melody": melody,
+            "rhythm": rhythm,
+            "key": key,
+            "mode": mode,
+            "structure": check_structure(body.get("structure") or ["none"]),
+            "axis_pitch": body.get("axis_pitch"),
+            "m_parallel": [int(i) for i in body.get("m_parallel", [])],
+            "t_level": int(body.get("t_level", 1)),
+            "t_direction": direction,
+            "every_other": bool(body.get("every_other", False)),
+            "voicing": bool(body.get("voicing", False)),
+            "formats": formats,
+        }
+
+    async def handle(self, method, path, body):
+        """Returns (status, payload dict)."""
+        if path == "/health":
+            return 200, {
+                "status": "ok",
+                "workers": self.workers,
+                "requests": self.requests,
+            }
+        if path != "/harmonize":
+            return 404, {"error": f"Unknown endpoint {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            job = await self._build_job(json.loads(body or b"{}"))
+        except (ValueError, TypeError, KeyError, json.JSONDecodeError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:  # e.g. a source file music21 cannot read
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self.pool, harmonize_job, job)
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        self.requests += 1
+        return 200, result
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await _respond(
+                        writer, 400, {"error": "Malformed request line"}, close=True
+                    )
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0))
+                    if length < 0:
+                        raise ValueError
+                except ValueError:
+                    await _respond(
+                        writer, 400, {"error": "Invalid Content-Length"}, close=True
+                    )
+                    break
+                if length > MAX_BODY:
+                    await _respond(writer, 413, {"error": "Body too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.handle(
+                    method.upper(), path.split("?")[0], body
+                )
+                close = (
+                    headers.get("connection", "").lower() == "close"
+                    or version == "HTTP/1.0"
+                )
+                await _respond(writer, status, payload, close=close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _respond(writer, status, payload, close=False):
+    body = json.dumps(payload).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def serve(
+    host=DEFAULT_HOST,
+    port=DEFAULT_PORT,
+    workers=None,
+    ready=None,
+    cache_dir=DEFAULT_CACHE_DIR,
+):
+    """
+    Run the service until cancelled. `ready` (an asyncio.Event) is set once
+    the workers are warm and the socket is listening. Exported files are
+    cached in cache_dir (None: no cache).
+    """
+    service = HarmonizerService(workers, cache_dir)
+    try:
+        await service.warm_up()
+        server = await asyncio.start_server(service.serve_connection, host, port)
+        port = server.sockets[0].getsockname()[1]  # the real one for port 0
+        print(
+            f"[INFO] Harmonizer service on http://{host}:{port} ({service.workers} workers)"
+        )
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP harmonization service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--cache-dir", default=DEFAULT_CACHE_DIR, help="Exported-file cache"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Always rebuild exported files"
+    )
+    args = parser.parse_args(argv)
+    cache_dir = None if args.no_cache else args.cache_dir
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, cache_dir=cache_dir))
+    except KeyboardInterrupt:
+        print("\n[INFO] Service stopped.")
+
+
+if __name__ == "__main__":
+    main()
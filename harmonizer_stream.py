@@ -0,0 +1,266 @@
+# === harmonizer_stream.py ===
+# Pipe-friendly harmonizer: melodies in on stdin, harmonized layers out on
+# stdout, one line each, written and flushed as soon as they are ready.
+#
+# Each input line is one melody, either
+#   - note names separated by spaces, "r" for a rest:   A4 G4 r F4 E4
+#   - a JSON list of events: note names (null = rest) or [note, duration]
+#     pairs or {"note": ..., "duration": ...} objects
+#   - a JSON object like a harmonizer_service request ("melody", "rhythm",
+#     "key", "mode", "structure", "m_parallel", "t_level", ... and an "id"
+#     echoed in the output); its fields override the command-line flags
+# Blank lines and lines starting with '#' are skipped.
+#
+# Output is JSON lines (default) or tab-separated layers (--output tsv).
+# music21 is imported once, lines are processed one at a time and nothing is
+# kept between them, so any number of melodies can stream through one
+# process. Messages from the pipeline go to stderr, keeping stdout clean.
+#
+#   printf 'A4 G4 F4 E4\nD4 E4 F4\n' | python main.py --stream --key D --mode minor
+#   python main.py --stream --m-parallel -9 --output tsv < melodies.txt
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+
+NOTE_RE = re.compile(r"^[A-G][#b-]*\d+$")
+REST_TOKENS = {"r", "rest", "-", "_"}
+OPTION_KEYS = (
+    "key",
+    "mode",
+    "structure",
+    "axis_pitch",
+    "m_parallel",
+    "t_level",
+    "t_direction",
+    "every_other",
+    "voicing",
+)
+
+
+def _event(event):
+    if isinstance(event, (list, tuple)):
+        return event[0], float(event[1])
+    if isinstance(event, dict):
+        return event.get("note"), float(event.get("duration", 1.0))
+    return event, 1.0
+
+
+def parse_line(line):
+    """
+    Request dict (melody, rhythm and any per-line options) for one input
+    line, or None for blank and comment lines.
+
+    Raises:
+        ValueError for malformed JSON or events
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line[0] not in "[{":
+        melody = [None if t.lower() in REST_TOKENS else t for t in line.split()]
+        return {"melody": melody, "rhythm": [1.0] * len(melody)}
+
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}") from e
+    request = dict(data) if isinstance(data, dict) else {"melody": data}
+    melody = request.get("melody")
+    if isinstance(melody, str):
+        melody = melody.split()
+    if not isinstance(melody, list) or not melody:
+        raise ValueError("Line needs a non-empty melody.")
+    try:
+        events = [_event(e) for e in melody]
+    except (TypeError, ValueError, IndexError) as e:
+        raise ValueError(f"Bad melody event: {e}") from e
+    request["melody"] = [
+        None if n is None or str(n).lower() in REST_TOKENS else n for n, _ in events
+    ]
+    request["rhythm"] = request.get("rhythm") or [d for _, d in events]
+    if len(request["rhythm"]) != len(request["melody"]):
+        raise ValueError("'rhythm' must have one value per melody note.")
+    return request
+
+
+def pitch_classes(melody):
+    """
+    Pitch class of every note (rests skipped).
+
+    Raises:
+        ValueError for anything that is not a note name with an octave
+    """
+    from music21 import pitch
+
+    pcs = []
+    for n in melody:
+        if n is None:
+            continue
+        try:
+            if not isinstance(n, str) or not NOTE_RE.match(n):
+                raise ValueError
+            pcs.append(pitch.Pitch(n).pitchClass)
+        except Exception:
+            raise ValueError(f"Invalid note name: {n!r}") from None
+    return pcs
+
+
+def detect_key(pcs):
+    """Nearest supported (key, mode) for a list of pitch classes."""
+    from melody_extraction import supported_key
+
+    pc_weights = [0.0] * 12
+    for pc in pcs:
+        pc_weights[pc] += 1
+    return supported_key(pc_weights)
+
+
+def build_job(request, options):
+    """
+    Validated job for harmonizer_service.harmonize_job from a parsed line and
+    the command-line options (line fields take precedence).
+    """
+    from harmonizer_service import SUPPORTED_KEYS, check_structure
+
+    merged = dict(options)
+    merged.update({k: request[k] for k in OPTION_KEYS if k in request})
+    melody = request["melody"]
+    pcs = pitch_classes(melody)
+    if merged.get("key"):
+        key, mode = merged["key"].capitalize(), (merged.get("mode") or "major").lower()
+    else:
+        key, mode = detect_key(pcs)
+    if (key, mode) not in SUPPORTED_KEYS:
+        raise ValueError(f"Unsupported key/mode: {key} {mode}")
+    if merged["t_direction"] not in ("below", "above"):
+        raise ValueError("'t_direction' must be 'below' or 'above'.")
+    structure = merged["structure"]
+    if isinstance(structure, str):
+        structure = [structure]
+    return {
+        "melody": melody,
+        "rhythm": [float(d) for d in request["rhythm"]],
+        "key": key,
+        "mode": mode,
+        "structure": check_structure(structure),
+        "axis_pitch": merged.get("axis_pitch"),
+        "m_parallel": [int(i) for i in merged["m_parallel"]],
+        "t_level": int(merged["t_level"]),
+        "t_direction": merged["t_direction"],
+        "every_other": bool(merged["every_other"]),
+        "voicing": bool(merged["voicing"]),
+        "formats": [],
+    }
+
+
+def stream_harmonize(lines, options):
+    """
+    Harmonize an iterable of input lines lazily. Yields one dict per melody:
+    the harmonize_job result plus "line" (input line number), "id" when the
+    line had one, and "intervals"; or {"line": n, "error": message}.
+    """
+    from harmonizer_service import harmonize_job
+
+    for number, line in enumerate(lines, 1):
+        try:
+            request = parse_line(line)
+            if request is None:
+                continue
+            job = build_job(request, options)
+            result = harmonize_job(job)
+        except Exception as e:
+            yield {"line": number, "error": f"{type(e).__name__}: {e}"}
+            continue
+        out = {"line": number}
+        if "id" in request:
+            out["id"] = request["id"]
+        out.update(result, intervals=job["m_parallel"])
+        yield out
+
+
+def _notes(line):
+    return " ".join("r" if n is None else n for n in line)
+
+
+def format_tsv(result):
+    """melody, T-voice and each M-parallel line as note names, tab-separated."""
+    if "error" in result:
+        return f"#error\t{result['line']}\t{result['error']}"
+    return "\t".join(
+        [_notes(result["melody"]), _notes(result["t_voice"])]
+        + [_notes(line) for line in result["m_parallel"]]
+    )
+
+
+def add_arguments(parser):
+    parser.add_argument("--key", default=None, help="default: estimated per melody")
+    parser.add_argument("--mode", default=None, choices=["major", "minor"])
+    parser.add_argument(
+        "--structure",
+        nargs="+",
+        default=["none"],
+        help="apply_structure command: none or retrograde",
+    )
+    parser.add_argument("--axis-pitch", default=None)
+    parser.add_argument(
+        "--m-parallel", type=int, nargs="*", default=[], metavar="SEMITONES"
+    )
+    parser.add_argument("--t-level", type=int, default=1)
+    parser.add_argument("--t-direction", default="below", choices=["below", "above"])
+    parser.add_argument(
+        "--every-other", action="store_true", help="T-voice on every other note"
+    )
+    parser.add_argument(
+        "--voicing", action="store_true", help="re-choose T/M octaves (voicing.py)"
+    )
+    parser.add_argument("--output", default="jsonl", choices=["jsonl", "tsv"])
+
+
+def run_stream(args, stdin=None, stdout=None):
+    """Read stdin, write one result line per melody to stdout. Returns the error count."""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    structure = [int(t) if t.lstrip("-").isdigit() else t for t in args.structure]
+    options = {
+        "key": args.key,
+        "mode": args.mode,
+        "structure": structure,
+        "axis_pitch": args.axis_pitch,
+        "m_parallel": args.m_parallel,
+        "t_level": args.t_level,
+        "t_direction": args.t_direction,
+        "every_other": args.every_other,
+        "voicing": args.voicing,
+    }
+    errors = 0
+    try:
+        # Pipeline messages ([WARN], [ERROR], ...) must not mix with results
+        with contextlib.redirect_stdout(sys.stderr):
+            for result in stream_harmonize(stdin, options):
+                errors += "error" in result
+                text = (
+                    format_tsv(result) if args.output == "tsv" else json.dumps(result)
+                )
+                stdout.write(text + "\n")
+                stdout.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); keep the exit-time flush quiet
+        os.dup2(os.open(os.devnull, os.O_WRONLY), stdout.fileno())
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Harmonize melodies from stdin, one per line."
+    )
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    return 1 if run_stream(args) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
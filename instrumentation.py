@@ -0,0 +1,166 @@
+# === instrumentation.py ===
+# Optional stage timers and counters for the harmonizer pipeline.
+#
+# Off by default: stage() then returns one shared no-op context manager and
+# count() returns immediately, so instrumented code pays a function call and
+# nothing else. Enable with enable() (main.py --profile out.json) or the
+# TINTHARM_PROFILE environment variable, then dump() writes a Chrome
+# trace-event file that opens in chrome://tracing or https://ui.perfetto.dev.
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_enabled = False
+_events = []
+_counters = {}
+_origin_ns = 0
+_lock = threading.Lock()
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def enable():
+    """Start recording (clears anything recorded before)."""
+    global _enabled, _origin_ns
+    reset()
+    _origin_ns = time.perf_counter_ns()
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _counters.clear()
+
+
+@contextmanager
+def _timed(name, args):
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        with _lock:
+            _events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - _origin_ns) / 1000,
+                    "dur": (end - start) / 1000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+            )
+
+
+def stage(name, **args):
+    """
+    Time a pipeline stage:
+
+        with stage("xml.parse", path=path):
+            score = converter.parse(path)
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    return _timed(name, args)
+
+
+def count(name, n=1):
+    """Add n to a named counter (notes processed, objects created, ...)."""
+    if not _enabled:
+        return
+    with _lock:
+        total = _counters.get(name, 0) + n
+        _counters[name] = total
+        _events.append(
+            {
+                "name": name,
+                "ph": "C",
+                "ts": (time.perf_counter_ns() - _origin_ns) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {name: total},
+            }
+        )
+
+
+def count_objects(s, name="music21_objects"):
+    """
+    Add the number of music21 objects in stream `s` (itself included) to a
+    counter. The stream is only walked while instrumentation is enabled.
+    """
+    if _enabled:
+        count(name, sum(1 for _ in s.recurse(includeSelf=True)))
+
+
+def summary():
+    """
+    Returns ({stage: {"calls", "total_ms", "max_ms"}}, {counter: total}).
+    """
+    stages = {}
+    with _lock:
+        for e in _events:
+            if e["ph"] != "X":
+                continue
+            s = stages.setdefault(
+                e["name"], {"calls": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            ms = e["dur"] / 1000
+            s["calls"] += 1
+            s["total_ms"] += ms
+            s["max_ms"] = max(s["max_ms"], ms)
+        return stages, dict(_counters)
+
+
+def print_summary():
+    stages, counters = summary()
+    print("\n[PROFILE] Stage timings:")
+    for name, s in sorted(stages.items(), key=lambda item: -item[1]["total_ms"]):
+        print(
+            f"  {name:<24} {s['total_ms']:10.1f} ms  ({s['calls']} calls, max {s['max_ms']:.1f} ms)"
+        )
+    for name, total in sorted(counters.items()):
+        print(f"  {name:<24} {total:10d}")
+
+
+def dump(path):
+    """
+    Write the recorded events as a trace-event JSON file. Stage and counter
+    totals are included under "summary".
+    """
+    stages, counters = summary()
+    with _lock:
+        trace = {
+            "traceEvents": list(_events),
+            "displayTimeUnit": "ms",
+            "summary": {"stages": stages, "counters": counters},
+        }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f, indent=1, default=str)
+    print(f"[INFO] Profile written to {path}")
+
+
+if os.environ.get("TINTHARM_PROFILE"):
+    enable()
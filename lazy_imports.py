@@ -0,0 +1,48 @@
+# === lazy_imports.py ===
+
+import importlib
+import sys
+
+# Modules that dominate CLI startup; none of them may be imported at module
+# load time by the harmonizer or StyleFinder entry points.
+HEAVY_MODULES = ("music21", "pandas", "sklearn", "plotly", "numpy")
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Usage:
+        stream = lazy_import("music21.stream")
+        s = stream.Score()  # music21 is imported here, not at module load
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def loaded_heavy_modules(modules=None):
+    """
+    Return which of the heavy dependencies are currently in sys.modules.
+    """
+    return [m for m in (modules or HEAVY_MODULES) if m in sys.modules]
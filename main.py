@@ -1,7 +1,21 @@
 # === Tintinnabuli Harmonizer ===
 
 # Core dependencies
-from music21 import converter, stream, note, metadata, key as m21key
+import argparse
+import os
+import sys
+
+# music21 is loaded on first use so the manual-entry path starts fast
+from lazy_imports import lazy_import
+
+stream = lazy_import("music21.stream")
+note = lazy_import("music21.note")
+metadata = lazy_import("music21.metadata")
+m21key = lazy_import("music21.key")
+
+# Optional stage timers/counters (off unless --profile or TINTHARM_PROFILE)
+import instrumentation
+from instrumentation import count, count_objects, stage
 
 # Melody utilities
 from melody_utils import (
@@ -14,11 +28,17 @@ from melody_utils import (
 from harmony_utils import harmonize_melody
 
 # XML utilities
-from xml_utils import extract_monophonic_melody_from_xml
+from xml_utils import extract_melody_from_xml
+
+# MIDI utilities
+from midi_utils import extract_melody_from_midi
 
 # Structural logic
 from structure_utils import prompt_structure_options, apply_structure
 
+# Content-addressed cache for exported scores
+from output_cache import OutputCache, export_bytes, job_key
+
 # Utility functions
 from utils import (
     note_to_midi,
@@ -54,6 +74,9 @@ def transpose_melody_diatonic(melody, degree_shift, key="C", mode="major"):
             raise ValueError(f"Unsupported key/mode combination: {key} {mode}")
 
         for note in melody:
+            if note is None:
+                transposed.append(None)
+                continue
             try:
                 base = note[:-1]
                 octave = int(note[-1])
@@ -85,13 +108,14 @@ def transpose_melody_diatonic(melody, degree_shift, key="C", mode="major"):
 
 def get_user_melody():
     """
-    Prompt the user to import a melody manually or from MusicXML.
+    Prompt the user to import a melody manually, from MusicXML or from MIDI.
     Returns a list of note names (e.g., ['E4', 'D4', 'C4']) or None if failed.
     """
     print("\n🎵 Melody Input:")
     print("1. Input melody manually (e.g., C4 D4 E4)")
     print("2. Import melody from MusicXML file")
-    choice = input("Select option [1 or 2]: ").strip()
+    print("3. Import melody from MIDI file")
+    choice = input("Select option [1, 2 or 3]: ").strip()
 
     if choice == "1":
         raw = input("Enter space-separated melody note names (e.g., C4 D4 E4): ")
@@ -99,15 +123,28 @@ def get_user_melody():
 
     elif choice == "2":
         file_path = input("Enter path to MusicXML file: ").strip()
+        part = input("Part name or index (leave blank for a single-part file): ")
         try:
-            part, metadata = extract_monophonic_melody_from_xml(file_path)
-            melody_notes = [n.nameWithOctave for n in part.notes]
+            data = extract_melody_from_xml(file_path, part=part.strip() or None)
+            melody_notes = [n for n in data["melody"] if n is not None]
             print(f"Imported {len(melody_notes)} notes.")
             return melody_notes
         except Exception as e:
             print(f"[ERROR] Failed to import melody from XML: {e}")
             return None
 
+    elif choice == "3":
+        file_path = input("Enter path to MIDI file: ").strip()
+        track = input("Track name or index (leave blank for a single-track file): ")
+        try:
+            data = extract_melody_from_midi(file_path, track=track.strip() or None)
+            melody_notes = [n for n in data["melody"] if n is not None]
+            print(f"Imported {len(melody_notes)} notes.")
+            return melody_notes
+        except Exception as e:
+            print(f"[ERROR] Failed to import melody from MIDI: {e}")
+            return None
+
     else:
         print("Invalid choice. Returning None.")
         return None
@@ -126,6 +163,9 @@ def apply_t_voice_with_pattern(
 
     t_voice = []
     for i, note in enumerate(melody):
+        if note is None:
+            t_voice.append(None)
+            continue
         try:
             if bind_pattern and not bind_pattern[i % len(bind_pattern)]:
                 t_voice.append(None)
@@ -156,6 +196,13 @@ def build_tintinnabuli_score(
     """
     Builds a music21 Score object from melody and optional T-voice.
     """
+    with stage("score.build", notes=len(melody)):
+        s = _build_tintinnabuli_score(melody, t_voice, key_sig, mode, title, composer)
+    count_objects(s)
+    return s
+
+
+def _build_tintinnabuli_score(melody, t_voice, key_sig, mode, title, composer):
     s = stream.Score()
     s.insert(0, metadata.Metadata())
     s.metadata.title = title
@@ -187,8 +234,10 @@ def export_score_to_files(score, filename_base="tintharm_output"):
     Useful for visual and audio verification.
     """
     try:
-        score.write("musicxml", fp=f"{filename_base}.xml")
-        score.write("midi", fp=f"{filename_base}.mid")
+        with stage("score.write.musicxml"):
+            score.write("musicxml", fp=f"{filename_base}.xml")
+        with stage("score.write.midi"):
+            score.write("midi", fp=f"{filename_base}.mid")
         print(f"[INFO] Exported score to {filename_base}.xml and {filename_base}.mid")
     except Exception as e:
         print(f"[ERROR] Failed to export files: {e}")
@@ -235,17 +284,56 @@ def build_score_and_export(
     print(f"[INFO] Exported to {filename_prefix}.xml and {filename_prefix}.mid")
 
 
+EXPORT_FORMATS = ("musicxml", "midi")
+
+
 # === TEST CASE FUNCTIONS (optional debug or test code) ===
 # test functions or manual runs (optional)
 
 
 # === MAIN EXECUTION ===
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tintinnabuli Harmonizer Tool")
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        default=os.environ.get("TINTHARM_PROFILE"),
+        help="Time each pipeline stage and write a trace-event JSON file to PATH",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read melodies from stdin, one per line, and write the layers to stdout "
+        "(see harmonizer_stream.py for the line formats and options)",
+    )
+    args, rest = parser.parse_known_args(argv)
+    if rest and not args.stream:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+
+    if args.profile:
+        instrumentation.enable()
+    try:
+        if args.stream:
+            import harmonizer_stream
+
+            stream_parser = argparse.ArgumentParser(prog="main.py --stream")
+            harmonizer_stream.add_arguments(stream_parser)
+            if harmonizer_stream.run_stream(stream_parser.parse_args(rest)):
+                sys.exit(1)
+        else:
+            run_harmonizer()
+    finally:
+        if args.profile:
+            instrumentation.print_summary()
+            instrumentation.dump(args.profile)
+
+
+def run_harmonizer():
     print("=== Tintinnabuli Harmonizer Tool ===\n")
 
     user_choice = (
         input(
-            "Do you want to import a melody from a MusicXML file or input manually? (Enter 'xml' or 'manual'): "
+            "Do you want to import a melody from a MusicXML or MIDI file, or input manually? (Enter 'xml', 'midi' or 'manual'): "
         )
         .strip()
         .lower()
@@ -256,24 +344,41 @@ def main():
     mode = "major"
     rhythm = []
 
-    if user_choice == "xml":
-        print(
-            "\n[INFO] Please ensure your MusicXML file contains ONLY ONE monophonic melody line (no chords or multiple instruments)."
-        )
-        print(
-            "      Other info like dynamics, articulation, tempo will be preserved if present.\n"
-        )
-
-        file_path = input("Enter path to your MusicXML file: ").strip()
-        result = extract_monophonic_melody_from_xml(file_path)
+    if user_choice in ("xml", "midi"):
+        if user_choice == "xml":
+            print(
+                "\n[INFO] The selected part must be a monophonic melody line (no chords)."
+            )
+            print("      Rests and ties are kept alongside the notes.")
+            print(
+                "      Enter 'auto' as the part to pick the melody line from any score.\n"
+            )
+        else:
+            print(
+                "\n[INFO] Overlapping notes in the track are reduced to the top line.\n"
+            )
 
-        if result is None:
-            print("[ABORT] Could not load XML melody. Exiting.")
+        file_path = input(f"Enter path to your {user_choice.upper()} file: ").strip()
+        part = input("Part/track name or index (leave blank for a single-part file): ")
+        part = part.strip() or None
+        try:
+            if user_choice == "xml" and part and part.lower() == "auto":
+                # numpy-based; only imported when asked for
+                from melody_extraction import extract_main_melody
+
+                with stage("melody.extract", path=file_path):
+                    meta = extract_main_melody(file_path)
+            elif user_choice == "xml":
+                meta = extract_melody_from_xml(file_path, part=part)
+            else:
+                meta = extract_melody_from_midi(file_path, track=part)
+        except (ValueError, OSError) as e:
+            print(f"[ABORT] Could not load {user_choice.upper()} melody: {e}")
             sys.exit(1)
 
-        melody_stream, meta = result
-        melody = [n.nameWithOctave for n in melody_stream.notes]
-        rhythm = [n.quarterLength for n in melody_stream.notes]
+        melody = meta["melody"]
+        rhythm = meta["rhythm"]
+        print(f"[INFO] Using part: {meta['part_name']}")
         key = meta["key"]
         mode = meta["mode"]
 
@@ -293,7 +398,7 @@ def main():
         mode = input("Enter mode ('major' or 'minor'): ").strip().lower()
 
     else:
-        print("Invalid choice. Please enter 'xml' or 'manual'.")
+        print("Invalid choice. Please enter 'xml', 'midi' or 'manual'.")
         sys.exit(1)
 
     print(f"\n[INFO] Melody loaded: {melody}")
@@ -350,9 +455,15 @@ def main():
         axis_pitch = None
 
     # === Apply Structure ===
-    structured_melody, rhythm = apply_structure(
-        melody, rhythm, structure_cmd, key=key, mode=mode, axis_pitch=axis_pitch
-    )
+    # `melody`/`rhythm` stay the source line: the cache key and the variants
+    # export describe the job by its input and re-apply the structure. The
+    # regular export writes every note as a quarter, so the structured
+    # rhythm is not needed here.
+    with stage("structure", command=structure_cmd[0]):
+        structured_melody, _ = apply_structure(
+            melody, rhythm, structure_cmd, key=key, mode=mode, axis_pitch=axis_pitch
+        )
+    count("notes_processed", len(structured_melody))
     print(f"[INFO] Structured melody length: {len(structured_melody)}")
 
     # === PROMPT: M-parallel lines ===
@@ -362,6 +473,7 @@ def main():
     )
 
     m_parallel_notes = []
+    intervals = []
 
     if add_parallel == "y":
         try:
@@ -372,16 +484,18 @@ def main():
             print(f"[INFO] Intervals selected: {intervals}")
 
             # Apply all intervals and return a list of lists
-            for interval in intervals:
-                m_par = [
-                    (
-                        note_str
-                        if note_str is None
-                        else transpose_note_by_semitones(note_str, interval)
-                    )
-                    for note_str in structured_melody
-                ]
-                m_parallel_notes.append(m_par)
+            with stage("m_parallel", lines=len(intervals)):
+                for interval in intervals:
+                    m_par = [
+                        (
+                            note_str
+                            if note_str is None
+                            else transpose_note_by_semitones(note_str, interval)
+                        )
+                        for note_str in structured_melody
+                    ]
+                    m_parallel_notes.append(m_par)
+            count("notes_processed", len(intervals) * len(structured_melody))
 
             print(f"[INFO] Generated {len(m_parallel_notes)} parallel lines.")
         except Exception as e:
@@ -406,14 +520,16 @@ def main():
         t_level = int(input("Enter T-voice level (e.g., 1 for T-1): "))
         t_dir = input("Direction of T-voice? ('below' or 'above'): ").strip().lower()
 
-        t_voice_output = apply_t_voice_with_pattern(
-            structured_melody,
-            key,
-            mode,
-            triad_level=t_level,
-            direction=t_dir,
-            bind_pattern=pattern,
-        )
+        with stage("t_voice", level=t_level, direction=t_dir):
+            t_voice_output = apply_t_voice_with_pattern(
+                structured_melody,
+                key,
+                mode,
+                triad_level=t_level,
+                direction=t_dir,
+                bind_pattern=pattern,
+            )
+        count("notes_processed", len(structured_melody))
 
         print("\nStructured Melody:     ", structured_melody)
         print("T-Voice out:", t_voice_output)
@@ -422,6 +538,38 @@ def main():
         print(f"[ERROR] Could not generate T-voices: {e}")
         sys.exit(1)
 
+    # === PROMPT: Octave optimization ===
+    voiced_octaves = False  # only set once voice_layers has succeeded
+    try:
+        do_voicing = (
+            input(
+                "Re-choose T-voice/M-parallel octaves to avoid leaps and crossings? (y/n): "
+            )
+            .strip()
+            .lower()
+        )
+        if do_voicing == "y":
+            # numpy is only needed here; keep it off the start-up path
+            from voicing import voice_layers
+
+            # M-parallel layers are keyed by position: intervals may repeat
+            layers = {"T-Voice": t_voice_output}
+            directions = {"T-Voice": t_dir}
+            for i, (interval, line) in enumerate(zip(intervals, m_parallel_notes)):
+                layers[i] = line
+                directions[i] = "above" if interval > 0 else "below"
+            with stage("voicing", layers=len(layers)):
+                voiced = voice_layers(structured_melody, layers, directions)
+            t_voice_output = voiced["T-Voice"]
+            m_parallel_notes = [voiced[i] for i in range(len(m_parallel_notes))]
+            voiced_octaves = True
+            print("T-Voice voiced:", t_voice_output)
+            for interval, line in zip(intervals, m_parallel_notes):
+                print(f"M{interval:+d} voiced:", line)
+
+    except Exception as e:
+        print(f"[ERROR] Voicing failed, keeping the original octaves: {e}")
+
     # === PROMPT: Export ===
     try:
         do_export = (
@@ -430,18 +578,83 @@ def main():
             .lower()
         )
         if do_export == "y":
-            score = build_tintinnabuli_score(
-                melody=structured_melody, t_voice=t_voice_output, key_sig=key, mode=mode
-            )
-
-            export_score_to_files(score, filename_base="harmonized_output")
-
+            # Unchanged jobs are served from the output cache; file names
+            # are derived from the job, so runs no longer overwrite each other
+            cache = OutputCache()
+            job = {
+                "melody": melody,
+                "rhythm": rhythm,
+                "key": key,
+                "mode": mode,
+                "structure": structure_cmd,
+                "axis_pitch": axis_pitch,
+                "m_parallel": intervals,
+                "t_level": t_level,
+                "t_direction": t_dir,
+                "every_other": use_pattern == "y",
+                "voicing": voiced_octaves,
+            }
+            cache_key = job_key(job)
+            paths = cache.get(cache_key, EXPORT_FORMATS)
+            if paths is not None:
+                print("[INFO] Unchanged job, served from the output cache.")
+            else:
+                score = build_tintinnabuli_score(
+                    melody=structured_melody,
+                    t_voice=t_voice_output,
+                    key_sig=key,
+                    mode=mode,
+                )
+                files = {}
+                for fmt in EXPORT_FORMATS:
+                    with stage(f"score.write.{fmt}"):
+                        files[fmt] = export_bytes(score, fmt)
+                paths = cache.put(cache_key, files, meta=job)
+
+            print(f"[INFO] Exported to {paths['musicxml']} and {paths['midi']}")
             print("[INFO] Export complete.")
         else:
             print("[INFO] Export skipped.")
     except Exception as e:
         print(f"[ERROR] Failed to export: {e}")
 
+    # === PROMPT: Comparison variants ===
+    try:
+        specs = input(
+            "\nCompare with other settings in one combined score? Enter variants "
+            "(e.g. T2-above T1-below:retrograde:M-9), or leave blank to skip: "
+        ).split()
+        if specs:
+            from variants import LAYOUTS, export_variants, parse_variant
+
+            base = {
+                "structure": list(structure_cmd),
+                "axis_pitch": axis_pitch,
+                "m_parallel": intervals,
+                "t_level": t_level,
+                "t_direction": t_dir,
+                "every_other": use_pattern == "y",
+                "voicing": voiced_octaves,
+            }
+            variants = [dict(base, label=f"T{t_level}-{t_dir}")]
+            variants += [parse_variant(spec, base) for spec in specs]
+            layout = (
+                input("Layout - 'parts' or 'sections' [parts]: ").strip().lower()
+                or "parts"
+            )
+            if layout not in LAYOUTS:
+                print("[WARNING] Unknown layout. Defaulting to: parts")
+                layout = "parts"
+            with stage("variants.export", variants=len(variants)):
+                paths = export_variants(
+                    melody, rhythm, key, mode, variants, layout=layout
+                )
+            print(
+                f"[INFO] {len(variants)} variants exported to {paths['musicxml']} and {paths['midi']}"
+            )
+    except Exception as e:
+        print(f"[ERROR] Failed to export variants: {e}")
+
     # Optional: Show score in music21’s viewer
     # score.show()  # Uncomment if needed
 
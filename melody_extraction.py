@@ -0,0 +1,295 @@
+# === melody_extraction.py ===
+# Automatic melody-line extraction from polyphonic scores.
+#
+# extract_melody_from_xml needs a monophonic part chosen by hand. Here every
+# part (per staff, as xml_stream reads it) is reduced to candidate lines - the
+# skyline (highest note at each onset) and the lowest line - and each line is
+# scored with a few array heuristics: stepwise motion, pitch variety,
+# register, how busy it is and how much of the time it sounds, with penalties
+# for repeated notes, wide leaps, chordal texture and bass lines. The best
+# line comes back in the same shape as extract_melody_from_xml, spelled in
+# the nearest key the harmonizer supports, so it can go straight into the
+# pipeline. Parts are reduced in parallel, one process per part up to the
+# CPUs available.
+
+import os
+
+import numpy as np
+
+from utils import (
+    NOTE_TO_SEMITONE,
+    SEMITONE_TO_NOTE,
+    TONIC_NAMES,
+    get_scale_notes,
+    score_keys,
+)
+from xml_stream import iter_parts
+
+MELODY_WEIGHTS = {
+    "stepwise": 2.0,  # share of moves by a 2nd or 3rd
+    "variety": 1.0,  # distinct pitch classes / 12
+    "register": 1.0,  # median pitch relative to middle C, per two octaves
+    "coverage": 1.0,  # share of the time the line sounds
+    "activity": 0.5,  # notes relative to the busiest candidate line
+    "repeated": -1.0,  # share of repeated pitches
+    "leaps": -1.5,  # share of leaps beyond a fifth
+    "chordal": -1.0,  # share of the part's onsets that are chords
+    "bottom": -0.5,  # lowest line of a polyphonic staff (accompaniment)
+}
+MIN_LINE_NOTES = 8
+
+
+def supported_key(pc_weights):
+    """Best-matching (tonic, mode) that MAJOR_SCALES / MINOR_SCALES can spell."""
+    for tonic, mode, _ in score_keys(pc_weights):
+        if get_scale_notes(TONIC_NAMES[tonic], mode):
+            return TONIC_NAMES[tonic], mode
+    return "C", "major"
+
+
+def spell_midi(midi, scale):
+    """Note name for a MIDI pitch, using the scale's spelling when diatonic."""
+    by_pc = {NOTE_TO_SEMITONE[name]: name for name in scale}
+    name = by_pc.get(midi % 12, SEMITONE_TO_NOTE[midi % 12])
+    return f"{name}{midi // 12 - 1}"  # no Cb/B# in these scales, so no octave shift
+
+
+def skyline(part, lowest=False):
+    """
+    Highest (or lowest) note at each onset of a part (an xml_stream.iter_parts
+    entry). A note is cut short where the next onset starts and gaps become
+    rests.
+
+    Returns:
+        (midi, durations, onsets) arrays; midi is -1 for rests
+    """
+    if not part["notes"]:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+    notes = np.array([n[:4] for n in part["notes"]], dtype=float)
+    measure_offsets = np.array([m[1] for m in part["measures"]], dtype=float)
+    keep = notes[:, 2] > 0  # grace notes take no time
+    onset = np.round(measure_offsets[notes[keep, 0].astype(int)] + notes[keep, 1], 6)
+    dur, midi = notes[keep, 2], notes[keep, 3].astype(np.int64)
+    if len(onset) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+
+    # One note per onset: sort by onset, then by pitch towards the chosen end
+    order = np.lexsort((midi if lowest else -midi, onset))
+    onset, dur, midi = onset[order], dur[order], midi[order]
+    first = np.concatenate([[True], onset[1:] != onset[:-1]])
+    onset, dur, midi = onset[first], dur[first], midi[first]
+
+    end = onset + dur
+    next_onset = np.append(onset[1:], np.inf)
+    dur = np.minimum(dur, next_onset - onset)
+    gap = next_onset[:-1] - end[:-1]
+    rests = np.flatnonzero(gap > 0)
+
+    # Interleave the rests after the notes they follow
+    midi = np.insert(midi, rests + 1, -1)
+    onsets = np.insert(onset, rests + 1, end[rests])
+    durations = np.insert(dur, rests + 1, gap[rests])
+    keep = durations > 0
+    return midi[keep], durations[keep], onsets[keep]
+
+
+def line_features(midi, durations, chord_share=0.0, bottom=False):
+    """
+    Heuristic features of one line (see MELODY_WEIGHTS), or None for lines
+    with fewer than MIN_LINE_NOTES notes. "activity" holds the raw note count
+    until rank_candidates normalizes it.
+    """
+    pitched = midi >= 0
+    pitches = midi[pitched]
+    if len(pitches) < MIN_LINE_NOTES:
+        return None
+    moves = np.abs(np.diff(pitches))
+    return {
+        "stepwise": float(np.mean((moves >= 1) & (moves <= 4))),
+        "variety": len(np.unique(pitches % 12)) / 12,
+        "register": float(np.median(pitches) - 60) / 24,
+        "coverage": float(durations[pitched].sum() / durations.sum()),
+        "activity": float(len(pitches)),
+        "repeated": float(np.mean(moves == 0)),
+        "leaps": float(np.mean(moves > 7)),
+        "chordal": chord_share,
+        "bottom": float(bottom),
+    }
+
+
+def part_candidates(part):
+    """
+    Candidate lines of one part, as dicts with part_name, line ("top" or
+    "bottom"), midi, durations, onsets and features (None if too short).
+    """
+    notes = part["notes"]
+    onsets = {(n[0], n[1]) for n in notes if n[2] > 0}
+    chord_onsets = {(n[0], n[1]) for n in notes if n[4] and n[2] > 0}
+    chord_share = len(chord_onsets) / len(onsets) if onsets else 0.0
+    # Chords or several voices in the staff: the lowest line is a candidate too
+    polyphonic = len(onsets) < sum(1 for n in notes if n[2] > 0)
+
+    candidates = []
+    for line in ("top", "bottom") if polyphonic else ("top",):
+        midi, durations, starts = skyline(part, lowest=line == "bottom")
+        candidates.append(
+            {
+                "part_name": part["name"],
+                "line": line,
+                "midi": midi,
+                "durations": durations,
+                "onsets": starts,
+                "features": line_features(
+                    midi, durations, chord_share, bottom=line == "bottom"
+                ),
+            }
+        )
+    return candidates
+
+
+def rank_candidates(candidates, weights=None):
+    """
+    Score every candidate (weighted sum of its features, -inf without
+    features) and return them best first.
+    """
+    weights = weights or MELODY_WEIGHTS
+    busiest = max(
+        (c["features"]["activity"] for c in candidates if c["features"]), default=1.0
+    )
+    for c in candidates:
+        if c["features"] is None:
+            c["score"] = float("-inf")
+            continue
+        features = dict(c["features"], activity=c["features"]["activity"] / busiest)
+        c["score"] = sum(weights[k] * v for k, v in features.items())
+    return sorted(candidates, key=lambda c: -c["score"])
+
+
+def _select(parts, part):
+    if part is None:
+        return parts
+    if isinstance(part, int) or (isinstance(part, str) and part.strip().isdigit()):
+        idx = int(part)
+        if not 0 <= idx < len(parts):
+            raise ValueError(f"Part index {idx} out of range (0-{len(parts) - 1}).")
+        return [parts[idx]]
+    wanted = part.strip().lower()
+    chosen = [
+        p
+        for p in parts
+        if wanted in (p["name"] or "").lower()
+        or wanted in (p["instrument"] or "").lower()
+    ]
+    if not chosen:
+        raise ValueError(f"No part matching '{part}' in {[p['name'] for p in parts]}.")
+    return chosen
+
+
+def extract_main_melody(path, part=None, workers=None):
+    """
+    Extract the most melodic line of a MusicXML score, chords and all.
+
+    Parameters:
+        path (str): .musicxml / .xml / .mxl file
+        part (int, str or None): only consider this part (index or name
+            substring); default: every part
+        workers (int): processes reducing the parts in parallel (default:
+            one per part, up to the CPUs available; 1 for in-process)
+
+    Returns:
+        dict with the keys of extract_melody_from_xml (melody, rhythm,
+        offsets, ties, key, mode, key_signature, time_signature, part_name)
+        plus line ("top"/"bottom") and candidates: (part_name, line, score)
+        for every line considered, best first
+
+    Raises:
+        ValueError if no part holds a usable line
+    """
+    parts = _select(list(iter_parts(path)), part)
+    if workers is None:
+        workers = min(len(parts), len(os.sched_getaffinity(0)))
+    if workers > 1 and len(parts) > 1:
+        # Imported here: multiprocessing is slow to import for CLI entry points
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(parts))) as pool:
+            per_part = list(pool.map(part_candidates, parts))
+    else:
+        per_part = [part_candidates(p) for p in parts]
+
+    candidates = rank_candidates([c for cands in per_part for c in cands])
+    if not candidates or candidates[0]["score"] == float("-inf"):
+        raise ValueError(f"No part of {os.path.basename(path)} has a melody line.")
+    best = candidates[0]
+
+    midi, durations = best["midi"], best["durations"]
+    pc_weights = np.bincount(
+        midi[midi >= 0] % 12, weights=durations[midi >= 0], minlength=12
+    )
+    key, mode = supported_key(pc_weights.tolist())
+    scale = get_scale_notes(key, mode)
+    return {
+        "melody": [None if m < 0 else spell_midi(int(m), scale) for m in midi],
+        "rhythm": durations.tolist(),
+        "offsets": best["onsets"].tolist(),
+        "ties": [None] * len(midi),
+        "key": key,
+        "mode": mode,
+        "key_signature": None,
+        "time_signature": None,
+        "part_name": best["part_name"],
+        "line": best["line"],
+        "candidates": [(c["part_name"], c["line"], c["score"]) for c in candidates],
+    }
+
+
+def _extract_or_none(path):
+    try:
+        # Files are already spread over worker processes
+        return extract_main_melody(path, workers=1)
+    except (ValueError, OSError) as e:
+        print(f"[ERROR] Skipping {path}: {e}")
+        return None
+
+
+def extract_main_melodies(paths, workers=None):
+    """
+    extract_main_melody for many files in worker processes.
+    Returns {path: melody dict or None if the file had no usable line}.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return {p: _extract_or_none(p) for p in paths}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(_extract_or_none, paths)))
+
+
+def main(argv=None):
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Pick the melody line of each score.")
+    parser.add_argument("paths", nargs="+", help="MusicXML files or folders")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths += sorted(glob.glob(os.path.join(path, "*.musicxml")))
+        else:
+            paths.append(path)
+    for path, data in extract_main_melodies(paths, args.workers).items():
+        if data is None:
+            continue
+        notes = sum(n is not None for n in data["melody"])
+        print(
+            f"🎵 {os.path.basename(path)}: {data['part_name']} ({data['line']} line), "
+            f"{notes} notes in {data['key']} {data['mode']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
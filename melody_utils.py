@@ -1,5 +1,8 @@
+from lazy_imports import lazy_import
 from utils import note_to_midi, midi_to_note, get_scale_notes
-from music21 import note as m21_note, pitch as m21_pitch
+
+m21_note = lazy_import("music21.note")
+m21_pitch = lazy_import("music21.pitch")
 
 
 def mirror_melody(melody_midi, axis_note="Eb4"):
@@ -0,0 +1,113 @@
+# === memory_utils.py ===
+# Peak-memory reporting and a memory-aware process scheduler for corpus jobs.
+#
+# Each file is processed in a fresh worker process (max_tasks_per_child=1) so
+# the peak RSS reported for it is that file's own, and the memory music21
+# allocated is returned to the OS when the worker exits. New files are only
+# started while the estimated memory of the running ones stays under the
+# ceiling; estimates start from file size and are corrected by the peaks
+# actually observed.
+
+import os
+import sys
+
+# Rough peak RSS before any file has been measured: a fixed cost per worker
+# (interpreter + imports) plus MB per MB of MusicXML
+BASELINE_MB = {"music21": 80.0, "stream": 15.0}
+DEFAULT_MB_PER_FILE_MB = {"music21": 60.0, "stream": 10.0}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def file_size_mb(path):
+    return os.path.getsize(path) / (1024 * 1024)
+
+
+def _run_measured(fn, item):
+    result = fn(item)
+    return result, peak_rss_mb()
+
+
+def run_with_memory_limit(
+    fn, paths, memory_limit_mb=None, workers=None, mode="music21"
+):
+    """
+    Run fn(path) for every path in worker processes and yield
+    (path, result, peak RSS in MB) as files finish.
+
+    Parameters:
+        fn: picklable top-level function taking a path
+        paths (list): files to process
+        memory_limit_mb (float): ceiling for the summed estimated RSS of the
+            running workers (None: only `workers` limits concurrency). At
+            least one file always runs, even if it alone exceeds the ceiling.
+        workers (int): maximum number of processes (default: CPU count)
+        mode (str): "music21" or "stream", selects the initial estimate
+    """
+    # Imported here: multiprocessing is slow to import for CLI entry points
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    workers = workers or os.cpu_count() or 1
+    if mode not in BASELINE_MB:
+        raise ValueError(f"Unknown mode '{mode}' (use 'music21' or 'stream').")
+    baseline = BASELINE_MB[mode]
+    per_mb = DEFAULT_MB_PER_FILE_MB[mode]
+    observed = []  # (file MB, peak RSS MB) of finished files
+    pending = sorted(paths, key=file_size_mb)  # small files first fill the gaps
+    running = {}  # future -> (path, estimate)
+
+    def estimate(path):
+        return baseline + per_mb * file_size_mb(path)
+
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as pool:
+        while pending or running:
+            in_use = sum(est for _, est in running.values())
+            # Start the largest pending file that fits, or the smallest if idle
+            while pending and len(running) < workers:
+                fitting = [
+                    p
+                    for p in pending
+                    if memory_limit_mb is None
+                    or in_use + estimate(p) <= memory_limit_mb
+                ]
+                if fitting:
+                    path = fitting[-1]
+                elif not running:
+                    path = pending[0]
+                else:
+                    break
+                pending.remove(path)
+                running[pool.submit(_run_measured, fn, path)] = (path, estimate(path))
+                in_use += estimate(path)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, _ = running.pop(future)
+                try:
+                    result, peak = future.result()
+                except Exception as e:
+                    print(f"[ERROR] Skipping {path}: {e}")
+                    yield path, None, None
+                    continue
+                if peak is not None:
+                    # Refit the estimate: the smallest peak approximates the
+                    # fixed cost, the worst file sets the cost per MB
+                    observed.append((file_size_mb(path), peak))
+                    baseline = min(p for _, p in observed)
+                    ratios = [
+                        (p - baseline) / s
+                        for s, p in observed
+                        if s > 0 and p > baseline
+                    ]
+                    if ratios:
+                        per_mb = max(ratios)
+                yield path, result, peak
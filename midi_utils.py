@@ -0,0 +1,343 @@
+# === midi_utils.py ===
+# Lightweight Standard MIDI File (SMF) reader for melody import.
+# Pure Python, no music21: loading a melody takes milliseconds.
+
+import struct
+
+from instrumentation import count, stage
+from utils import SEMITONE_TO_NOTE, estimate_key, get_scale_notes, NOTE_TO_SEMITONE
+
+# Key signature meta event: number of sharps (+) / flats (-) -> major tonic
+_SHARPS_TO_MAJOR = {
+    -7: "Cb",
+    -6: "Gb",
+    -5: "Db",
+    -4: "Ab",
+    -3: "Eb",
+    -2: "Bb",
+    -1: "F",
+    0: "C",
+    1: "G",
+    2: "D",
+    3: "A",
+    4: "E",
+    5: "B",
+    6: "F#",
+    7: "C#",
+}
+_SHARPS_TO_MINOR = {
+    -7: "Ab",
+    -6: "Eb",
+    -5: "Bb",
+    -4: "F",
+    -3: "C",
+    -2: "G",
+    -1: "D",
+    0: "A",
+    1: "E",
+    2: "B",
+    3: "F#",
+    4: "C#",
+    5: "G#",
+    6: "D#",
+    7: "A#",
+}
+
+
+def _read_varlen(data, pos):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+
+def _parse_track(data, track_index):
+    """
+    Parse one MTrk chunk body into a track dict with note events and meta data.
+    Notes are (onset_tick, duration_tick, midi, velocity, channel).
+    """
+    track = {
+        "index": track_index,
+        "name": None,
+        "notes": [],
+        "channels": set(),
+        "tempos": [],
+        "time_signature": None,
+        "key_signature": None,
+    }
+    pos = 0
+    tick = 0
+    status = None
+    open_notes = {}  # (channel, midi) -> [(onset, velocity), ...]
+
+    while pos < len(data):
+        delta, pos = _read_varlen(data, pos)
+        tick += delta
+        byte = data[pos]
+        if byte & 0x80:
+            status = byte
+            pos += 1
+        elif status is None:
+            raise ValueError(
+                f"Running status without a status byte in track {track_index}."
+            )
+
+        if status == 0xFF:
+            meta_type = data[pos]
+            length, pos = _read_varlen(data, pos + 1)
+            payload = data[pos : pos + length]
+            pos += length
+            if meta_type == 0x03 and track["name"] is None:
+                track["name"] = payload.decode("latin-1").strip()
+            elif meta_type == 0x51 and length == 3:
+                track["tempos"].append((tick, int.from_bytes(payload, "big")))
+            elif meta_type == 0x58 and track["time_signature"] is None and length >= 2:
+                track["time_signature"] = f"{payload[0]}/{2 ** payload[1]}"
+            elif meta_type == 0x59 and track["key_signature"] is None and length == 2:
+                sharps = struct.unpack("b", payload[:1])[0]
+                track["key_signature"] = (sharps, "minor" if payload[1] else "major")
+            elif meta_type == 0x2F:
+                break
+            status = None
+            continue
+
+        if status in (0xF0, 0xF7):
+            length, pos = _read_varlen(data, pos)
+            pos += length
+            status = None
+            continue
+
+        kind = status & 0xF0
+        channel = status & 0x0F
+        if kind in (0xC0, 0xD0):
+            pos += 1
+            continue
+        data1, data2 = data[pos], data[pos + 1]
+        pos += 2
+
+        if kind == 0x90 and data2 > 0:
+            open_notes.setdefault((channel, data1), []).append((tick, data2))
+        elif kind == 0x80 or (kind == 0x90 and data2 == 0):
+            stack = open_notes.get((channel, data1))
+            if stack:
+                onset, velocity = stack.pop(0)
+                track["notes"].append((onset, tick - onset, data1, velocity, channel))
+                track["channels"].add(channel)
+
+    # Close notes that never received a note-off at the end of the track
+    for (channel, midi), stack in open_notes.items():
+        for onset, velocity in stack:
+            track["notes"].append((onset, tick - onset, midi, velocity, channel))
+            track["channels"].add(channel)
+
+    track["notes"].sort()
+    return track
+
+
+def read_midi_file(path):
+    """
+    Read a Standard MIDI File (format 0 or 1).
+
+    Returns:
+        dict with:
+            - ticks_per_quarter (int)
+            - tracks: list of track dicts (index, name, notes, channels,
+              tempos, time_signature, key_signature)
+    Raises:
+        ValueError for malformed or SMPTE-timed files
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if data[:4] != b"MThd":
+        raise ValueError(f"Not a Standard MIDI File: {path}")
+    header_len = struct.unpack(">I", data[4:8])[0]
+    fmt, n_tracks, division = struct.unpack(">HHH", data[8:14])
+    if division & 0x8000:
+        raise ValueError("SMPTE time division is not supported.")
+    if fmt not in (0, 1):
+        raise ValueError(f"MIDI format {fmt} is not supported.")
+
+    tracks = []
+    pos = 8 + header_len
+    while pos + 8 <= len(data) and len(tracks) < n_tracks:
+        chunk_type = data[pos : pos + 4]
+        chunk_len = struct.unpack(">I", data[pos + 4 : pos + 8])[0]
+        body = data[pos + 8 : pos + 8 + chunk_len]
+        pos += 8 + chunk_len
+        if chunk_type == b"MTrk":
+            tracks.append(_parse_track(body, len(tracks)))
+
+    return {"ticks_per_quarter": division, "tracks": tracks}
+
+
+def skyline(notes):
+    """
+    Reduce overlapping notes to a single line by keeping the highest pitch at
+    each onset and cutting sustained notes off when the next note starts.
+
+    Parameters:
+        notes (list of tuples): (onset, duration, midi, ...) sorted by onset
+
+    Returns:
+        list of tuples: monophonic notes in the same format
+    """
+    line = []
+    for n in notes:
+        onset, duration, midi = n[0], n[1], n[2]
+        if line and line[-1][0] == onset:
+            if midi > line[-1][2]:
+                line[-1] = n
+            continue
+        if line and line[-1][0] + line[-1][1] > onset:
+            prev = line[-1]
+            if midi < prev[2]:
+                continue  # hidden under a higher sustained note
+            line[-1] = (prev[0], onset - prev[0]) + tuple(prev[2:])
+        line.append(n)
+    return line
+
+
+def _select_track(midi_data, track):
+    tracks = [t for t in midi_data["tracks"] if t["notes"]]
+    if not tracks:
+        raise ValueError("MIDI file contains no notes.")
+    if track is None:
+        if len(tracks) != 1:
+            names = [(t["index"], t["name"]) for t in tracks]
+            raise ValueError(
+                f"MIDI file has {len(tracks)} note tracks {names}; choose one by name or index."
+            )
+        return tracks[0]
+    if isinstance(track, int) or (isinstance(track, str) and track.strip().isdigit()):
+        idx = int(track)
+        for t in midi_data["tracks"]:
+            if t["index"] == idx:
+                return t
+        raise ValueError(f"Track index {idx} out of range.")
+    wanted = track.strip().lower()
+    for t in tracks:
+        if t["name"] and wanted in t["name"].lower():
+            return t
+    raise ValueError(f"No track matching '{track}'.")
+
+
+def spell_midi(midi, key="C", mode="major"):
+    """
+    Name a MIDI number using the spelling of the key's scale where possible
+    (e.g. 70 -> "Bb4" in F major), falling back to sharps.
+    """
+    pc = midi % 12
+    octave = midi // 12 - 1
+    for name in get_scale_notes(key, mode) or []:
+        if NOTE_TO_SEMITONE.get(name) == pc:
+            return f"{name}{octave}"
+    return f"{SEMITONE_TO_NOTE[pc]}{octave}"
+
+
+def extract_melody_from_midi(
+    path, track=None, channel=None, reduce="skyline", quantize=None, min_rest=0.25
+):
+    """
+    Extract a monophonic melody from a MIDI file straight into the
+    harmonizer's melody representation.
+
+    Parameters:
+        path (str): .mid file
+        track (int, str or None): Track index or (substring of) track name.
+            None only works when a single track contains notes.
+        channel (int or None): Keep only this MIDI channel (0-15)
+        reduce (str): "skyline" keeps the top note of overlapping notes;
+            None raises ValueError if notes overlap
+        quantize (float or None): Round onsets/durations to this many quarters
+        min_rest (float): Gaps shorter than this (in quarters) are treated as
+            articulation and absorbed into the preceding note
+
+    Returns:
+        dict with the same keys as xml_utils.extract_melody_from_xml:
+        melody (None for rests), rhythm, offsets, ties, key, mode,
+        key_signature, time_signature, part_name
+    """
+    with stage("midi.read", path=path):
+        midi_data = read_midi_file(path)
+    selected = _select_track(midi_data, track)
+    tpq = midi_data["ticks_per_quarter"]
+
+    notes = selected["notes"]
+    if channel is not None:
+        notes = [n for n in notes if n[4] == channel]
+        if not notes:
+            raise ValueError(
+                f"No notes on channel {channel} in track {selected['index']}."
+            )
+
+    if reduce == "skyline":
+        notes = skyline(notes)
+    else:
+        for prev, cur in zip(notes, notes[1:]):
+            if prev[0] + prev[1] > cur[0]:
+                raise ValueError("Overlapping notes found; use reduce='skyline'.")
+
+    # Work in integer ticks and convert once, so rhythms stay exact
+    grid = max(1, round(quantize * tpq)) if quantize else 1
+
+    def snap(ticks):
+        return round(ticks / grid) * grid
+
+    def to_quarters(ticks):
+        return round(ticks / tpq, 6)
+
+    # Meta events usually live in the conductor track (track 0)
+    time_sig = selected["time_signature"]
+    key_meta = selected["key_signature"]
+    for t in midi_data["tracks"]:
+        time_sig = time_sig or t["time_signature"]
+        key_meta = key_meta or t["key_signature"]
+
+    pc_weights = [0.0] * 12
+    for onset, duration, midi, _, _ in notes:
+        pc_weights[midi % 12] += duration
+    count("notes_read", len(notes))
+    with stage("key.estimate"):
+        tonic, mode = estimate_key(pc_weights)
+
+    key_sig = None
+    if key_meta is not None:
+        sharps, meta_mode = key_meta
+        table = _SHARPS_TO_MINOR if meta_mode == "minor" else _SHARPS_TO_MAJOR
+        key_sig = f"{table.get(sharps, 'C')} {meta_mode}"
+
+    events = []  # [name or None, start_tick, length_tick]
+    cursor = 0
+    min_gap = min_rest * tpq
+    for onset, duration, midi, _, _ in notes:
+        start = snap(onset)
+        length = snap(onset + duration) - start
+        if length <= 0:
+            continue
+        if events and events[-1][0] is not None and 0 < start - cursor < min_gap:
+            events[-1][2] += start - cursor
+            cursor = start
+        if start > cursor:
+            events.append([None, cursor, start - cursor])
+        events.append([spell_midi(midi, tonic, mode), start, length])
+        cursor = start + length
+
+    melody = [e[0] for e in events]
+    rhythm = [to_quarters(e[2]) for e in events]
+    offsets = [to_quarters(e[1]) for e in events]
+
+    return {
+        "melody": melody,
+        "rhythm": rhythm,
+        "offsets": offsets,
+        "ties": [None] * len(melody),
+        "key": tonic,
+        "mode": mode,
+        "key_signature": key_sig,
+        "time_signature": time_sig or "4/4",
+        "part_name": selected["name"] or f"Track {selected['index']}",
+    }
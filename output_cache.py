@@ -0,0 +1,231 @@
+# === output_cache.py ===
+# Content-addressed cache for exported harmonizer scores.
+#
+# A job's key is the SHA-256 of its parameters (melody, rhythm, key/mode,
+# structure command, layer settings) together with a code version - a hash
+# of the pipeline's source files and the music21 version - so a change to
+# either gives a new key and stale files are never served. Each entry is
+# stored under a name derived from the key (tintharm_<key>.xml / .mid), so
+# identical jobs always map to the same files and different jobs never
+# overwrite each other. Entries are evicted by age and then, least recently
+# used first, by total size.
+#
+#   python output_cache.py stats
+#   python output_cache.py evict --max-mb 200 --max-age-days 7
+#   python output_cache.py clear
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_CACHE_DIR = os.path.join("data", "cache", "outputs")
+DEFAULT_MAX_MB = 512
+DEFAULT_MAX_AGE_DAYS = 30
+EXTENSIONS = {"musicxml": ".xml", "midi": ".mid"}
+PREFIX = "tintharm_"
+KEY_LENGTH = 20  # hex digits kept in file names
+
+# Source files whose behaviour shapes the exported score
+CODE_FILES = (
+    "main.py",
+    "utils.py",
+    "melody_utils.py",
+    "harmony_utils.py",
+    "structure_utils.py",
+    "voicing.py",
+    "variants.py",
+    "output_cache.py",
+)
+_code_version = None
+
+
+def code_version():
+    """Hash of CODE_FILES plus the music21 version (computed once)."""
+    global _code_version
+    if _code_version is None:
+        from importlib.metadata import PackageNotFoundError, version
+
+        digest = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in CODE_FILES:
+            path = os.path.join(root, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    digest.update(name.encode() + b"\0" + f.read())
+        try:
+            digest.update(version("music21").encode())
+        except PackageNotFoundError:
+            pass
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def job_key(params):
+    """
+    Cache key for a job: SHA-256 of the JSON-encoded parameters (any
+    JSON-serializable dict; tuples count as lists) and code_version().
+    """
+    payload = json.dumps({"params": params, "code": code_version()}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:KEY_LENGTH]
+
+
+def export_bytes(score, fmt):
+    """MusicXML or MIDI file contents for a music21 score."""
+    if fmt == "musicxml":
+        from music21.musicxml.m21ToXml import GeneralObjectExporter
+
+        return GeneralObjectExporter(score).parse()
+    if fmt == "midi":
+        from music21.midi.translate import streamToMidiFile
+
+        return streamToMidiFile(score).writestr()
+    raise ValueError(f"Unknown format '{fmt}' (use 'musicxml' or 'midi').")
+
+
+class OutputCache:
+    def __init__(
+        self,
+        cache_dir=DEFAULT_CACHE_DIR,
+        max_mb=DEFAULT_MAX_MB,
+        max_age_days=DEFAULT_MAX_AGE_DAYS,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = None if max_mb is None else max_mb * 1024 * 1024
+        self.max_age = None if max_age_days is None else max_age_days * 86400
+
+    def path(self, key, fmt):
+        if fmt not in EXTENSIONS:
+            raise ValueError(f"Unknown format '{fmt}' (use 'musicxml' or 'midi').")
+        return os.path.join(self.cache_dir, f"{PREFIX}{key}{EXTENSIONS[fmt]}")
+
+    def get(self, key, formats):
+        """
+        Paths of the cached files ({format: path}) if every format is
+        present, else None. A hit refreshes the entry's mtime (LRU order).
+        """
+        paths = {fmt: self.path(key, fmt) for fmt in formats}
+        now = time.time()
+        try:
+            for path in paths.values():
+                os.utime(path, (now, now))
+        except FileNotFoundError:
+            return None
+        return paths
+
+    def read(self, key, formats):
+        """Cached file contents ({format: bytes}) or None on a miss."""
+        paths = self.get(key, formats)
+        if paths is None:
+            return None
+        try:
+            files = {}
+            for fmt, path in paths.items():
+                with open(path, "rb") as f:
+                    files[fmt] = f.read()
+            return files
+        except FileNotFoundError:  # evicted by another process meanwhile
+            return None
+
+    def put(self, key, files, meta=None):
+        """
+        Store {format: bytes} (and optional JSON metadata next to them) and
+        return {format: path}. Files are written to a temporary name and
+        renamed, so readers in other processes never see half a file.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        paths = {}
+        for fmt, data in files.items():
+            paths[fmt] = self.path(key, fmt)
+            _write_atomic(paths[fmt], data)
+        if meta is not None:
+            meta_path = os.path.join(self.cache_dir, f"{PREFIX}{key}.json")
+            _write_atomic(
+                meta_path,
+                json.dumps(meta, sort_keys=True, default=list).encode("utf-8"),
+            )
+        self.evict()
+        return paths
+
+    def entries(self):
+        """{key: (total bytes, newest mtime, [paths])} for every cached job."""
+        entries = {}
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for item in os.scandir(self.cache_dir):
+            if not item.name.startswith(PREFIX) or ".tmp" in item.name:
+                continue
+            key = item.name[len(PREFIX) :].split(".")[0]
+            st = item.stat()
+            size, mtime, paths = entries.get(key, (0, 0.0, []))
+            entries[key] = (
+                size + st.st_size,
+                max(mtime, st.st_mtime),
+                paths + [item.path],
+            )
+        return entries
+
+    def evict(self):
+        """Drop entries older than max_age, then the least recently used
+        ones until the cache fits in max_bytes. Returns the number removed."""
+        entries = self.entries()
+        now = time.time()
+        doomed = set()
+        if self.max_age is not None:
+            doomed = {
+                k for k, (_, mtime, _) in entries.items() if now - mtime > self.max_age
+            }
+        if self.max_bytes is not None:
+            total = sum(size for k, (size, _, _) in entries.items() if k not in doomed)
+            for key in sorted(entries, key=lambda k: entries[k][1]):
+                if total <= self.max_bytes:
+                    break
+                if key not in doomed:
+                    doomed.add(key)
+                    total -= entries[key][0]
+        for key in doomed:
+            for path in entries[key][2]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return len(doomed)
+
+    def clear(self):
+        entries = self.entries()
+        for _, _, paths in entries.values():
+            for path in paths:
+                os.remove(path)
+        return len(entries)
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Inspect or trim the harmonizer output cache."
+    )
+    parser.add_argument("command", choices=["stats", "evict", "clear"])
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_MB)
+    parser.add_argument("--max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS)
+    args = parser.parse_args(argv)
+
+    cache = OutputCache(args.cache_dir, args.max_mb, args.max_age_days)
+    if args.command == "evict":
+        print(f"🧹 Evicted {cache.evict()} cached jobs.")
+    elif args.command == "clear":
+        print(f"🧹 Removed {cache.clear()} cached jobs.")
+    entries = cache.entries()
+    size = sum(s for s, _, _ in entries.values()) / (1024 * 1024)
+    print(f"📦 {len(entries)} cached jobs, {size:.1f} MB in {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Throughput benchmark and equivalence check for the harmonizer functions.
+
+Melody lines are taken from the data/xml corpus (the top line of every part,
+spelled in its estimated key), replicated up to --notes and run through each
+stage of the pipeline; the report is in notes per second. Before timing, the
+outputs on a fixed set of corpus lines are compared with the digests stored
+in tests/data/harmonizer_reference.json, so a change in behaviour shows up
+next to the speed-up. A replacement implementation can be tried against the
+current one with --candidate: its outputs must match before it is timed.
+
+Usage:
+    python scripts/bench_harmonizer.py [--notes 200000] [--score-notes 2000] [--repeat 3]
+    python scripts/bench_harmonizer.py --candidate t_voice=fast_tvoice:apply_t_voice
+    python scripts/bench_harmonizer.py --update-reference
+"""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import importlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(REPO_ROOT)
+
+from melody_extraction import skyline, spell_midi, supported_key  # noqa: E402
+from utils import get_scale_notes  # noqa: E402
+from xml_stream import iter_parts  # noqa: E402
+
+DEFAULT_FOLDER = os.path.join(REPO_ROOT, "data", "xml")
+REFERENCE_PATH = os.path.join(REPO_ROOT, "tests", "data", "harmonizer_reference.json")
+# Small, stable inputs for the equivalence check
+REFERENCE_FILES = [
+    "Road_Horn.musicxml",
+    "Stufen_excerpt1.musicxml",
+    "Reise_excerpt1.musicxml",
+]
+REFERENCE_SCORE_LINES = 4  # score building/export only on the first few lines
+MAX_LINE_NOTES = 256
+MIN_LINE_NOTES = 8
+
+
+# --- Corpus melodies ------------------------------------------------------
+
+
+def corpus_melodies(paths, max_notes=MAX_LINE_NOTES):
+    """
+    One melody dict per part of every file (its skyline), in the shape of
+    extract_melody_from_xml: melody (note names, None for rests), rhythm,
+    key, mode, plus part_name and t_voice (T-1 below, from the current
+    apply_t_voice_with_pattern, as the input for score building).
+    """
+    from main import apply_t_voice_with_pattern
+
+    lines = []
+    for path in paths:
+        for part in iter_parts(path):
+            midi, durations, _ = skyline(part)
+            line = list(zip(midi.tolist(), durations.tolist()))[:max_notes]
+            pitched = [(m, d) for m, d in line if 12 <= m < 120]
+            if len(pitched) < MIN_LINE_NOTES:
+                continue
+            pc_weights = [0.0] * 12
+            for m, d in pitched:
+                pc_weights[m % 12] += d
+            key, mode = supported_key(pc_weights)
+            scale = get_scale_notes(key, mode)
+            melody = [spell_midi(m, scale) if 12 <= m < 120 else None for m, _ in line]
+            lines.append(
+                {
+                    "melody": melody,
+                    "rhythm": [float(d) for _, d in line],
+                    "key": key,
+                    "mode": mode,
+                    "part_name": f"{os.path.basename(path)}:{part['name']}",
+                    "t_voice": apply_t_voice_with_pattern(
+                        melody, key, mode, 1, "below"
+                    ),
+                }
+            )
+    return lines
+
+
+def replicate(lines, total_notes):
+    """Cycle through the lines until they hold at least total_notes events."""
+    out, n = [], 0
+    while lines and n < total_notes:
+        for line in lines:
+            out.append(line)
+            n += len(line["melody"])
+            if n >= total_notes:
+                break
+    return out
+
+
+# --- Cases ----------------------------------------------------------------
+
+
+def _run_transpose(fn, line):
+    return fn(line["melody"], 2, key=line["key"], mode=line["mode"])
+
+
+def _run_t_voice(fn, line):
+    return fn(
+        line["melody"], line["key"], line["mode"], triad_level=1, direction="below"
+    )
+
+
+def _run_harmonize(fn, line):
+    out = []
+    for n in line["melody"]:
+        if n is None:
+            out.append(None)
+            continue
+        try:
+            out.append(
+                fn(
+                    n,
+                    line["key"],
+                    line["mode"],
+                    tintinnabuli_levels=[-1, -2],
+                    extra_m_intervals=[-9],
+                )
+            )
+        except ValueError as e:  # chromatic notes have no scale degree
+            out.append(f"ValueError: {e}")
+    return out
+
+
+def _run_structure(fn, line):
+    return [
+        fn(line["melody"], line["rhythm"], (cmd,), key=line["key"], mode=line["mode"])
+        for cmd in ("retrograde", "none")
+    ]
+
+
+def _run_score(fn, line):
+    score = fn(line["melody"], line["t_voice"], key_sig=line["key"], mode=line["mode"])
+    return [
+        [
+            (n.nameWithOctave if n.isNote else None, float(n.quarterLength))
+            for n in part.notesAndRests
+        ]
+        for part in score.parts
+    ]
+
+
+def _build_score(line):
+    from main import build_tintinnabuli_score
+
+    return dict(
+        line,
+        score=build_tintinnabuli_score(
+            line["melody"], line["t_voice"], key_sig=line["key"], mode=line["mode"]
+        ),
+    )
+
+
+def _midi_events(data):
+    """(track, onset in quarters, on/off, pitch, velocity) of every note event."""
+    from music21 import midi
+
+    mf = midi.MidiFile()
+    mf.readstr(data)
+    events = []
+    for t, track in enumerate(mf.tracks):
+        tick = 0
+        for event in track.events:
+            if isinstance(event, midi.DeltaTime):
+                tick += event.time
+            elif event.isNoteOn() or event.isNoteOff():
+                on = event.isNoteOn() and event.velocity > 0
+                events.append(
+                    (t, tick / mf.ticksPerQuarterNote, on, event.pitch, event.velocity)
+                )
+    return events
+
+
+def _run_export(fn, line):
+    xml = fn(line["score"], "musicxml").decode("utf-8")
+    # Part ids are random, the encoding block holds the date and the music21
+    # version, and the DTD/schema version follows music21 too
+    xml = re.sub(r'id="P[0-9a-f]+"', 'id="P"', xml)
+    xml = re.sub(r"<encoding>.*?</encoding>", "", xml, flags=re.S)
+    xml = re.sub(r"<!DOCTYPE[^>]*>", "", xml)
+    xml = re.sub(r'<score-partwise version="[^"]*">', "<score-partwise>", xml)
+    # MIDI: the notes, not the bytes (headers and meta events vary by version)
+    return [xml, _midi_events(fn(line["score"], "midi"))]
+
+
+# name -> (current implementation, runner, setup before timing, score-sized)
+CASES = {
+    "transpose": ("main:transpose_melody_diatonic", _run_transpose, None, False),
+    "t_voice": ("main:apply_t_voice_with_pattern", _run_t_voice, None, False),
+    "harmonize": ("harmony_utils:harmonize_melody", _run_harmonize, None, False),
+    "structure": ("structure_utils:apply_structure", _run_structure, None, False),
+    "score_build": ("main:build_tintinnabuli_score", _run_score, None, True),
+    "export": ("output_cache:export_bytes", _run_export, _build_score, True),
+}
+
+
+def resolve(target):
+    module, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def run_case(name, lines, fn=None):
+    """Outputs of one case over the lines (stdout from the functions muted)."""
+    default, runner, setup, _ = CASES[name]
+    fn = fn or resolve(default)
+    if setup:
+        lines = [setup(line) for line in lines]
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [runner(fn, line) for line in lines]
+
+
+def digest(outputs):
+    return hashlib.sha256(
+        json.dumps(outputs, sort_keys=True, default=repr).encode("utf-8")
+    ).hexdigest()
+
+
+def reference_lines(folder=DEFAULT_FOLDER):
+    return corpus_melodies([os.path.join(folder, f) for f in REFERENCE_FILES])
+
+
+def compute_reference(lines, cases=None, overrides=None):
+    """Digest of every case's outputs on the reference lines."""
+    overrides = overrides or {}
+    result = {}
+    for name in cases or CASES:
+        subset = lines[:REFERENCE_SCORE_LINES] if CASES[name][3] else lines
+        result[name] = digest(run_case(name, subset, overrides.get(name)))
+    return result
+
+
+def check_reference(lines=None, reference_path=REFERENCE_PATH, overrides=None):
+    """
+    Compare the current outputs (or the overriding implementations) with the
+    stored reference. Returns the list of mismatching case names.
+    """
+    lines = lines if lines is not None else reference_lines()
+    with open(reference_path) as f:
+        reference = json.load(f)
+    if reference["inputs"] != digest(lines):
+        raise ValueError("Reference inputs changed; re-run with --update-reference.")
+    current = compute_reference(lines, reference["cases"], overrides)
+    return [
+        name for name, value in reference["cases"].items() if current[name] != value
+    ]
+
+
+def write_reference(lines, reference_path=REFERENCE_PATH):
+    os.makedirs(os.path.dirname(reference_path), exist_ok=True)
+    data = {
+        "files": REFERENCE_FILES,
+        "inputs": digest(lines),
+        "cases": compute_reference(lines),
+    }
+    with open(reference_path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+# --- Timing ---------------------------------------------------------------
+
+
+def time_case(name, lines, fn=None, repeat=3):
+    """Best wall time over `repeat` runs; returns (seconds, notes)."""
+    default, runner, setup, _ = CASES[name]
+    fn = fn or resolve(default)
+    if setup:
+        lines = [setup(line) for line in lines]
+    notes = sum(len(line["melody"]) for line in lines)
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for line in lines:
+                runner(fn, line)
+            best = min(best, time.perf_counter() - start)
+    return best, notes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--folder", default=DEFAULT_FOLDER)
+    parser.add_argument(
+        "--notes", type=int, default=200_000, help="events per fast case"
+    )
+    parser.add_argument(
+        "--score-notes", type=int, default=2_000, help="events per score case"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cases", nargs="*", choices=list(CASES), default=list(CASES))
+    parser.add_argument(
+        "--candidate",
+        action="append",
+        default=[],
+        metavar="CASE=module:function",
+        help="Implementation to compare with the current one",
+    )
+    parser.add_argument(
+        "--update-reference",
+        action="store_true",
+        help="Store the current outputs as the reference",
+    )
+    args = parser.parse_args(argv)
+
+    candidates = {}
+    for spec in args.candidate:
+        name, _, target = spec.partition("=")
+        if name not in CASES or not target:
+            parser.error(f"Bad --candidate '{spec}' (cases: {', '.join(CASES)})")
+        candidates[name] = resolve(target)
+
+    ref_lines = reference_lines(args.folder)
+    if args.update_reference:
+        write_reference(ref_lines)
+        print(f"[INFO] Reference written to {REFERENCE_PATH}")
+        return 0
+
+    failed = False
+    mismatched = check_reference(ref_lines)
+    for name in mismatched:
+        print(f"[WARN] {name}: output differs from the stored reference")
+        failed = True
+    for name, fn in candidates.items():
+        subset = ref_lines[:REFERENCE_SCORE_LINES] if CASES[name][3] else ref_lines
+        if run_case(name, subset, fn) != run_case(name, subset):
+            print(f"[ERROR] Candidate for {name} changes the output; not timed.")
+            failed = True
+            candidates[name] = None
+
+    paths = sorted(glob.glob(os.path.join(args.folder, "*.musicxml")))
+    corpus = corpus_melodies(paths)
+    print(f"[INFO] {len(corpus)} corpus lines from {len(paths)} files")
+
+    print(f"{'case':<12} {'notes':>9} {'seconds':>9} {'notes/s':>12}")
+    for name in args.cases:
+        lines = replicate(corpus, args.score_notes if CASES[name][3] else args.notes)
+        seconds, notes = time_case(name, lines, repeat=args.repeat)
+        print(f"{name:<12} {notes:>9} {seconds:>9.3f} {notes / seconds:>12,.0f}")
+        if candidates.get(name):
+            fast, _ = time_case(name, lines, candidates[name], repeat=args.repeat)
+            print(
+                f"{'  candidate':<12} {notes:>9} {fast:>9.3f} {notes / fast:>12,.0f}"
+                f"  ({seconds / fast:.2f}x)"
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
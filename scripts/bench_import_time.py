@@ -0,0 +1,91 @@
+"""
+Import-time benchmark for the CLI entry points.
+
+Imports each module in a fresh interpreter, reports the wall time and which
+heavy dependencies (music21, pandas, sklearn, ...) were pulled in, and exits
+non-zero if a module loads a heavy dependency or exceeds its budget.
+
+Usage:
+    python scripts/bench_import_time.py [--budget-ms 150] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+ENTRY_MODULES = [
+    "main",
+    "harmonizer_stream",
+    "variants",
+    "tintharm",
+    "melody_utils",
+    "harmony_utils",
+    "structure_utils",
+    "xml_utils",
+    "midi_utils",
+    "stylefinder_dataset",
+    "stylefinder_visualizer",
+    "stylefinder_index",
+    "stylefinder_clusters",
+]
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+from lazy_imports import loaded_heavy_modules
+print(json.dumps({{"ms": elapsed * 1000, "heavy": loaded_heavy_modules()}}))
+"""
+
+
+def measure_import(module, repeat=5):
+    """
+    Import `module` in `repeat` fresh interpreters.
+    Returns (median milliseconds, heavy modules loaded).
+    """
+    times = []
+    heavy = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module)],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result["ms"])
+        heavy = result["heavy"]
+    return statistics.median(times), heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("modules", nargs="*", default=ENTRY_MODULES)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        ms, heavy = measure_import(module, args.repeat)
+        status = "ok"
+        if heavy:
+            status = f"FAIL (loaded {', '.join(heavy)})"
+            failed = True
+        elif ms > args.budget_ms:
+            status = f"FAIL (over {args.budget_ms:.0f} ms budget)"
+            failed = True
+        print(f"{module:<24} {ms:8.1f} ms  {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,80 +1,56 @@
-from music21 import converter, interval, key, pitch
+import sys
+import os
 
-# Load the concert-pitch score
-score = converter.parse("data/Road_Horn.musicxml")
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-# Define the key signatures at each House entry
-house_keys = {
-    9: 'C# minor',
-    24: 'C# minor',
-    38: 'C# minor',
-    48: 'F minor',
-    59: 'F minor',
-    66: 'F minor',
-    76: 'C# major',
-    87: 'C# major'
-}
-
-# Define the House bars
-house_bars = list(house_keys.keys())
-results = []
-
-# Locate parts
-piano_part = None
-horn_part = None
-for p in score.parts:
-    name = (p.partName or "").lower()
-    if 'piano' in name:
-        piano_part = p
-    elif 'horn' in name:
-        horn_part = p
-
-if not piano_part:
-    raise ValueError("Piano part not found.")
+from analysis.key_tracker import key_at, track_keys
+from analysis.rules import HOUSE_BASS_RULE, run_rules
+from analysis.score_index import load_score_index
 
-# Main analysis loop
-for bar in house_bars:
-    tonic, mode_type = house_keys[bar].split()
-    current_key = key.Key(tonic, mode_type)
-    
-    m_note = None
-    bass_note = None
+# Concert-pitch score
+SCORE = "data/xml/Road_Horn.musicxml"
 
-    # Step 1: Find last M-note before House
-    if bar == 9:
-        # special case: intro M-line (bar 8), in treble clef piano
-        for m in piano_part.measures(8, 9).getElementsByClass('Measure'):
-            for n in m.recurse().notes:
-                if n.offset < m.highestTime:
-                    m_note = n
-    else:
-        if horn_part:
-            for m in horn_part.measures(bar - 2, bar).getElementsByClass('Measure'):
-                for n in m.recurse().notes:
-                    if n.offset < m.highestTime:
-                        m_note = n
-
-    # Step 2: Find the lowest bass note in final bar of House (bar + 1)
-    for m in piano_part.measures(bar + 1, bar + 2).getElementsByClass('Measure'):
-        for n in m.recurse().notes:
-            if n.offset < m.highestTime and n.pitch:
-                if bass_note is None or n.pitch.midi < bass_note.pitch.midi:
-                    bass_note = n
-
-    # Step 3: Evaluate interval rule
-    if m_note and bass_note:
-        try:
-            intvl = interval.Interval(noteStart=bass_note, noteEnd=m_note)
-            rule_met = intvl.simpleName in ['m3', 'M3']
-        except Exception:
-            rule_met = False
-    else:
-        rule_met = False
-
-    results.append((bar, m_note.nameWithOctave if m_note else None,
-                    bass_note.nameWithOctave if bass_note else None,
-                    rule_met))
+# Key at each House entry (checked by hand, for reference in the printout)
+house_keys = {
+    9: "C# minor",
+    24: "C# minor",
+    38: "C# minor",
+    48: "F minor",
+    59: "F minor",
+    66: "F minor",
+    76: "C# major",
+    87: "C# major",
+}
+house_bars = list(house_keys)
+
+# The key tracker's opinion, printed next to it. At the pivot bars 48 and 76
+# its window still reports the key being left.
+tracked = track_keys(load_score_index(SCORE))
+tracked_keys = {bar: key_at(tracked, bar) for bar in house_bars}
+
+rules = [
+    # Bass (lowest piano note in bars N+1..N+2) a third below the last horn
+    # M-note in bars N-2..N
+    dict(HOUSE_BASS_RULE, bars=[b for b in house_bars if b != 9]),
+    # special case: intro M-line (bars 8-9) is in the piano, not the horn.
+    # Both staves form one voice, so the M-note is the last note of either
+    # (E5, treble staff). The music21 version of this script kept only the
+    # last "piano" part it saw, the bass staff, and reported G#2 here.
+    dict(
+        HOUSE_BASS_RULE,
+        name="house_bass_third_intro",
+        upper={"voice": "piano", "bar": 0, "select": "last", "lookback": 1},
+        bars=[9],
+    ),
+]
+
+results = run_rules([SCORE], rules, workers=1).sort_values("bar")
+results = results.astype(object).where(results.notna(), None)
 
 # Output results
-for r in results:
-    print(f"House at bar {r[0]}: M-note={r[1]}, Bass={r[2]}, Rule Met={r[3]}")
+for r in results.itertuples():
+    print(
+        f"House at bar {r.bar} ({house_keys[r.bar]}, tracker: "
+        f"{tracked_keys[r.bar]}): M-note={r.upper_note}, "
+        f"Bass={r.lower_note}, Rule Met={r.passed}"
+    )
@@ -0,0 +1,170 @@
+# === scripts/load_test_service.py ===
+# Load test for harmonizer_service.py: N concurrent keep-alive clients send
+# /harmonize requests and the script reports throughput and latency
+# percentiles.
+#
+#   python harmonizer_service.py --workers 4 &
+#   python scripts/load_test_service.py --requests 2000 --concurrency 32
+#
+# --spawn starts a service in-process on a free port instead.
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from harmonizer_service import DEFAULT_HOST, DEFAULT_PORT, serve  # noqa: E402
+from output_cache import DEFAULT_CACHE_DIR  # noqa: E402
+
+SPIEGEL_MELODY = "A4 G4 F4 E4 D4 C4 D4 E4 F4 G4 A4 Bb4 A4 G4 F4 E4"
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    idx = min(
+        len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1))))
+    )
+    return sorted_values[idx]
+
+
+def free_port(host):
+    """A port the OS reports as free on `host` (bound to port 0 and released)."""
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+async def _client(host, port, payload, count, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = (
+        f"POST /harmonize HTTP/1.1\r\nHost: {host}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+    ).encode("latin-1") + payload
+    try:
+        for _ in range(count):
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if b" 200 " not in status_line:
+                errors.append(status_line.decode("latin-1").strip())
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, total, concurrency, payload):
+    latencies, errors = [], []
+    per_client = [
+        total // concurrency + (1 if i < total % concurrency else 0)
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(_client(host, port, payload, n, latencies, errors) for n in per_client if n)
+    )
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def build_payload(args):
+    body = {
+        "melody": SPIEGEL_MELODY,
+        "key": "F",
+        "mode": "major",
+        "m_parallel": [-3],
+        "t_level": 1,
+        "t_direction": "below",
+    }
+    if args.export:
+        body["formats"] = ["musicxml", "midi"]
+    return json.dumps(body).encode("utf-8")
+
+
+async def _main(args):
+    host, port = args.host, args.port
+    server_task = None
+    if args.spawn:
+        port = free_port(host)
+        ready = asyncio.Event()
+        cache_dir = None if args.no_cache else DEFAULT_CACHE_DIR
+        server_task = asyncio.create_task(
+            serve(host, port, args.workers, ready=ready, cache_dir=cache_dir)
+        )
+        await ready.wait()
+
+    payload = build_payload(args)
+    try:
+        # Warm-up pass so worker caches are hot before timing
+        await run_load(
+            host,
+            port,
+            min(args.concurrency * 2, args.requests),
+            args.concurrency,
+            payload,
+        )
+        latencies, errors, elapsed = await run_load(
+            host, port, args.requests, args.concurrency, payload
+        )
+    finally:
+        if server_task is not None:
+            server_task.cancel()
+            try:
+                await server_task
+            except asyncio.CancelledError:
+                pass
+
+    latencies.sort()
+    ms = [x * 1000 for x in latencies]
+    print(f"Requests:    {len(latencies)} ({len(errors)} errors) in {elapsed:.2f} s")
+    print(f"Throughput:  {len(latencies) / elapsed:.1f} req/s")
+    print(
+        f"Latency ms:  p50 {percentile(ms, 50):.2f}  p95 {percentile(ms, 95):.2f}  "
+        f"p99 {percentile(ms, 99):.2f}  max {ms[-1] if ms else float('nan'):.2f}"
+    )
+    if errors:
+        print(f"[WARN] First error: {errors[0]}")
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the harmonizer service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="ignored with --spawn"
+    )
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--export", action="store_true", help="Also request MusicXML/MIDI bytes"
+    )
+    parser.add_argument(
+        "--spawn", action="store_true", help="Start a service in-process first"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Workers for --spawn")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Rebuild exported files on every request (--spawn)",
+    )
+    args = parser.parse_args(argv)
+    sys.exit(asyncio.run(_main(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# === stylefinder_clusters.py ===
+# Unsupervised grouping of works in the StyleFinder feature table.
+#
+# Features are standardized, then clustered with mini-batch k-means (k chosen
+# by silhouette score, candidate k values fitted in parallel) or DBSCAN for
+# density-based groups with a noise label (-1). Silhouette scores are computed
+# on a bounded random sample and DBSCAN uses a KD-tree, so memory stays linear
+# in the number of rows; no pairwise distance matrix is built.
+# Labels are written back to the feature CSV as a "cluster" column.
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy_imports import lazy_import
+from stylefinder_dataset import FEATURE_COLUMNS, OUTPUT_CSV
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+cluster = lazy_import("sklearn.cluster")
+metrics = lazy_import("sklearn.metrics")
+
+SILHOUETTE_SAMPLE = 2000
+DEFAULT_K_RANGE = (2, 8)
+
+
+def standardize(df, columns=FEATURE_COLUMNS):
+    X = df[list(columns)].to_numpy(dtype=float)
+    std = X.std(axis=0)
+    return (X - X.mean(axis=0)) / np.where(std > 0, std, 1.0)
+
+
+def kmeans_labels(X, k, seed=0):
+    model = cluster.MiniBatchKMeans(
+        n_clusters=k, random_state=seed, n_init=3, batch_size=1024
+    )
+    return model.fit_predict(X)
+
+
+def silhouette(X, labels, seed=0):
+    """
+    Silhouette score on at most SILHOUETTE_SAMPLE rows (None if undefined).
+    Noise points (label -1) are left out.
+    """
+    keep = labels >= 0
+    if len(np.unique(labels[keep])) < 2 or keep.sum() <= len(np.unique(labels[keep])):
+        return None
+    sample = min(SILHOUETTE_SAMPLE, int(keep.sum()))
+    return float(
+        metrics.silhouette_score(
+            X[keep], labels[keep], sample_size=sample, random_state=seed
+        )
+    )
+
+
+def _score_k(args):
+    X, k, seed = args
+    labels = kmeans_labels(X, k, seed)
+    return k, silhouette(X, labels, seed), labels
+
+
+def choose_k(X, k_range=DEFAULT_K_RANGE, workers=None, seed=0):
+    """
+    Fit k-means for every k in k_range (inclusive), one k per worker.
+
+    Returns:
+        (best k, its labels, {k: silhouette score})
+    """
+    k_min, k_max = k_range
+    ks = [k for k in range(k_min, k_max + 1) if k < len(X)]
+    if not ks:
+        raise ValueError(f"Need more than {k_min} works to cluster (have {len(X)}).")
+    jobs = [(X, k, seed) for k in ks]
+    if workers == 1 or len(jobs) == 1:
+        results = list(map(_score_k, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_score_k, jobs))
+
+    scores = {k: s for k, s, _ in results}
+    best_k, _, best_labels = max(results, key=lambda r: -1.0 if r[1] is None else r[1])
+    return best_k, best_labels, scores
+
+
+def dbscan_labels(X, eps=0.8, min_samples=3):
+    model = cluster.DBSCAN(eps=eps, min_samples=min_samples, algorithm="kd_tree")
+    return model.fit_predict(X)
+
+
+def cluster_works(
+    df,
+    method="kmeans",
+    k=None,
+    k_range=DEFAULT_K_RANGE,
+    eps=0.8,
+    min_samples=3,
+    workers=None,
+    seed=0,
+):
+    """
+    Cluster the rows of a feature table.
+
+    Parameters:
+        df (DataFrame): feature table with FEATURE_COLUMNS
+        method (str): "kmeans" or "dbscan"
+        k (int): fixed number of clusters (default: chosen by silhouette)
+        k_range (tuple): inclusive (min, max) k to try
+        eps, min_samples: DBSCAN neighbourhood in standardized units
+        workers (int): processes used to try k values
+
+    Returns:
+        (copy of df with a "cluster" column, {k: silhouette} or {})
+    """
+    df = df.dropna(subset=list(FEATURE_COLUMNS)).copy()
+    X = standardize(df)
+    scores = {}
+    if method == "kmeans":
+        if k is None:
+            k, labels, scores = choose_k(X, k_range, workers, seed)
+        else:
+            labels = kmeans_labels(X, k, seed)
+            scores = {k: silhouette(X, labels, seed)}
+    elif method == "dbscan":
+        labels = dbscan_labels(X, eps, min_samples)
+    else:
+        raise ValueError(
+            f"Unknown clustering method '{method}' (use 'kmeans' or 'dbscan')."
+        )
+    df["cluster"] = labels
+    return df, scores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Cluster works in the StyleFinder feature table."
+    )
+    parser.add_argument("--csv", default=OUTPUT_CSV)
+    parser.add_argument("--method", choices=("kmeans", "dbscan"), default="kmeans")
+    parser.add_argument(
+        "-k", type=int, default=None, help="Fixed k (default: best silhouette)"
+    )
+    parser.add_argument("--k-min", type=int, default=DEFAULT_K_RANGE[0])
+    parser.add_argument("--k-max", type=int, default=DEFAULT_K_RANGE[1])
+    parser.add_argument("--eps", type=float, default=0.8)
+    parser.add_argument("--min-samples", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    table = pd.read_csv(args.csv)
+    clustered, scores = cluster_works(
+        table,
+        method=args.method,
+        k=args.k,
+        k_range=(args.k_min, args.k_max),
+        eps=args.eps,
+        min_samples=args.min_samples,
+        workers=args.workers,
+    )
+    for k, s in sorted(scores.items()):
+        print(f"k={k}: silhouette {'n/a' if s is None else f'{s:.3f}'}")
+
+    # Rows without features keep an empty cluster cell
+    table["cluster"] = clustered["cluster"].reindex(table.index).astype("Int64")
+    table.to_csv(args.csv, index=False)
+    print(f"📁 {clustered['cluster'].nunique()} clusters written to: {args.csv}")
+    for label, names in clustered.groupby("cluster")["filename"]:
+        print(f" - cluster {label}: {len(names)} works (e.g. {names.iloc[0]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,28 @@
+import argparse
 import os
-import pandas as pd
-from music21 import converter, interval, pitch, note
+
+from lazy_imports import lazy_import
+from memory_utils import peak_rss_mb, run_with_memory_limit
+from utils import estimate_key
+from xml_stream import iter_parts
+
+pd = lazy_import("pandas")
+converter = lazy_import("music21.converter")
+note = lazy_import("music21.note")
 
 # === CONFIG ===
 XML_FOLDER = "data/xml/"
 OUTPUT_CSV = "stylefinder_features.csv"
 
+# Numeric columns used for projection and similarity search
+FEATURE_COLUMNS = [
+    "total_notes",
+    "pitch_range",
+    "avg_interval",
+    "note_density",
+    "avg_duration",
+]
+
 CATEGORIES = {
     "Road_Orch.musicxml": "inward",
     "Reise_intro.musicxml": "minimalist",
@@ -58,17 +75,111 @@ def extract_features_from_score(file_path):
         return None
 
 
-def main():
+def extract_features_low_memory(file_path):
+    """
+    Same features as extract_features_from_score, read one part at a time
+    with xml_stream instead of building the whole music21 score. The key is
+    estimated from duration-weighted pitch classes (utils.estimate_key).
+    """
+    try:
+        total = 0
+        lowest, highest = None, None
+        interval_sum = 0
+        previous = None
+        duration_sum = 0.0
+        score_length = 0.0
+        pc_weights = [0.0] * 12
+
+        for part in iter_parts(file_path):
+            for _, _, duration, midi, is_chord, _ in part["notes"]:
+                if is_chord:
+                    continue
+                total += 1
+                lowest = midi if lowest is None else min(lowest, midi)
+                highest = midi if highest is None else max(highest, midi)
+                if previous is not None:
+                    interval_sum += abs(midi - previous)
+                previous = midi
+                duration_sum += duration
+                pc_weights[midi % 12] += duration
+            if part["measures"]:
+                _, offset, length = part["measures"][-1]
+                score_length = max(score_length, offset + length)
+
+        if not total:
+            return None  # Skip empty files
+
+        tonic, mode = estimate_key(pc_weights)
+        return {
+            "filename": os.path.basename(file_path),
+            "total_notes": total,
+            "pitch_range": highest - lowest,
+            "avg_interval": interval_sum / (total - 1) if total > 1 else 0,
+            "note_density": total / score_length if score_length else 0,
+            "avg_duration": duration_sum / total,
+            "key": tonic,
+            "mode": mode,
+            "category": CATEGORIES.get(os.path.basename(file_path), "unspecified"),
+        }
+
+    except Exception as e:
+        print(f"[ERROR] Skipping {file_path}: {e}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extract StyleFinder features from a score folder."
+    )
+    parser.add_argument("folder", nargs="?", default=XML_FOLDER)
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        help="Stream each file part by part instead of loading it into music21",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=float,
+        default=None,
+        metavar="MB",
+        help="Run files in parallel while their estimated memory fits under MB",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
     print("🎵 StyleFinder Dataset Extractor Starting...\n")
     all_features = []
-
-    for filename in os.listdir(XML_FOLDER):
-        if filename.endswith(".musicxml") or filename.endswith(".xml"):
-            full_path = os.path.join(XML_FOLDER, filename)
-            print(f"Processing: {filename}")
-            feats = extract_features_from_score(full_path)
+    extract = (
+        extract_features_low_memory if args.low_memory else extract_features_from_score
+    )
+    paths = [
+        os.path.join(args.folder, filename)
+        for filename in sorted(os.listdir(args.folder))
+        if filename.endswith(".musicxml") or filename.endswith(".xml")
+    ]
+
+    def report(full_path, peak):
+        peak_text = f"{peak:.0f} MB" if peak is not None else "n/a"
+        print(f"Processed: {os.path.basename(full_path)} (peak RSS {peak_text})")
+
+    if args.memory_limit is None and args.workers is None:
+        # In-process: the peak is this process's high-water mark so far, so a
+        # file only shows up in it when it needs more than every earlier one
+        for full_path in paths:
+            feats = extract(full_path)
+            report(full_path, peak_rss_mb())
+            if feats:
+                all_features.append(feats)
+    else:
+        # One process per file: per-file peak RSS, memory freed after each
+        mode = "stream" if args.low_memory else "music21"
+        for full_path, feats, peak in run_with_memory_limit(
+            extract, paths, args.memory_limit, args.workers, mode=mode
+        ):
+            report(full_path, peak)
             if feats:
                 all_features.append(feats)
+        all_features.sort(key=lambda f: f["filename"])
 
     df = pd.DataFrame(all_features)
     print("\n✅ Extraction complete.\n")
@@ -77,6 +188,10 @@ def main():
     df.to_csv(OUTPUT_CSV, index=False)
     print(f"\n📁 Features saved to: {OUTPUT_CSV}")
 
+    from stylefinder_index import build_index_from_csv
+
+    build_index_from_csv(OUTPUT_CSV)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,263 @@
+# === stylefinder_index.py ===
+# Persistent nearest-neighbour index over StyleFinder feature vectors.
+#
+# Features are standardized (z-scores) and stored in a KD-tree. New works are
+# standardized with the stored mean/std and kept in a small pending buffer
+# that is searched by brute force; once it grows past REBUILD_FRACTION of the
+# tree the scaler is refit and the tree rebuilt. Queries therefore stay
+# logarithmic while adds cost only the new rows.
+
+import argparse
+import os
+import pickle
+
+from lazy_imports import lazy_import
+from stylefinder_dataset import FEATURE_COLUMNS, OUTPUT_CSV, extract_features_from_score
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+spatial = lazy_import("scipy.spatial")
+
+INDEX_PATH = "stylefinder_index.pkl"
+REBUILD_FRACTION = 0.2
+INDEX_VERSION = 1
+
+
+def _fit(index):
+    raw = index["raw"]
+    index["mean"] = raw.mean(axis=0)
+    std = raw.std(axis=0)
+    index["std"] = np.where(std > 0, std, 1.0)
+    index["scaled"] = (raw - index["mean"]) / index["std"]
+    index["tree"] = spatial.cKDTree(index["scaled"]) if len(raw) else None
+    index["n_tree"] = len(raw)
+
+
+def build_index(df, columns=FEATURE_COLUMNS):
+    """
+    Build a similarity index from a feature table (one row per work).
+    """
+    df = df.dropna(subset=list(columns))
+    index = {
+        "version": INDEX_VERSION,
+        "columns": list(columns),
+        "filenames": df["filename"].tolist(),
+        "raw": df[list(columns)].to_numpy(dtype=float),
+    }
+    _fit(index)
+    return index
+
+
+def save_index(index, path=INDEX_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_index(path=INDEX_PATH):
+    with open(path, "rb") as f:
+        index = pickle.load(f)
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError(f"{path} was built by an incompatible version; rebuild it.")
+    return index
+
+
+def add_works(index, rows):
+    """
+    Add or replace works (a DataFrame or list of feature dicts) in place.
+    Replacing a work already in the tree, or letting the pending buffer grow
+    past REBUILD_FRACTION, triggers a rebuild; otherwise only the new rows
+    are standardized and appended.
+    """
+    rows = pd.DataFrame(rows).dropna(subset=index["columns"])
+    if rows.empty:
+        return index
+    positions = {name: i for i, name in enumerate(index["filenames"])}
+    new_raw = rows[index["columns"]].to_numpy(dtype=float)
+
+    rebuild = False
+    for name, vec in zip(rows["filename"], new_raw):
+        if name in positions:
+            index["raw"][positions[name]] = vec
+            rebuild = rebuild or positions[name] < index["n_tree"]
+        else:
+            positions[name] = len(index["filenames"])
+            index["filenames"].append(name)
+            index["raw"] = np.vstack([index["raw"], vec])
+
+    pending = len(index["filenames"]) - index["n_tree"]
+    if rebuild or index["tree"] is None or pending > REBUILD_FRACTION * index["n_tree"]:
+        _fit(index)
+    else:
+        index["scaled"] = np.vstack(
+            [
+                index["scaled"][: index["n_tree"]],
+                (index["raw"][index["n_tree"] :] - index["mean"]) / index["std"],
+            ]
+        )
+    return index
+
+
+def remove_works(index, names):
+    """Drop works by filename in place and refit. Unknown names are ignored."""
+    names = set(names)
+    keep = [i for i, name in enumerate(index["filenames"]) if name not in names]
+    if len(keep) == len(index["filenames"]):
+        return index
+    index["filenames"] = [index["filenames"][i] for i in keep]
+    index["raw"] = index["raw"][keep]
+    _fit(index)
+    return index
+
+
+def _target_vector(index, target):
+    """
+    Resolve a query target: a filename (or unique substring of one), a
+    feature dict, or a raw feature vector. Returns (scaled vector, own row).
+    """
+    if isinstance(target, str):
+        matches = [
+            i
+            for i, name in enumerate(index["filenames"])
+            if target.lower() in name.lower()
+        ]
+        exact = [i for i in matches if index["filenames"][i] == target]
+        if exact:
+            matches = exact
+        if not matches:
+            raise ValueError(f"No work matching '{target}' in the index.")
+        if len(matches) > 1:
+            names = [index["filenames"][i] for i in matches]
+            raise ValueError(f"'{target}' is ambiguous: {names}")
+        return index["scaled"][matches[0]], matches[0]
+    if isinstance(target, dict):
+        target = [target[c] for c in index["columns"]]
+    vec = (np.asarray(target, dtype=float) - index["mean"]) / index["std"]
+    return vec, None
+
+
+def _pending_distances(index, vec):
+    pending = index["scaled"][index["n_tree"] :]
+    return np.sqrt(((pending - vec) ** 2).sum(axis=1))
+
+
+def query_knn(index, target, k=5):
+    """
+    k nearest works to `target` (excluding itself).
+    Returns a list of (filename, distance), closest first.
+    """
+    vec, own = _target_vector(index, target)
+    candidates = {}
+    if index["tree"] is not None and index["n_tree"]:
+        kk = min(k + 1, index["n_tree"])
+        dist, idx = index["tree"].query(vec, k=kk)
+        for d, i in zip(np.atleast_1d(dist), np.atleast_1d(idx)):
+            candidates[int(i)] = float(d)
+    for j, d in enumerate(_pending_distances(index, vec)):
+        candidates[index["n_tree"] + j] = float(d)
+    candidates.pop(own, None)
+    best = sorted(candidates.items(), key=lambda item: item[1])[:k]
+    return [(index["filenames"][i], d) for i, d in best]
+
+
+def query_radius(index, target, radius):
+    """
+    All works within `radius` (in standardized feature units) of `target`.
+    Returns a list of (filename, distance), closest first.
+    """
+    vec, own = _target_vector(index, target)
+    found = {}
+    if index["tree"] is not None:
+        for i in index["tree"].query_ball_point(vec, r=radius):
+            found[int(i)] = float(np.sqrt(((index["scaled"][i] - vec) ** 2).sum()))
+    for j, d in enumerate(_pending_distances(index, vec)):
+        if d <= radius:
+            found[index["n_tree"] + j] = float(d)
+    found.pop(own, None)
+    return [
+        (index["filenames"][i], d)
+        for i, d in sorted(found.items(), key=lambda item: item[1])
+    ]
+
+
+def build_index_from_csv(csv_path=OUTPUT_CSV, index_path=INDEX_PATH):
+    index = build_index(pd.read_csv(csv_path))
+    save_index(index, index_path)
+    print(
+        f"📁 Similarity index ({len(index['filenames'])} works) saved to: {index_path}"
+    )
+    return index
+
+
+def add_score_files(
+    paths,
+    csv_path=OUTPUT_CSV,
+    index_path=INDEX_PATH,
+    removed=(),
+    extract=extract_features_from_score,
+):
+    """
+    Extract features for new score files, append/replace them in the
+    feature CSV and update the saved index without a full rebuild.
+    Filenames in `removed` are dropped from both.
+    """
+    rows = [f for f in (extract(p) for p in paths) if f]
+    removed = [os.path.basename(p) for p in removed]
+    if not rows and not removed:
+        return None
+    df = pd.read_csv(csv_path) if os.path.exists(csv_path) else pd.DataFrame()
+    new = pd.DataFrame(rows)
+    if not df.empty:
+        df = df[~df["filename"].isin(list(new.get("filename", [])) + removed)]
+    combined = pd.concat([df, new], ignore_index=True)
+    combined.to_csv(csv_path, index=False)
+
+    if os.path.exists(index_path):
+        index = remove_works(load_index(index_path), removed)
+        if rows:
+            add_works(index, new)
+    else:
+        index = build_index(combined)
+    save_index(index, index_path)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="StyleFinder similarity index.")
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--csv", default=OUTPUT_CSV)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Rebuild the index from the feature CSV")
+    knn = sub.add_parser("knn", help="Nearest works to a work in the index")
+    knn.add_argument("work")
+    knn.add_argument("-k", type=int, default=5)
+    rad = sub.add_parser("radius", help="Works within a standardized distance")
+    rad.add_argument("work")
+    rad.add_argument("-r", "--radius", type=float, default=1.0)
+    add = sub.add_parser("add", help="Extract and add new score files")
+    add.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_index_from_csv(args.csv, args.index)
+        return
+    if args.command == "add":
+        index = add_score_files(args.paths, args.csv, args.index)
+        if index is not None:
+            print(f"📁 Index now holds {len(index['filenames'])} works.")
+        return
+
+    if not os.path.exists(args.index):
+        build_index_from_csv(args.csv, args.index)
+    index = load_index(args.index)
+    if args.command == "knn":
+        results = query_knn(index, args.work, k=args.k)
+    else:
+        results = query_radius(index, args.work, args.radius)
+    for name, dist in results:
+        print(f"{dist:7.3f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
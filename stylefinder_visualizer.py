@@ -1,34 +1,127 @@
-import pandas as pd
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-import plotly.express as px
+import argparse
+import os
+import pickle
 
-# Load dataset
-df = pd.read_csv("stylefinder_features.csv")
-df.dropna(inplace=True)
+from lazy_imports import lazy_import
+from stylefinder_dataset import FEATURE_COLUMNS, OUTPUT_CSV
 
-# Remove Cantus outlier
-df = df[~df["filename"].str.contains("Cantus", case=False)]
+# pandas, sklearn and plotly are only imported once a plot is requested
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+decomposition = lazy_import("sklearn.decomposition")
+preprocessing = lazy_import("sklearn.preprocessing")
+px = lazy_import("plotly.express")
+
+FEATURES_CSV = OUTPUT_CSV
+
+# Fitted scaler + PCA and the projected points, stored next to the feature CSV
+PROJECTION_PATH = "stylefinder_projection.pkl"
+PROJECTION_VERSION = 1
+DEFAULT_OUTPUT = "stylefinder_pca.html"
 
 # Select relevant features
-features = [
-    "total_notes",
-    "pitch_range",
-    "avg_interval",
-    "note_density",
-    "avg_duration",
-]
-X = df[features]
-
-# Standardize features
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# Apply PCA
-pca = PCA(n_components=2)
-X_pca = pca.fit_transform(X_scaled)
-df["PC1"] = X_pca[:, 0]
-df["PC2"] = X_pca[:, 1]
+features = FEATURE_COLUMNS
+
+
+def load_features(csv_path=FEATURES_CSV):
+    # Load dataset
+    df = pd.read_csv(csv_path)
+    df.dropna(inplace=True)
+
+    # Remove Cantus outlier
+    return df[~df["filename"].str.contains("Cantus", case=False)].copy()
+
+
+def fit_projection(df):
+    """
+    Fit the scaler and PCA on a feature table.
+    Returns a projection dict (see save_projection) with every row projected.
+    """
+    X = df[features]
+
+    # Standardize features
+    scaler = preprocessing.StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    # Apply PCA
+    pca = decomposition.PCA(n_components=2)
+    pca.fit(X_scaled)
+
+    projection = {
+        "version": PROJECTION_VERSION,
+        "columns": list(features),
+        "scaler": scaler,
+        "pca": pca,
+        "points": pd.DataFrame(columns=["filename", *features, "PC1", "PC2"]),
+    }
+    return update_projection(projection, df)
+
+
+def update_projection(projection, df):
+    """
+    Project the rows of `df` that are new or whose features changed since
+    the last run into the existing space (no refit). Works no longer in
+    `df` are dropped. Returns the same projection dict.
+    """
+    points = projection["points"].set_index("filename")
+    current = df.set_index("filename")[features]
+
+    known = current.index.intersection(points.index)
+    same = np.isclose(
+        current.loc[known].to_numpy(dtype=float),
+        points.loc[known, features].to_numpy(dtype=float),
+    ).all(axis=1)
+    stale = current.index.difference(known[same])
+
+    if len(stale):
+        X = current.loc[stale]
+        X_pca = projection["pca"].transform(projection["scaler"].transform(X))
+        fresh = X.assign(PC1=X_pca[:, 0], PC2=X_pca[:, 1])
+        kept = points.drop(index=stale, errors="ignore")
+        points = pd.concat([kept, fresh]) if len(kept) else fresh
+
+    projection["points"] = points.loc[current.index].reset_index()
+    return projection
+
+
+def save_projection(projection, path=PROJECTION_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(projection, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_projection(path=PROJECTION_PATH):
+    with open(path, "rb") as f:
+        projection = pickle.load(f)
+    if projection.get("version") != PROJECTION_VERSION or projection["columns"] != list(
+        features
+    ):
+        raise ValueError(f"{path} was built for different features; refit it.")
+    return projection
+
+
+def project_features(df, projection_path=PROJECTION_PATH, refit=False):
+    """
+    Add PC1/PC2 columns to `df`, reusing the saved scaler/PCA when there is
+    one and only projecting new or changed works. Pass projection_path=None
+    to fit in memory without touching the cache.
+    """
+    projection = None
+    if projection_path and not refit and os.path.exists(projection_path):
+        try:
+            projection = update_projection(load_projection(projection_path), df)
+        except (ValueError, KeyError, pickle.UnpicklingError) as e:
+            print(f"[WARN] Refitting projection: {e}")
+    if projection is None:
+        projection = fit_projection(df)
+    if projection_path:
+        save_projection(projection, projection_path)
+
+    coords = projection["points"].set_index("filename")
+    df["PC1"] = df["filename"].map(coords["PC1"])
+    df["PC2"] = df["filename"].map(coords["PC2"])
+    return df
 
 
 # Group labeling function
@@ -56,18 +149,66 @@ def assign_group_and_label(row):
         return "Other"
 
 
-df["group"] = df.apply(assign_group_and_label, axis=1)
-
-# Plot
-fig = px.scatter(
-    df,
-    x="PC1",
-    y="PC2",
-    color="group",
-    hover_data=["filename"],
-    title="StyleFinder PCA: Millner Works vs Influences",
-    labels={"PC1": "Principal Component 1", "PC2": "Principal Component 2"},
-    opacity=0.85,
-)
-fig.update_layout(legend_title_text="Group", height=700)
-fig.show()
+def build_figure(df):
+    fig = px.scatter(
+        df,
+        x="PC1",
+        y="PC2",
+        color="group",
+        hover_data=["filename"],
+        title="StyleFinder PCA: Millner Works vs Influences",
+        labels={"PC1": "Principal Component 1", "PC2": "Principal Component 2"},
+        opacity=0.85,
+    )
+    fig.update_layout(legend_title_text="Group", height=700)
+    return fig
+
+
+def export_figure(fig, path):
+    """
+    Write the figure to a static file: .html (self-contained, plotly.js
+    embedded, opens offline) or .png/.svg/.pdf (needs the kaleido package).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".html", ".htm"):
+        fig.write_html(path, include_plotlyjs=True)
+    else:
+        try:
+            fig.write_image(path)
+        except (ImportError, RuntimeError, ValueError) as e:
+            raise ValueError(
+                f"Cannot write {path}: image export needs the kaleido package; use .html instead."
+            ) from e
+    print(f"📁 Plot saved to: {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="StyleFinder PCA plot.")
+    parser.add_argument("--csv", default=FEATURES_CSV)
+    parser.add_argument("--projection", default=PROJECTION_PATH)
+    parser.add_argument(
+        "--refit", action="store_true", help="Refit the scaler/PCA on the current table"
+    )
+    parser.add_argument(
+        "-o", "--out", default=DEFAULT_OUTPUT, help="Output file (.html or .png)"
+    )
+    parser.add_argument(
+        "--show", action="store_true", help="Also open the interactive plot"
+    )
+    args = parser.parse_args(argv)
+
+    df = project_features(load_features(args.csv), args.projection, refit=args.refit)
+    df["group"] = df.apply(assign_group_and_label, axis=1)
+
+    # Plot
+    fig = build_figure(df)
+    try:
+        export_figure(fig, args.out)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+    if args.show:
+        fig.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# === stylefinder_watch.py ===
+# Keep the StyleFinder feature table, similarity index and PCA projection up
+# to date while scores are exported into the corpus folder.
+#
+# The folder is polled (no extra dependencies) and compared with the previous
+# snapshot of (mtime, size) per file. A changed file is only picked up once
+# it has been quiet for `debounce` seconds, so a burst of writes from an
+# exporter becomes a single update. Updates run on a background thread and
+# touch only the affected works: their rows in the CSV are re-extracted,
+# the KD-tree index takes them through add_works/remove_works, and the saved
+# PCA projects just the new points (see stylefinder_visualizer). Changes
+# that arrive while an update runs are queued for the next one.
+#
+#   python stylefinder_watch.py [data/xml/] [--debounce 1.0] [--plot stylefinder_pca.html]
+
+import argparse
+import os
+import queue
+import threading
+import time
+
+from stylefinder_dataset import (
+    OUTPUT_CSV,
+    XML_FOLDER,
+    extract_features_from_score,
+    extract_features_low_memory,
+)
+from stylefinder_index import INDEX_PATH, add_score_files
+from stylefinder_visualizer import PROJECTION_PATH
+
+SCORE_EXTENSIONS = (".musicxml", ".xml")
+DEFAULT_DEBOUNCE = 1.0  # seconds a file must be unchanged before it is read
+DEFAULT_INTERVAL = 0.5  # seconds between folder scans
+
+
+def scan(folder, extensions=SCORE_EXTENSIONS):
+    """{path: (mtime_ns, size)} for the score files in `folder`."""
+    snapshot = {}
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.endswith(extensions):
+            st = entry.stat()
+            snapshot[entry.path] = (st.st_mtime_ns, st.st_size)
+    return snapshot
+
+
+class CorpusWatcher:
+    def __init__(
+        self,
+        folder=XML_FOLDER,
+        csv_path=OUTPUT_CSV,
+        index_path=INDEX_PATH,
+        projection_path=PROJECTION_PATH,
+        plot=None,
+        debounce=DEFAULT_DEBOUNCE,
+        low_memory=False,
+    ):
+        self.folder = folder
+        self.csv_path = csv_path
+        self.index_path = index_path
+        self.projection_path = projection_path
+        self.plot = plot
+        self.debounce = debounce
+        self.extract = (
+            extract_features_low_memory if low_memory else extract_features_from_score
+        )
+        self.snapshot = {}
+        self.pending = {}  # path -> time of its last change
+        self.updates = queue.Queue()
+
+    def catch_up(self):
+        """
+        Take the first snapshot and queue what changed while nobody watched:
+        files missing from the CSV or newer than it, and CSV rows whose file
+        is gone. Returns (changed paths, removed filenames).
+        """
+        import pandas as pd
+
+        self.snapshot = scan(self.folder)
+        known = set()
+        csv_mtime = 0
+        if os.path.exists(self.csv_path):
+            known = set(pd.read_csv(self.csv_path)["filename"])
+            csv_mtime = os.stat(self.csv_path).st_mtime_ns
+        changed = sorted(
+            p
+            for p, (mtime, _) in self.snapshot.items()
+            if os.path.basename(p) not in known or mtime > csv_mtime
+        )
+        present = {os.path.basename(p) for p in self.snapshot}
+        removed = sorted(known - present)
+        return changed, removed
+
+    def poll(self, now=None):
+        """
+        Rescan the folder and return the (changed, removed) paths that have
+        been quiet for at least `debounce` seconds, or None if there are none.
+        """
+        now = time.monotonic() if now is None else now
+        current = scan(self.folder)
+        for path in set(current) | set(self.snapshot):
+            if current.get(path) != self.snapshot.get(path):
+                self.pending[path] = now
+        self.snapshot = current
+
+        ready = sorted(p for p, t in self.pending.items() if now - t >= self.debounce)
+        if not ready:
+            return None
+        for path in ready:
+            del self.pending[path]
+        changed = [p for p in ready if p in current]
+        removed = [p for p in ready if p not in current]
+        return changed, removed
+
+    def apply(self, changed, removed):
+        """Update the CSV, the index and the projection for these files only."""
+        start = time.perf_counter()
+        index = add_score_files(
+            changed,
+            self.csv_path,
+            self.index_path,
+            removed=removed,
+            extract=self.extract,
+        )
+        if index is None:
+            return None
+
+        from stylefinder_visualizer import load_features, project_features
+
+        df = project_features(load_features(self.csv_path), self.projection_path)
+        if self.plot:
+            from stylefinder_visualizer import (
+                assign_group_and_label,
+                build_figure,
+                export_figure,
+            )
+
+            df["group"] = df.apply(assign_group_and_label, axis=1)
+            export_figure(build_figure(df), self.plot)
+        elapsed = time.perf_counter() - start
+        names = [os.path.basename(p) for p in changed] + [
+            f"-{os.path.basename(p)}" for p in removed
+        ]
+        print(
+            f"🔄 Updated {', '.join(names)} in {elapsed:.1f}s "
+            f"({len(index['filenames'])} works indexed)",
+            flush=True,
+        )
+        return index
+
+    def _worker(self):
+        while True:
+            batch = self.updates.get()
+            if batch is None:
+                return
+            try:
+                self.apply(*batch)
+            except Exception as e:
+                print(f"[ERROR] Update failed: {e}", flush=True)
+
+    def run(self, interval=DEFAULT_INTERVAL, stop=None):
+        """
+        Watch until `stop` (a threading.Event) is set or Ctrl+C. Updates run
+        on a background thread; the loop keeps scanning meanwhile.
+        """
+        stop = stop or threading.Event()
+        worker = threading.Thread(target=self._worker, daemon=True)
+        worker.start()
+        changed, removed = self.catch_up()
+        if changed or removed:
+            self.updates.put((changed, removed))
+        print(
+            f"👀 Watching {self.folder} ({len(self.snapshot)} scores, Ctrl+C to stop)",
+            flush=True,
+        )
+        try:
+            while not stop.wait(interval):
+                batch = self.poll()
+                if batch:
+                    self.updates.put(batch)
+        except KeyboardInterrupt:
+            print("\n👋 Stopping watcher.")
+        finally:
+            self.updates.put(None)
+            worker.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Keep StyleFinder features, index and projection up to date."
+    )
+    parser.add_argument("folder", nargs="?", default=XML_FOLDER)
+    parser.add_argument("--csv", default=OUTPUT_CSV)
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--projection", default=PROJECTION_PATH)
+    parser.add_argument(
+        "--plot",
+        default=None,
+        help="Also re-export the plot (.html or .png) after each update",
+    )
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE)
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL)
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        help="Stream each file part by part instead of loading it into music21",
+    )
+    args = parser.parse_args(argv)
+
+    watcher = CorpusWatcher(
+        args.folder,
+        args.csv,
+        args.index,
+        args.projection,
+        args.plot,
+        args.debounce,
+        args.low_memory,
+    )
+    watcher.run(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import pytest
+from music21 import chord, note, stream
+
+
+def build_score(parts):
+    """
+    A score from (part name, events) pairs; each event is (pitches, quarter
+    length) where pitches is a note name or MIDI number, a list of them (a
+    chord when longer than one) or None / [] for a rest. Parts get measures.
+    """
+    score = stream.Score()
+    for name, events in parts:
+        part = stream.Part()
+        if name:
+            part.partName = name
+        for pitches, ql in events:
+            if pitches is None or (isinstance(pitches, list) and not pitches):
+                part.append(note.Rest(quarterLength=ql))
+            elif isinstance(pitches, list) and len(pitches) > 1:
+                part.append(chord.Chord(pitches, quarterLength=ql))
+            else:
+                p = pitches[0] if isinstance(pitches, list) else pitches
+                part.append(note.Note(p, quarterLength=ql))
+        part.makeMeasures(inPlace=True)
+        score.insert(0, part)
+    return score
+
+
+@pytest.fixture
+def make_score():
+    return build_score
@@ -0,0 +1,44 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from main import apply_t_voice_with_pattern
+from scripts.bench_harmonizer import (
+    check_reference,
+    reference_lines,
+    replicate,
+    run_case,
+)
+
+
+def test_outputs_match_the_stored_reference():
+    assert check_reference() == []
+
+
+def test_changed_implementation_is_reported():
+    def shifted_t_voice(
+        melody, key, mode, triad_level=1, direction="below", bind_pattern=None
+    ):
+        return apply_t_voice_with_pattern(
+            melody, key, mode, triad_level + 1, direction, bind_pattern
+        )
+
+    mismatched = check_reference(overrides={"t_voice": shifted_t_voice})
+    assert mismatched == ["t_voice"]
+
+
+def test_replicate_reaches_the_requested_size():
+    lines = reference_lines()
+    assert lines and all(len(l["melody"]) == len(l["rhythm"]) for l in lines)
+    big = replicate(lines, 10_000)
+    assert sum(len(l["melody"]) for l in big) >= 10_000
+
+
+def test_export_outputs_are_free_of_version_details():
+    import music21
+
+    xml, midi_events = run_case("export", reference_lines()[:1])[0]
+    assert "music21" not in xml and music21.__version__ not in xml
+    assert "<encoding-date>" not in xml and "DTD MusicXML" not in xml
+    assert midi_events and all(len(e) == 5 for e in midi_events)
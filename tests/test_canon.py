@@ -0,0 +1,36 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from music21 import stream, note
+
+from analysis.canon import detect_canons
+from analysis.note_index import build_note_index
+
+THEME = ["D4", "E4", "F4", "A4", "G4", "F4", "E4", "D4", "C#4", "D4"]
+
+
+def _part(name, pitches, delay):
+    part = stream.Part()
+    part.partName = name
+    if delay:
+        part.append(note.Rest(quarterLength=delay))
+    for p in pitches:
+        part.append(note.Note(p, quarterLength=0.5))
+    part.makeMeasures(inPlace=True)
+    return part
+
+
+def test_detects_transposed_delayed_entry():
+    score = stream.Score()
+    score.insert(0, _part("Violin II", THEME, 0))
+    score.insert(0, _part("Violoncello", [n.replace("4", "3") for n in THEME], 2))
+    score.insert(0, _part("Horn", ["C4"] * 12, 0))
+    entries = detect_canons(build_note_index(score), n=5)
+    assert len(entries) == 1
+    entry = entries[0]
+    assert (entry["leader"], entry["follower"]) == ("Violin II", "Violoncello")
+    assert entry["delay"] == 2.0
+    assert entry["transposition"] == -12
+    assert entry["notes"] == len(THEME)
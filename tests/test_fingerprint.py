@@ -0,0 +1,90 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from music21 import stream, note
+
+from analysis.fingerprint import (
+    build_fingerprints,
+    invariant_tokens,
+    open_fingerprints,
+    work_relations,
+)
+
+
+def _line(rng, beats):
+    """Random line of quarters and eighth pairs (no note crosses a beat)."""
+    pitches, lengths = [], []
+    for _ in range(beats):
+        split = rng.random() < 0.5
+        for ql in (0.5, 0.5) if split else (1.0,):
+            pitches.append(int(rng.integers(55, 80)))
+            lengths.append(ql)
+    return pitches, lengths
+
+
+def _write(path, pitches, lengths):
+    part = stream.Part()
+    part.partName = "Melody"
+    for p, ql in zip(pitches, lengths):
+        part.append(note.Note(p, quarterLength=ql))
+    part.makeMeasures(inPlace=True)
+    score = stream.Score()
+    score.insert(0, part)
+    score.write("musicxml", fp=str(path))
+
+
+def test_tokens_ignore_transposition_and_tempo():
+    onsets = np.array([0, 1, 1.5, 2, 4.0])
+    midi = np.array([60, 62, 64, 59, 67])
+    assert np.array_equal(
+        invariant_tokens(onsets, midi), invariant_tokens(onsets * 3, midi - 5)
+    )
+    assert not np.array_equal(
+        invariant_tokens(onsets, midi), invariant_tokens(onsets, midi[::-1])
+    )
+
+
+def test_duplicates_excerpts_and_unrelated(tmp_path):
+    rng = np.random.default_rng(7)
+    corpus = tmp_path / "xml"
+    corpus.mkdir()
+    theme, lengths = _line(rng, 48)
+    before, before_lengths = _line(rng, 60)
+    after, after_lengths = _line(rng, 60)
+    other, other_lengths = _line(rng, 60)
+
+    _write(corpus / "theme.musicxml", theme, lengths)
+    # Up a fourth in halved note values
+    _write(
+        corpus / "theme_fast.musicxml",
+        [p + 5 for p in theme],
+        [ql / 2 for ql in lengths],
+    )
+    _write(
+        corpus / "complete.musicxml",
+        before + theme + after,
+        before_lengths + lengths + after_lengths,
+    )
+    _write(corpus / "other.musicxml", other, other_lengths)
+
+    build_fingerprints(
+        str(corpus), str(tmp_path / "fp"), workers=1, cache_dir=str(tmp_path / "cache")
+    )
+    found = {
+        (r["work_a"], r["work_b"]): r
+        for r in work_relations(open_fingerprints(str(tmp_path / "fp")))
+    }
+
+    twin = found[("theme.musicxml", "theme_fast.musicxml")]
+    assert (twin["relation"], twin["transposition"]) == ("duplicate", 5)
+
+    for name in ("theme.musicxml", "theme_fast.musicxml"):
+        excerpt = found[(name, "complete.musicxml")]
+        assert excerpt["relation"] == "excerpt"
+        assert excerpt["a_in_b"] > 0.9 and excerpt["b_in_a"] < 0.5
+        assert excerpt["first_bar_b"] >= 15  # the theme starts after 60 beats
+
+    assert not any("other.musicxml" in pair for pair in found)
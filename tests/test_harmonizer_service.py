@@ -0,0 +1,146 @@
+import sys
+import os
+import asyncio
+import base64
+import json
+import socket
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from harmonizer_service import extract_source, serve
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _post(port, body):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode("utf-8")
+    writer.write(
+        f"POST /harmonize HTTP/1.1\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode()
+        + payload
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_harmonize_requests(tmp_path):
+    port = _free_port()
+    export = {
+        "melody": "A4 G4 F4 E4",
+        "key": "F",
+        "mode": "major",
+        "t_direction": "above",
+        "m_parallel": [-12],
+        "formats": ["midi"],
+    }
+
+    async def scenario():
+        ready = asyncio.Event()
+        server = asyncio.create_task(
+            serve("127.0.0.1", port, workers=1, ready=ready, cache_dir=str(tmp_path))
+        )
+        await ready.wait()
+        try:
+            first = await _post(port, export)
+            return [first] + await asyncio.gather(
+                _post(port, export),
+                _post(port, {"melody": "C4 D4", "key": "H", "mode": "major"}),
+                _post(
+                    port,
+                    {
+                        "melody": "A4 G4 F4 E4",
+                        "key": "F",
+                        "mode": "major",
+                        "t_direction": "above",
+                        "voicing": True,
+                    },
+                ),
+            )
+        finally:
+            server.cancel()
+            try:
+                await server
+            except asyncio.CancelledError:
+                pass
+
+    (ok_status, ok), (_, cached), (bad_status, bad), (_, voiced) = asyncio.run(
+        scenario()
+    )
+    assert ok_status == 200
+    assert ok["melody"] == ["A4", "G4", "F4", "E4"]
+    assert ok["t_voice"] == ["C4", None, "A4", None]
+    assert ok["m_parallel"] == [["A3", "G3", "F3", "E3"]]
+    assert base64.b64decode(ok["files"]["midi"]).startswith(b"MThd")
+    # The repeated export comes from the output cache, byte for byte
+    assert cached["files"] == ok["files"]
+    assert len(list(tmp_path.glob("tintharm_*.mid"))) == 1
+    assert bad_status == 400 and "Unsupported key" in bad["error"]
+    assert voiced["t_voice"] == ["C5", None, "A4", None]
+
+
+async def _raw(port, data):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    return int(raw.split()[1]) if raw else None
+
+
+def test_malformed_requests_get_a_400(tmp_path):
+    port = _free_port()
+
+    def request(body, length=None):
+        length = len(body) if length is None else length
+        return (
+            f"POST /harmonize HTTP/1.1\r\nContent-Length: {length}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode() + body
+
+    async def scenario():
+        ready = asyncio.Event()
+        server = asyncio.create_task(
+            serve("127.0.0.1", port, workers=1, ready=ready, cache_dir=None)
+        )
+        await ready.wait()
+        try:
+            return await asyncio.gather(
+                _raw(port, request(b"[1, 2]")),
+                _raw(port, request(b'"x"')),
+                _raw(port, request(b'{"source": "x.xml"}')),
+                _raw(port, request(b"{}", length="abc")),
+                _raw(port, request(b"{}", length=-1)),
+                # A bare string or an unsupported command is not a structure
+                _raw(port, request(b'{"melody": "D4", "structure": "retrograde"}')),
+                _raw(port, request(b'{"melody": "D4", "structure": ["mirror"]}')),
+            )
+        finally:
+            server.cancel()
+            try:
+                await server
+            except asyncio.CancelledError:
+                pass
+
+    assert asyncio.run(scenario()) == [400] * 7
+
+
+def test_auto_part_is_extracted_in_process(monkeypatch):
+    import melody_extraction
+
+    calls = []
+
+    def fake(path, part=None, workers=None):
+        calls.append(workers)
+        return {"melody": ["A4"], "candidates": []}
+
+    monkeypatch.setattr(melody_extraction, "extract_main_melody", fake)
+    # extract_source runs inside a service worker: no nested process pool
+    assert extract_source("x.musicxml", "auto") == {"melody": ["A4"]}
+    assert calls == [1]
@@ -0,0 +1,95 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import io
+import json
+
+import pytest
+
+from harmonizer_stream import add_arguments, parse_line, run_stream
+
+
+def _args(*argv):
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    return parser.parse_args(list(argv))
+
+
+def test_parse_line_formats():
+    assert parse_line("  \n") is None
+    assert parse_line("# a comment") is None
+    assert parse_line("A4 r G4") == {
+        "melody": ["A4", None, "G4"],
+        "rhythm": [1.0, 1.0, 1.0],
+    }
+    events = parse_line('["A4", ["G4", 2], {"note": "F4", "duration": 0.5}, null]')
+    assert events == {
+        "melody": ["A4", "G4", "F4", None],
+        "rhythm": [1.0, 2.0, 0.5, 1.0],
+    }
+    request = parse_line('{"id": "x", "melody": "E4 D4", "key": "C", "t_level": 2}')
+    assert (
+        request["melody"] == ["E4", "D4"]
+        and request["t_level"] == 2
+        and request["id"] == "x"
+    )
+    with pytest.raises(ValueError):
+        parse_line('{"melody": "E4", "rhythm": [1, 2]}')
+    with pytest.raises(ValueError):
+        parse_line("{not json")
+
+
+def test_stream_writes_one_result_per_melody():
+    stdin = io.StringIO(
+        "A4 G4 F4 E4 D4 C4\n"
+        "\n"
+        '{"id": 7, "melody": "E4 D4 C4", "m_parallel": [-9], "t_direction": "above"}\n'
+        "X9 G4\n"
+        "A4 r G4\n"
+    )
+    stdout = io.StringIO()
+    errors = run_stream(_args("--key", "C", "--mode", "major"), stdin, stdout)
+    results = [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    assert errors == 1
+    assert [r["line"] for r in results] == [1, 3, 4, 5]
+    first = results[0]
+    assert (first["key"], first["mode"]) == ("C", "major")
+    assert first["t_voice"] == [None, "E4", None, "C4", None, "G4"]
+    assert results[1]["id"] == 7
+    assert results[1]["t_voice"] == ["G4", None, "E4"]
+    assert results[1]["m_parallel"] == [["G3", "F3", "E-3"]] and results[1][
+        "intervals"
+    ] == [-9]
+    assert "Invalid note name" in results[2]["error"]
+    assert results[3]["melody"] == ["A4", None, "G4"]
+
+
+def test_stream_tsv_and_detected_key():
+    stdout = io.StringIO()
+    run_stream(
+        _args("--m-parallel", "3", "--output", "tsv"),
+        io.StringIO("D4 F4 A4 D5\n"),
+        stdout,
+    )
+    columns = stdout.getvalue().rstrip("\n").split("\t")
+    assert columns[0] == "D4 F4 A4 D5"
+    assert len(columns) == 3  # melody, T-voice, one M-parallel line
+    assert columns[2].split()[0] == "F4"
+
+
+def test_structure_from_a_line():
+    stdin = io.StringIO(
+        '{"melody": "D4 E4 F4", "structure": "retrograde"}\n'
+        '{"melody": "D4 E4 F4", "structure": ["mirror"]}\n'
+    )
+    stdout = io.StringIO()
+    errors = run_stream(_args("--key", "D", "--mode", "minor"), stdin, stdout)
+    retro, mirror = [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    assert errors == 1
+    assert retro["melody"] == ["F4", "E4", "D4"]
+    assert "Unsupported structure 'mirror'" in mirror["error"]
@@ -0,0 +1,70 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from music21 import stream, note, chord
+
+from analysis.house_detector import (
+    detect_house_sections,
+    is_syncopated_pulse,
+    is_triadic,
+)
+from analysis.note_index import build_note_index
+
+
+def _measure(number, events):
+    m = stream.Measure(number=number)
+    for offset, el in events:
+        m.insert(offset, el)
+    return m
+
+
+def _pulse(offsets, pitch="G4"):
+    return [(o, note.Note(pitch, quarterLength=0.25)) for o in offsets]
+
+
+def _score():
+    part = stream.Part()
+    part.partName = "Piano"
+    syncopated = [0.25, 0.75, 1.25, 1.75]
+    part.append(
+        _measure(1, _pulse(syncopated) + [(2.0, note.Note("C4", quarterLength=2.0))])
+    )
+    part.append(_measure(2, _pulse([0.0, 0.5, 1.0, 1.5])))  # on the beat
+    part.append(
+        _measure(3, _pulse(syncopated) + [(2.0, note.Note("D4", quarterLength=2.0))])
+    )
+    part.append(
+        _measure(
+            4,
+            _pulse(syncopated) + [(2.0, chord.Chord(["C4", "E-4"], quarterLength=2.0))],
+        )
+    )
+    score = stream.Score()
+    score.insert(0, part)
+    return score
+
+
+def test_detect_house_sections_matches_measure_rules():
+    score = _score()
+    assert detect_house_sections(score) == [("Piano", 1), ("Piano", 4)]
+
+    # Agrees with the per-measure heuristics where those apply (no chords)
+    part = score.parts[0]
+    expected = [
+        m.measureNumber
+        for m in part.getElementsByClass(stream.Measure)[:3]
+        if is_syncopated_pulse(m) and is_triadic(m.notes)
+    ]
+    assert expected == [1]
+
+
+def test_note_index_rows():
+    index = build_note_index(_score())
+    assert list(index["measures"]["number"]) == [1, 2, 3, 4]
+    last = index["notes"]["measure"] == 3
+    assert sorted(index["notes"]["midi"][last & (index["notes"]["chord"] == 1)]) == [
+        60,
+        63,
+    ]
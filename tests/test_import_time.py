@@ -0,0 +1,13 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scripts.bench_import_time import ENTRY_MODULES, measure_import
+
+
+def test_entry_points_do_not_import_heavy_dependencies():
+    for module in ENTRY_MODULES:
+        ms, heavy = measure_import(module, repeat=1)
+        assert heavy == [], f"{module} imported {heavy} at load time"
+        assert ms < 500, f"{module} took {ms:.0f} ms to import"
@@ -0,0 +1,56 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import instrumentation
+from instrumentation import count, stage
+from main import build_tintinnabuli_score
+
+
+def test_disabled_records_nothing():
+    instrumentation.disable()
+    instrumentation.reset()
+    with stage("noop"):
+        count("notes", 3)
+    assert instrumentation.summary() == ({}, {})
+
+
+def test_profile_dump_is_trace_events(tmp_path):
+    instrumentation.enable()
+    try:
+        build_tintinnabuli_score(["C4", None, "E4"], ["G3", None, None])
+        with stage("outer"):
+            with stage("inner"):
+                count("notes", 2)
+        count("notes", 1)
+        path = tmp_path / "profile.json"
+        instrumentation.dump(str(path))
+    finally:
+        instrumentation.disable()
+
+    trace = json.loads(path.read_text())
+    complete = {e["name"]: e for e in trace["traceEvents"] if e["ph"] == "X"}
+    assert {"score.build", "outer", "inner"} <= set(complete)
+    assert complete["inner"]["dur"] <= complete["outer"]["dur"]
+    assert trace["summary"]["counters"]["notes"] == 3
+    # Score, metadata, and per part: the part, its key and three notes/rests
+    assert trace["summary"]["counters"]["music21_objects"] == 2 + (2 + 3) * 2
+
+
+def test_parsed_objects_are_counted(tmp_path):
+    from music21 import converter
+    from xml_utils import extract_melody_from_xml
+
+    path = tmp_path / "melody.musicxml"
+    build_tintinnabuli_score(["C4", "D4", "E4", "F4"]).write("musicxml", fp=str(path))
+    instrumentation.enable()
+    instrumentation.reset()
+    try:
+        extract_melody_from_xml(str(path))
+        counters = instrumentation.summary()[1]
+    finally:
+        instrumentation.disable()
+    parsed = converter.parse(str(path))
+    assert counters["music21_objects"] == len(list(parsed.recurse(includeSelf=True)))
@@ -0,0 +1,53 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from music21 import chord, stream
+
+from analysis.key_tracker import key_correlations, track_keys, window_profiles
+from analysis.note_index import build_note_index
+from utils import score_keys
+
+C_MAJOR = [
+    ["C4", "E4", "G4"],
+    ["F4", "A4", "C5"],
+    ["G4", "B4", "D5"],
+    ["C4", "E4", "G4"],
+]
+F_MINOR = [
+    ["F4", "Ab4", "C5"],
+    ["Bb4", "Db5", "F5"],
+    ["C4", "E4", "G4"],
+    ["F4", "Ab4", "C5"],
+]
+
+
+def _score(progressions):
+    part = stream.Part()
+    for progression in progressions:
+        for pitches in progression:
+            part.append(chord.Chord(pitches, quarterLength=4))
+    part.makeMeasures(inPlace=True)
+    score = stream.Score()
+    score.insert(0, part)
+    return build_note_index(score)
+
+
+def test_modulation_becomes_two_regions():
+    index = _score([C_MAJOR, C_MAJOR, C_MAJOR, F_MINOR, F_MINOR, F_MINOR])
+    tracked = track_keys(index, window=4)
+    assert [r["key"] for r in tracked["regions"]] == ["C major", "F minor"]
+    assert 12 <= tracked["regions"][1]["start_bar"] <= 14
+
+
+def test_vectorized_scores_match_score_keys():
+    rng = np.random.default_rng(0)
+    profiles = rng.random((5, 12))
+    scores = key_correlations(window_profiles(profiles, window=1))
+    for row, weights in zip(scores, profiles):
+        tonic, mode, r = score_keys(weights.tolist())[0]
+        best = int(np.argmax(row))
+        assert best == tonic + (12 if mode == "minor" else 0)
+        assert np.isclose(row[best], r)
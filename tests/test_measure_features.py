@@ -0,0 +1,98 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pytest
+from music21 import stream, note, chord
+
+from analysis.measure_features import (
+    FEATURES,
+    build_measure_features,
+    open_measure_features,
+    top_measures,
+    work_series,
+)
+
+
+def _score(parts):
+    score = stream.Score()
+    for name, events in parts:
+        part = stream.Part()
+        part.partName = name
+        for pitches, ql in events:
+            el = (
+                chord.Chord(pitches, quarterLength=ql)
+                if len(pitches) > 1
+                else note.Note(pitches[0], quarterLength=ql)
+            )
+            part.append(el)
+        part.makeMeasures(inPlace=True)
+        score.insert(0, part)
+    return score
+
+
+def test_series_slices_and_values(tmp_path):
+    corpus = tmp_path / "xml"
+    corpus.mkdir()
+    _score(
+        [
+            # bar 1: four stepwise quarters, bar 2: one C major chord
+            (
+                "Violin",
+                [
+                    (["C4"], 1),
+                    (["D4"], 1),
+                    (["E4"], 1),
+                    (["G4"], 1),
+                    (["C4", "E4", "G4"], 4),
+                ],
+            ),
+            ("Cello", [(["C3"], 4), (["G2"], 4)]),
+        ]
+    ).write("musicxml", fp=str(corpus / "one.musicxml"))
+    _score(
+        [
+            ("Flute", [(["A5"], 0.5)] * 8 + [(["A5"], 4)] + [(["B5"], 4)]),
+        ]
+    ).write("musicxml", fp=str(corpus / "two.musicxml"))
+
+    manifest = build_measure_features(
+        str(corpus),
+        str(tmp_path / "features"),
+        workers=1,
+        cache_dir=str(tmp_path / "cache"),
+    )
+    assert [w["name"] for w in manifest["works"]] == ["one.musicxml", "two.musicxml"]
+    assert (manifest["work_rows"], manifest["part_rows"]) == (5, 7)
+
+    store = open_measure_features(str(tmp_path / "features"))
+    assert isinstance(store["work_features"], np.memmap)
+    col = {name: i for i, name in enumerate(FEATURES)}
+
+    one = work_series(store, "one")
+    assert one["measure"].tolist() == [1, 2]
+    assert one["features"][:, col["notes"]].tolist() == [5, 4]
+    assert one["features"][:, col["active_parts"]].tolist() == [2, 2]
+    assert one["features"][1, col["pitch_range"]] == 67 - 43
+
+    violin = work_series(store, 0, part="violin")
+    assert violin["features"][:, col["notes"]].tolist() == [4, 3]
+    assert violin["features"][0, col["avg_interval"]] == np.float32(7 / 3)
+    assert violin["features"][:, col["chord_share"]].tolist() == [0, 1]
+    assert violin["features"][1, col["pitch_classes"]] == 3
+
+    flute = work_series(store, "two.musicxml", part=0)
+    assert flute["measure"].tolist() == [1, 2, 3]
+    assert flute["offset"].tolist() == [0, 4, 8]
+    assert flute["features"][:, col["density"]].tolist() == [2, 0.25, 0.25]
+    assert work_series(store, np.int64(1))["measure"].tolist() == [1, 2, 3]
+    for work, part in (("two", 1), (0, 2), (2, None), (-1, None)):
+        with pytest.raises(ValueError):
+            work_series(store, work, part=part)
+
+    assert top_measures(store, "density", n=1) == [("two.musicxml", 1, 2.0)]
+    assert top_measures(store, "pitch_max", n=1, level="part") == [
+        ("two.musicxml", 3, 83.0)
+    ]
@@ -0,0 +1,90 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from music21 import chord, meter, note, stream
+
+from main import apply_t_voice_with_pattern
+from melody_extraction import extract_main_melodies, extract_main_melody, skyline
+from xml_stream import iter_parts
+
+TUNE = [
+    "D5",
+    "E5",
+    "F5",
+    "G5",
+    "A5",
+    "G5",
+    "F5",
+    "E5",
+    "D5",
+    "C5",
+    "D5",
+    "F5",
+    "E5",
+    "D5",
+    "C#5",
+    "D5",
+]
+
+
+def _write_score(path):
+    score = stream.Score()
+    melody = stream.Part()
+    melody.partName = "Flute"
+    melody.append(meter.TimeSignature("4/4"))
+    for p in TUNE:
+        melody.append(note.Note(p, quarterLength=1))
+    melody.makeMeasures(inPlace=True)
+
+    # Block chords a bar long: the skyline of this part is a slow top voice
+    piano = stream.Part()
+    piano.partName = "Piano"
+    piano.append(meter.TimeSignature("4/4"))
+    for pitches in (
+        ["D4", "F4", "A4"],
+        ["G3", "Bb3", "D4"],
+        ["A3", "C#4", "E4"],
+        ["D4", "F4", "A4"],
+    ):
+        piano.append(chord.Chord(pitches, quarterLength=2))
+        piano.append(chord.Chord(pitches, quarterLength=2))
+    piano.makeMeasures(inPlace=True)
+    score.insert(0, melody)
+    score.insert(0, piano)
+    score.write("musicxml", fp=str(path))
+
+
+def test_skyline_takes_the_top_of_each_chord(tmp_path):
+    path = tmp_path / "score.musicxml"
+    _write_score(path)
+    piano = [p for p in iter_parts(str(path)) if p["name"] == "Piano"][0]
+    midi, durations, onsets = skyline(piano)
+    assert midi.tolist() == [69, 69, 62, 62, 64, 64, 69, 69]
+    assert durations.tolist() == [2.0] * 8
+    assert skyline(piano, lowest=True)[0].tolist()[:2] == [62, 62]
+
+
+def test_melody_part_is_picked_and_feeds_the_harmonizer(tmp_path):
+    path = tmp_path / "score.musicxml"
+    _write_score(path)
+    data = extract_main_melody(str(path))
+    assert data["part_name"] == "Flute"
+    assert (data["key"], data["mode"]) == ("D", "minor")
+    assert data["melody"] == TUNE
+    assert [c[:2] for c in data["candidates"]] == [
+        ("Flute", "top"),
+        ("Piano", "top"),
+        ("Piano", "bottom"),
+    ]
+
+    t_voice = apply_t_voice_with_pattern(data["melody"], data["key"], data["mode"])
+    assert t_voice[0] == "A5"
+
+    # Same answer with the parts reduced in worker processes, through the
+    # per-file worker pool, and restricted to a part
+    parallel = extract_main_melody(str(path), workers=2)
+    assert parallel["melody"] == TUNE and parallel["candidates"] == data["candidates"]
+    assert extract_main_melodies([str(path)], workers=2)[str(path)]["melody"] == TUNE
+    assert extract_main_melody(str(path), part="piano")["part_name"] == "Piano"
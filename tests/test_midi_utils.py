@@ -0,0 +1,62 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import struct
+
+from midi_utils import extract_melody_from_midi, read_midi_file, skyline
+
+
+def _varlen(value):
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.insert(0, (value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(out)
+
+
+def _track(events):
+    body = b"".join(_varlen(delta) + data for delta, data in events)
+    body += b"\x00\xff\x2f\x00"
+    return b"MTrk" + struct.pack(">I", len(body)) + body
+
+
+def _write_midi(path, tracks, tpq=480):
+    header = b"MThd" + struct.pack(">IHHH", 6, 1, len(tracks), tpq)
+    with open(path, "wb") as f:
+        f.write(header + b"".join(_track(t) for t in tracks))
+
+
+def test_read_and_extract_melody(tmp_path):
+    path = tmp_path / "melody.mid"
+    conductor = [
+        (0, b"\xff\x58\x04\x03\x02\x18\x08"),  # 3/4
+        (0, b"\xff\x59\x02\xff\x00"),  # one flat, major
+    ]
+    melody = [
+        (0, b"\xff\x03\x04Horn"),
+        (0, b"\x90\x41\x50"),  # F4 on
+        (480, b"\x80\x41\x00"),
+        (0, b"\x90\x46\x50"),  # Bb4, running status below
+        (480, b"\x46\x00"),
+        (480, b"\x90\x45\x50"),  # A4 after a quarter rest
+        (960, b"\x80\x45\x00"),
+    ]
+    _write_midi(path, [conductor, melody])
+
+    midi_data = read_midi_file(str(path))
+    assert [t["name"] for t in midi_data["tracks"]] == [None, "Horn"]
+
+    data = extract_melody_from_midi(str(path), track="horn")
+    assert data["melody"] == ["F4", "Bb4", None, "A4"]
+    assert data["rhythm"] == [1.0, 1.0, 1.0, 2.0]
+    assert data["offsets"] == [0.0, 1.0, 2.0, 3.0]
+    assert data["time_signature"] == "3/4"
+    assert data["key_signature"] == "F major"
+
+
+def test_skyline_keeps_top_line():
+    notes = [(0, 960, 60), (0, 480, 64), (480, 480, 67), (600, 120, 55)]
+    assert skyline(notes) == [(0, 480, 64), (480, 480, 67)]
@@ -0,0 +1,89 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from music21 import stream, note
+
+from analysis.motif_index import (
+    build_motif_index,
+    main,
+    open_motif_index,
+    search_motif,
+)
+
+
+def _score(parts):
+    score = stream.Score()
+    for name, pitches, lengths in parts:
+        part = stream.Part()
+        part.partName = name
+        for p, ql in zip(pitches, lengths):
+            part.append(note.Note(p, quarterLength=ql))
+        part.makeMeasures(inPlace=True)
+        score.insert(0, part)
+    return score
+
+
+def test_search_modes(tmp_path):
+    corpus = tmp_path / "xml"
+    corpus.mkdir()
+    _score(
+        [
+            (
+                "Violin",
+                ["A4", "G4", "F4", "E4", "D4", "C4", "D4", "E4"],
+                [1, 1, 1, 1, 1, 1, 1, 1],
+            ),
+            (
+                "Cello",
+                ["C3", "D3", "D4", "C4", "Bb3", "A3", "G3", "C3"],
+                [1, 1, 2, 2, 2, 2, 4, 2],
+            ),
+        ]
+    ).write("musicxml", fp=str(corpus / "one.musicxml"))
+    _score(
+        [
+            (
+                "Flute",
+                ["E5", "D5", "C5", "B4", "A4", "A4", "A4", "A4"],
+                [1, 1, 1, 1, 2, 2, 2, 2],
+            ),
+        ]
+    ).write("musicxml", fp=str(corpus / "two.musicxml"))
+
+    build_motif_index(
+        str(corpus),
+        str(tmp_path / "motifs"),
+        n=3,
+        workers=1,
+        cache_dir=str(tmp_path / "cache"),
+    )
+    index = open_motif_index(str(tmp_path / "motifs"))
+    descent = ["A4", "G4", "F4", "E4"]
+
+    # Transposition-invariant: a whole-whole-half descent in all three parts
+    hits = search_motif(index, descent)
+    assert {(h["work"], h["part"]) for h in hits} == {
+        ("one.musicxml", "Violin"),
+        ("one.musicxml", "Cello"),
+        ("two.musicxml", "Flute"),
+    }
+    cello = [h for h in hits if h["part"] == "Cello"][0]
+    assert (cello["measure"], cello["transposition"], cello["first_note"]) == (
+        1,
+        -7,
+        "D4",
+    )
+
+    # Exact pitch and rhythm narrow it down
+    assert [h["part"] for h in search_motif(index, descent, transpose=False)] == [
+        "Violin"
+    ]
+    rhythmic = search_motif(index, descent, durations=[2, 2, 2, 2], rhythm=True)
+    assert [h["part"] for h in rhythmic] == ["Cello"]
+
+    # A query shorter than one n-gram is a usage error, not a traceback
+    with pytest.raises(SystemExit):
+        main(["--index", str(tmp_path / "motifs"), "search", "A4 G4 F4"])
@@ -0,0 +1,60 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import time
+
+from output_cache import OutputCache, job_key
+
+
+def _job(**changes):
+    job = {
+        "melody": ["A4", "G4", None, "E4"],
+        "key": "F",
+        "mode": "major",
+        "structure": ("none",),
+        "t_level": 1,
+        "t_direction": "below",
+    }
+    job.update(changes)
+    return job
+
+
+def test_key_depends_on_every_parameter():
+    assert job_key(_job()) == job_key(_job())
+    assert job_key(_job()) == job_key(dict(reversed(list(_job().items()))))
+    assert job_key(_job(t_level=2)) != job_key(_job())
+    assert job_key(_job(melody=["A4", "G4", None, "F4"])) != job_key(_job())
+
+
+def test_hits_misses_and_stable_names(tmp_path):
+    cache = OutputCache(str(tmp_path))
+    key = job_key(_job())
+    assert cache.get(key, ["musicxml", "midi"]) is None
+
+    paths = cache.put(key, {"musicxml": b"<score/>", "midi": b"MThd"}, meta=_job())
+    assert os.path.basename(paths["midi"]) == f"tintharm_{key}.mid"
+    assert cache.get(key, ["musicxml", "midi"]) == paths
+    assert cache.read(key, ["midi"]) == {"midi": b"MThd"}
+    assert cache.get(key, ["musicxml", "midi"]) is not None
+    assert cache.get(job_key(_job(key="D")), ["midi"]) is None
+
+
+def test_eviction_by_age_then_size(tmp_path):
+    cache = OutputCache(str(tmp_path), max_mb=None, max_age_days=None)
+    keys = [job_key(_job(t_level=i)) for i in range(4)]
+    now = time.time()
+    for i, key in enumerate(keys):
+        cache.put(key, {"midi": b"x" * 1000})
+        # keys[0] is oldest, keys[3] newest
+        os.utime(cache.path(key, "midi"), (now - 1000 * (4 - i), now - 1000 * (4 - i)))
+
+    cache.max_age = 3500  # seconds: only keys[0] (4000 s old) is too old
+    assert cache.evict() == 1
+    assert cache.get(keys[0], ["midi"]) is None
+
+    cache.get(keys[1], ["midi"])  # a hit makes keys[1] the most recently used
+    cache.max_age, cache.max_bytes = None, 2000
+    assert cache.evict() == 1
+    assert sorted(cache.entries()) == sorted([keys[1], keys[3]])
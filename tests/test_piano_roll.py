@@ -0,0 +1,109 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from music21 import tie
+
+from analysis.note_index import load_note_index
+from analysis.piano_roll import (
+    DEFAULT_PITCH_RANGE,
+    HOLD,
+    ONSET,
+    build_piano_rolls,
+    iter_batches,
+    load_roll,
+    open_piano_rolls,
+    render_roll,
+)
+
+
+def test_rolls_shards_and_batches(tmp_path, make_score):
+    corpus = tmp_path / "xml"
+    corpus.mkdir()
+    make_score(
+        [
+            ("Violin", [(["C4"], 1), (["D4"], 0.5), ([], 0.5), (["E4", "G4"], 2)]),
+            ("Cello", [(["C2"], 4), (["G2"], 4)]),
+        ]
+    ).write("musicxml", fp=str(corpus / "one.musicxml"))
+    make_score(
+        [
+            ("Flute", [(["A5"], 4)] * 4),
+        ]
+    ).write("musicxml", fp=str(corpus / "two.musicxml"))
+
+    out = str(tmp_path / "rolls")
+    manifest = build_piano_rolls(
+        str(corpus),
+        out,
+        resolution=2,
+        pitch_range=(36, 96),
+        shard_steps=24,
+        workers=1,
+        cache_dir=str(tmp_path / "cache"),
+    )
+    # Violin 4 quarters, Cello 8, Flute 16 -> the Flute roll starts a new shard
+    assert [
+        (i["part"], i["shard"], i["start"], i["steps"]) for i in manifest["items"]
+    ] == [
+        ("Violin", 0, 0, 8),
+        ("Cello", 0, 8, 16),
+        ("Flute", 1, 0, 32),
+    ]
+
+    rolls = open_piano_rolls(out)
+    violin = load_roll(rolls, 0)
+    assert isinstance(violin, np.memmap) and violin.shape == (8, 61)
+    c4, d4, e4, g4 = (m - 36 for m in (60, 62, 64, 67))
+    assert violin[:, c4].tolist() == [ONSET, HOLD, 0, 0, 0, 0, 0, 0]
+    assert violin[:, d4].tolist() == [0, 0, ONSET, 0, 0, 0, 0, 0]
+    assert violin[3].sum() == 0  # rest
+    assert (
+        violin[4:, e4].tolist() == violin[4:, g4].tolist() == [ONSET, HOLD, HOLD, HOLD]
+    )
+    cello = load_roll(rolls, 1)
+    assert (
+        cello[:, 0].tolist() == [ONSET] + [HOLD] * 7 + [0] * 8
+    )  # C2, the lowest pitch kept
+
+    batches = list(iter_batches(rolls, batch_size=3, window=8))
+    assert [b.shape for b, _ in batches] == [(3, 8, 61), (3, 8, 61), (1, 8, 61)]
+    refs = np.concatenate([r for _, r in batches])
+    assert refs.tolist() == [[0, 0], [1, 0], [1, 8], [2, 0], [2, 8], [2, 16], [2, 24]]
+    assert np.array_equal(batches[0][0][0], violin)
+
+    shuffled = list(
+        iter_batches(
+            rolls, batch_size=3, window=8, shuffle=True, seed=1, drop_last=True
+        )
+    )
+    assert len(shuffled) == 2
+    picked = {tuple(r) for r in np.concatenate([r for _, r in shuffled]).tolist()}
+    assert len(picked) == 6 and picked <= {tuple(r) for r in refs.tolist()}
+
+
+def test_tied_notes_hold(tmp_path, make_score):
+    corpus = tmp_path / "xml"
+    corpus.mkdir()
+    # C4 tied across the barline, then C4 struck again
+    score = make_score([("Horn", [(["C4"], 4), (["C4"], 2), (["C4"], 2)])])
+    first, second, _ = score.parts[0].recurse().notes
+    first.tie, second.tie = tie.Tie("start"), tie.Tie("stop")
+    path = str(corpus / "tied.musicxml")
+    score.write("musicxml", fp=path)
+
+    index = load_note_index(path, cache_dir=None)
+    assert index["notes"]["tie"].tolist() == [1, 3, 0]
+    streamed = load_note_index(path, cache_dir=None, low_memory=True)
+    assert streamed["notes"]["tie"].tolist() == [1, 3, 0]
+
+    ((_, roll),) = render_roll(index, resolution=2)
+    c4 = 60 - DEFAULT_PITCH_RANGE[0]
+    assert roll[:, c4].tolist() == [ONSET] + [HOLD] * 11 + [ONSET] + [HOLD] * 3
+
+    manifest = build_piano_rolls(
+        str(corpus), str(tmp_path / "rolls"), workers=1, cache_dir=None
+    )
+    assert manifest["ties_merged"] is True
@@ -0,0 +1,74 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from music21 import stream, note
+
+from analysis.note_index import build_note_index
+from analysis.rules import compile_rule, evaluate_rule
+from analysis.score_index import build_score_index
+
+
+def _part(name, bars):
+    part = stream.Part()
+    part.partName = name
+    for number, pitches in enumerate(bars, start=1):
+        m = stream.Measure(number=number)
+        for p in pitches:
+            m.append(note.Note(p) if p else note.Rest())
+        part.append(m)
+    return part
+
+
+def _index():
+    score = stream.Score()
+    score.insert(0, _part("Horn", [["C4", "E5"], [None], ["G4"], [None]]))
+    score.insert(0, _part("Piano", [["C3"], ["C#3"], ["A2"], ["E3"]]))
+    return build_score_index(build_note_index(score))
+
+
+RULE = {
+    "name": "third_below_next_bar",
+    "upper": {"voice": "horn", "select": "last", "lookback": 1},
+    "lower": {"voice": "piano", "bar": 1, "select": "lowest"},
+    "intervals": ["m3", "M3"],
+    "direction": "below",
+}
+
+
+def test_rule_table():
+    rows = evaluate_rule(_index(), RULE)
+    assert [r["bar"] for r in rows] == [1, 2, 3, 4]
+    # bar 1: E5 over C#3; bar 2: looks back to E5 over A2; bar 3: G4 over E3
+    assert [r["passed"] for r in rows] == [True, False, True, False]
+    assert rows[1]["upper_bar"] == 1
+    assert rows[3]["lower_note"] is None
+
+
+def test_compile_rule_rejects_unknown_interval():
+    with pytest.raises(ValueError):
+        compile_rule(dict(RULE, intervals=["X9"]))
+
+
+def test_lookahead_and_staves_combined():
+    score = stream.Score()
+    score.insert(0, _part("Horn", [["E5"], [None], [None]]))
+    # Two staves named "Piano" form one voice
+    score.insert(0, _part("Piano", [["G4", "A4", "C6"], ["F4"], ["E4"]]))
+    score.insert(0, _part("Piano", [["C2", "A3"], ["D3"], ["C#2"]]))
+    index = build_score_index(build_note_index(score))
+
+    # Lowest note over bars N+1..N+2: C#2 in bar 3, not D3 in bar 2
+    row = evaluate_rule(index, dict(RULE, bars=[1]))[0]
+    assert (row["lower_note"], row["passed"]) == ("D3", False)
+    lower = dict(RULE["lower"], lookahead=1)
+    row = evaluate_rule(index, dict(RULE, lower=lower, bars=[1]))[0]
+    assert (row["lower_note"], row["lower_bar"], row["passed"]) == ("C#2", 3, True)
+
+    # "last" takes the latest onset of either staff (C6, upper staff), not
+    # the last note of the staff listed last (A3)
+    upper = {"voice": "piano", "select": "last"}
+    row = evaluate_rule(index, dict(RULE, upper=upper, bars=[1]))[0]
+    assert row["upper_note"] == "C6"
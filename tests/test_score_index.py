@@ -0,0 +1,58 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from music21 import stream, note, chord
+
+from analysis.note_index import build_note_index
+from analysis.score_index import (
+    build_score_index,
+    find_part,
+    find_parts,
+    last_note_before_bar,
+    last_note_in_bar,
+    lowest_note_in_bar,
+    measure_row,
+)
+
+
+def _part(name, bars):
+    part = stream.Part()
+    part.partName = name
+    for number, pitches in enumerate(bars, start=1):
+        m = stream.Measure(number=number)
+        for p in pitches:
+            m.append(
+                chord.Chord(p)
+                if isinstance(p, list)
+                else note.Note(p) if p else note.Rest()
+            )
+        part.append(m)
+    return part
+
+
+def _index():
+    score = stream.Score()
+    score.insert(0, _part("French Horn", [["E4", "G4"], [None, None], ["C5", None]]))
+    score.insert(0, _part("Piano", [[["C3", "E3"], "G3"], ["A2", "F3"], ["D3", "B2"]]))
+    score.insert(0, _part("Piano", [["C2"], ["F2"], [None]]))
+    return build_score_index(build_note_index(score))
+
+
+def test_part_and_measure_lookup():
+    index = _index()
+    assert find_part(index, "horn") == 0
+    assert find_parts(index, "Piano") == [1, 2]
+    assert measure_row(index, 1, 2) is not None
+    assert measure_row(index, 1, 9) is None
+
+
+def test_bar_queries():
+    index = _index()
+    assert last_note_in_bar(index, 0, 1)["name"] == "G4"
+    assert last_note_in_bar(index, 0, 2) is None
+    assert last_note_before_bar(index, 0, 3)["name"] == "G4"
+    assert last_note_before_bar(index, 0, 1) is None
+    assert lowest_note_in_bar(index, [1, 2], 2)["name"] == "F2"
+    assert lowest_note_in_bar(index, 1, 1)["name"] == "C3"
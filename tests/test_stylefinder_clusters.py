@@ -0,0 +1,39 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+
+from stylefinder_clusters import cluster_works
+from stylefinder_dataset import FEATURE_COLUMNS
+
+
+def _blobs(centers, per_blob=40, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = np.vstack(
+        [c + 0.1 * rng.normal(size=(per_blob, len(FEATURE_COLUMNS))) for c in centers]
+    )
+    df = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+    df.insert(0, "filename", [f"work_{i}.musicxml" for i in range(len(df))])
+    return df
+
+
+def test_kmeans_picks_k_by_silhouette():
+    centers = np.eye(len(FEATURE_COLUMNS))[:3] * 5
+    clustered, scores = cluster_works(_blobs(centers), k_range=(2, 5), workers=1)
+    assert max(scores, key=scores.get) == 3
+    assert clustered["cluster"].nunique() == 3
+    # Every blob ends up in a single cluster
+    assert all(
+        clustered["cluster"].iloc[i : i + 40].nunique() == 1 for i in (0, 40, 80)
+    )
+
+
+def test_dbscan_marks_outliers_as_noise():
+    df = _blobs(np.eye(len(FEATURE_COLUMNS))[:2] * 5)
+    df.loc[len(df)] = ["outlier.musicxml"] + [50.0] * len(FEATURE_COLUMNS)
+    clustered, _ = cluster_works(df, method="dbscan", eps=0.5)
+    assert clustered["cluster"].iloc[-1] == -1
+    assert set(clustered["cluster"].iloc[:-1]) == {0, 1}
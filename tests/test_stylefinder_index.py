@@ -0,0 +1,43 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+
+from stylefinder_dataset import FEATURE_COLUMNS
+from stylefinder_index import add_works, build_index, query_knn, query_radius
+
+
+def _frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        rng.normal(size=(n, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS
+    )
+    df.insert(0, "filename", [f"work_{i}.musicxml" for i in range(n)])
+    return df
+
+
+def _brute_force(index, row, k):
+    d = np.sqrt(((index["scaled"] - index["scaled"][row]) ** 2).sum(axis=1))
+    order = [i for i in np.argsort(d) if i != row][:k]
+    return [index["filenames"][i] for i in order]
+
+
+def test_knn_matches_brute_force():
+    index = build_index(_frame(200))
+    result = [name for name, _ in query_knn(index, "work_17.musicxml", k=5)]
+    assert result == _brute_force(index, 17, 5)
+
+
+def test_incremental_add_and_radius():
+    index = build_index(_frame(50))
+    new = _frame(3, seed=1)
+    new["filename"] = ["new_a.musicxml", "new_b.musicxml", "new_c.musicxml"]
+    add_works(index, new)
+    assert index["n_tree"] == 50  # still pending, no rebuild
+    result = [name for name, _ in query_knn(index, "new_a", k=4)]
+    assert result == _brute_force(index, 50, 4)
+    within = query_radius(index, "new_b", radius=10.0)
+    assert len(within) == 52
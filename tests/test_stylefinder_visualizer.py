@@ -0,0 +1,47 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+
+from stylefinder_dataset import FEATURE_COLUMNS
+from stylefinder_visualizer import load_projection, project_features
+
+
+def _frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        rng.normal(size=(n, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS
+    )
+    df.insert(0, "filename", [f"work_{i}.musicxml" for i in range(n)])
+    return df
+
+
+def test_new_works_use_saved_projection(tmp_path):
+    path = str(tmp_path / "projection.pkl")
+    base = project_features(_frame(30), path)
+    pca = load_projection(path)["pca"]
+
+    grown = pd.concat(
+        [_frame(30), _frame(1, seed=1).assign(filename="new.musicxml")],
+        ignore_index=True,
+    )
+    grown.loc[3, FEATURE_COLUMNS] += 1.0
+    projected = project_features(grown, path)
+
+    # No refit: the PCA axes and every unchanged point stay where they were
+    assert np.allclose(load_projection(path)["pca"].components_, pca.components_)
+    unchanged = [i for i in range(30) if i != 3]
+    assert np.allclose(
+        projected.loc[unchanged, ["PC1", "PC2"]], base.loc[unchanged, ["PC1", "PC2"]]
+    )
+    assert not np.allclose(
+        projected.loc[3, ["PC1", "PC2"]], base.loc[3, ["PC1", "PC2"]]
+    )
+    assert projected["PC1"].notna().all()
+
+    refit = project_features(grown.copy(), path, refit=True)
+    assert not np.allclose(load_projection(path)["pca"].components_, pca.components_)
+    assert refit["PC1"].notna().all()
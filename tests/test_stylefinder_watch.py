@@ -0,0 +1,86 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pandas as pd
+from music21 import stream, note
+
+from stylefinder_index import load_index
+from stylefinder_visualizer import load_projection
+from stylefinder_watch import CorpusWatcher
+
+
+def _write(path, pitches, ql=1.0):
+    part = stream.Part()
+    for p in pitches:
+        part.append(note.Note(p, quarterLength=ql))
+    score = stream.Score()
+    score.insert(0, part)
+    score.write("musicxml", fp=str(path))
+
+
+def test_debounced_incremental_updates(tmp_path):
+    corpus = tmp_path / "xml"
+    corpus.mkdir()
+    watcher = CorpusWatcher(
+        str(corpus),
+        csv_path=str(tmp_path / "features.csv"),
+        index_path=str(tmp_path / "index.pkl"),
+        projection_path=str(tmp_path / "projection.pkl"),
+        debounce=1.0,
+    )
+    _write(corpus / "a.musicxml", ["C4", "E4", "G4", "C5"])
+    _write(corpus / "b.musicxml", ["D4", "A4", "F4", "D5", "C5", "B4"], 0.5)
+    _write(corpus / "c.musicxml", ["E3", "G3", "B3"], 2.0)
+
+    # Picked up only once the writes have been quiet for `debounce` seconds
+    assert watcher.poll(now=0.0) is None
+    assert watcher.poll(now=0.5) is None
+    changed, removed = watcher.poll(now=1.0)
+    assert [os.path.basename(p) for p in changed] == [
+        "a.musicxml",
+        "b.musicxml",
+        "c.musicxml",
+    ]
+    assert removed == []
+    watcher.apply(changed, removed)
+    assert sorted(pd.read_csv(tmp_path / "features.csv")["filename"]) == [
+        "a.musicxml",
+        "b.musicxml",
+        "c.musicxml",
+    ]
+    points = load_projection(str(tmp_path / "projection.pkl"))["points"].set_index(
+        "filename"
+    )
+    assert len(points) == 3
+
+    # A burst of writes to one file is one update; the others are untouched
+    _write(corpus / "d.musicxml", ["C4"] * 4)
+    assert watcher.poll(now=2.0) is None
+    _write(corpus / "d.musicxml", ["C4", "D4", "E4", "F4", "G4", "A4", "B4", "C5"])
+    (corpus / "c.musicxml").unlink()
+    assert watcher.poll(now=2.5) is None
+    changed, removed = watcher.poll(now=3.5)
+    assert [os.path.basename(p) for p in changed] == ["d.musicxml"]
+    assert [os.path.basename(p) for p in removed] == ["c.musicxml"]
+    watcher.apply(changed, removed)
+
+    df = pd.read_csv(tmp_path / "features.csv").set_index("filename")
+    assert sorted(df.index) == ["a.musicxml", "b.musicxml", "d.musicxml"]
+    assert df.loc["d.musicxml", "total_notes"] == 8
+    assert sorted(load_index(str(tmp_path / "index.pkl"))["filenames"]) == sorted(
+        df.index
+    )
+    moved = load_projection(str(tmp_path / "projection.pkl"))["points"].set_index(
+        "filename"
+    )
+    assert moved.loc["a.musicxml", "PC1"] == points.loc["a.musicxml", "PC1"]  # no refit
+    assert watcher.poll(now=10.0) is None
+
+    # A fresh watcher only catches up on what changed since the CSV was written
+    fresh = CorpusWatcher(str(corpus), csv_path=str(tmp_path / "features.csv"))
+    assert fresh.catch_up() == ([], [])
+    os.remove(tmp_path / "features.csv")
+    changed, removed = fresh.catch_up()
+    assert len(changed) == 3 and removed == []
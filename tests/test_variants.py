@@ -0,0 +1,158 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import re
+
+import pytest
+from music21 import converter, note, stream
+
+from output_cache import OutputCache
+from variants import (
+    build_variants_score,
+    export_variants,
+    harmonize_variants,
+    parse_variant,
+)
+
+MELODY = ["A4", "G4", "F4", "E4", "D4", None, "C4"]
+RHYTHM = [1.0, 1.0, 1.0, 1.0, 1.0, 0.5, 0.5]
+
+
+def test_parse_variant():
+    v = parse_variant("T2-above:retrograde:M-9:every-other", {"m_parallel": [3]})
+    assert (v["label"], v["t_level"], v["t_direction"]) == (
+        "T2-above:retrograde:M-9:every-other",
+        2,
+        "above",
+    )
+    assert v["structure"] == ["retrograde"] and v["m_parallel"] == [3, -9]
+    assert v["every_other"] and not v["voicing"]
+    assert parse_variant("T1-below:transposition-up-2-3")["structure"] == [
+        "transposition",
+        "up",
+        2,
+        3,
+    ]
+    for bad in ("X1-below", "T1-sideways", "T1-below:shuffle"):
+        with pytest.raises(ValueError):
+            parse_variant(bad)
+
+
+def test_structures_are_shared_between_variants():
+    variants = [
+        parse_variant(s) for s in ("T1-below", "T2-above:M-9", "T1-below:retrograde")
+    ]
+    structured, layers = harmonize_variants(MELODY, RHYTHM, "A", "minor", variants)
+    assert len(structured) == 2
+    assert layers[0]["structure"] == layers[1]["structure"]
+    assert [interval for interval, _ in layers[1]["m_parallel"]] == [-9]
+
+    parts = build_variants_score(structured, layers, "A", "minor", layout="parts").parts
+    assert [p.partName for p in parts] == [
+        "Melody (none)",
+        "T1-below",
+        "T2-above:M-9",
+        "T2-above:M-9 M-9",
+        "Melody (retrograde)",
+        "T1-below:retrograde",
+    ]
+
+
+def test_sections_export_once_and_cache(tmp_path):
+    cache = OutputCache(str(tmp_path))
+    variants = [
+        parse_variant(s) for s in ("T1-below", "T2-above:M-9", "T1-below:retrograde")
+    ]
+    paths = export_variants(
+        MELODY, RHYTHM, "A", "minor", variants, layout="sections", cache=cache
+    )
+    assert sorted(paths) == ["midi", "musicxml"]
+
+    score = converter.parse(paths["musicxml"])
+    assert [p.partName for p in score.parts] == ["Melody", "T-Voice", "M-parallel 1"]
+    marks = [
+        (m.content, m.getOffsetInHierarchy(score))
+        for m in score.recurse().getElementsByClass("RehearsalMark")
+    ]
+    # Each 6-beat variant starts on a fresh 4/4 bar
+    assert marks == [
+        ("T1-below", 0.0),
+        ("T2-above:M-9", 8.0),
+        ("T1-below:retrograde", 16.0),
+    ]
+    melody = [n.nameWithOctave for n in score.parts[0].flatten().notes]
+    assert melody[:6] == ["A4", "G4", "F4", "E4", "D4", "C4"] and melody[-6:] == [
+        "C4",
+        "D4",
+        "E4",
+        "F4",
+        "G4",
+        "A4",
+    ]
+
+    # Same request again: served from the cache without rebuilding
+    assert (
+        export_variants(
+            MELODY, RHYTHM, "A", "minor", variants, layout="sections", cache=cache
+        )
+        == paths
+    )
+
+
+def test_harmonizer_prompt_uses_the_source_rhythm(tmp_path, monkeypatch, capsys):
+    import main
+
+    part = stream.Part()
+    for name, ql in (("A4", 2.0), ("G4", 1.0), ("F4", 0.5), ("E4", 0.5)):
+        part.append(note.Note(name, quarterLength=ql))
+    score = stream.Score()
+    score.insert(0, part)
+    score.write("musicxml", fp=str(tmp_path / "melody.musicxml"))
+
+    answers = iter(
+        [
+            "xml",
+            str(tmp_path / "melody.musicxml"),
+            "",  # source, single part
+            "1",  # retrograde
+            "n",
+            "n",
+            "1",
+            "below",
+            "n",  # no M-lines, every note, T1 below, no voicing
+            "y",  # regular export
+            "T1-below:none",
+            "parts",
+        ]
+    )
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    monkeypatch.chdir(tmp_path)
+    main.run_harmonizer()
+
+    out = capsys.readouterr().out
+    xml_path = re.search(r"2 variants exported to (\S+\.xml)", out).group(1)
+    parts = {p.partName: p for p in converter.parse(xml_path).parts}
+    durations = {
+        name: [(n.nameWithOctave, n.quarterLength) for n in p.flatten().notes]
+        for name, p in parts.items()
+    }
+    assert durations["Melody (retrograde)"] == [
+        ("E4", 0.5),
+        ("F4", 0.5),
+        ("G4", 1.0),
+        ("A4", 2.0),
+    ]
+    assert durations["Melody (none)"] == [
+        ("A4", 2.0),
+        ("G4", 1.0),
+        ("F4", 0.5),
+        ("E4", 0.5),
+    ]
+
+    # The regular export's cache entry is keyed by the source rhythm too
+    meta_path = re.search(r"Exported to (\S+)\.xml", out).group(1) + ".json"
+    with open(meta_path) as f:
+        assert json.load(f)["rhythm"] == [2.0, 1.0, 0.5, 0.5]
@@ -0,0 +1,111 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import itertools
+import json
+import re
+
+from main import apply_t_voice_with_pattern
+from voicing import DEFAULT_WEIGHTS, respell, split_note, voice_layers, voice_line
+
+
+def test_split_and_respell_keep_spelling():
+    assert split_note("Bb3") == ("Bb", 58)
+    assert split_note("B-3") == ("B-", 58)
+    assert split_note("Cb4") == ("Cb", 59)
+    assert respell("Cb", 71) == "Cb5"
+    assert respell("F#", 54) == "F#3"
+
+
+def test_t_voice_above_no_longer_crosses_the_melody():
+    melody = ["A4", "G4", "F4", "E4", "C5"]
+    t_voice = apply_t_voice_with_pattern(melody, "F", "major", 1, "above")
+    assert t_voice[0] == "C4"  # octave copied from the melody: below it
+    voiced = voice_line(melody, t_voice, "above")
+    for m, t in zip(melody, voiced):
+        if t is not None:
+            assert split_note(t)[1] > split_note(m)[1]
+    assert [t and t[:-1] for t in voiced] == [t and t[:-1] for t in t_voice]
+
+
+def _brute_force(melody, line, direction):
+    """Cheapest voicing by trying every octave combination (same cost)."""
+    melody_midi = [split_note(m)[1] for m in melody]
+    names = [split_note(x)[0] for x in line]
+    options = [
+        [p for p in range(split_note(x)[1] % 12, 128, 12) if abs(p - m) <= 24]
+        for x, m in zip(line, melody_midi)
+    ]
+    best = None
+    for combo in itertools.product(*options):
+        cost = sum(
+            DEFAULT_WEIGHTS["leap"] * abs(b - a) for a, b in zip(combo, combo[1:])
+        )
+        for p, m in zip(combo, melody_midi):
+            cost += DEFAULT_WEIGHTS["distance"] * abs(p - m)
+            cost += DEFAULT_WEIGHTS["range"] * (max(36 - p, 0) + max(p - 84, 0))
+            crossed = p >= m if direction == "below" else m >= p
+            cost += DEFAULT_WEIGHTS["crossing"] * crossed
+        if best is None or cost < best[0]:
+            best = (cost, [respell(n, p) for n, p in zip(names, combo)])
+    return best[1]
+
+
+def test_single_layer_matches_brute_force():
+    melody = ["C5", "E4", "G4", "C4", "A4", "F4"]
+    line = ["G4", "C4", "E4", "G4", "E4", "C4"]
+    assert voice_line(melody, line, "below") == _brute_force(melody, line, "below")
+
+
+def test_layers_keep_their_order_and_rests():
+    melody = ["E4", None, "G4", "C5", "A4"]
+    layers = {
+        "high": ["C4", None, "E4", "G4", None],
+        "low": ["A2", None, "C5", "E3", "F2"],
+    }
+    voiced = voice_layers(melody, layers, {"high": "below", "low": "below"})
+    assert voiced["high"][1] is None and voiced["high"][4] is None
+    for i, m in enumerate(melody):
+        high, low = voiced["high"][i], voiced["low"][i]
+        if m and high:
+            assert split_note(m)[1] > split_note(high)[1]
+        if high and low:
+            assert split_note(high)[1] > split_note(low)[1]
+
+
+def _run_prompts(monkeypatch, tmp_path, answers):
+    import main
+
+    answers = iter(answers)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    monkeypatch.chdir(tmp_path)
+    main.run_harmonizer()
+
+
+def test_voicing_prompt_keeps_repeated_intervals(tmp_path, monkeypatch, capsys):
+    # manual melody, no structure, M+3 twice, T1 below on every note, voicing,
+    # no export, no variants
+    prompts = ["manual", "A4 G4 F4 E4", "A", "minor", "5", "y", "3, 3"]
+    prompts += ["n", "1", "below", "y", "n", ""]
+    _run_prompts(monkeypatch, tmp_path, prompts)
+    assert capsys.readouterr().out.count("M+3 voiced:") == 2
+
+
+def test_failed_voicing_is_not_recorded(tmp_path, monkeypatch, capsys):
+    import voicing
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("no voicing")
+
+    monkeypatch.setattr(voicing, "voice_layers", fail)
+    prompts = ["manual", "A4 G4 F4 E4", "A", "minor", "5", "n"]
+    prompts += ["n", "1", "below", "y", "y", ""]
+    _run_prompts(monkeypatch, tmp_path, prompts)
+
+    out = capsys.readouterr().out
+    assert "Voicing failed" in out
+    meta_path = re.search(r"Exported to (\S+)\.xml", out).group(1) + ".json"
+    with open(meta_path) as f:
+        assert json.load(f)["voicing"] is False
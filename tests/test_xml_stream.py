@@ -0,0 +1,75 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from music21 import chord, converter, layout, meter, note, stream
+
+from analysis.note_index import build_note_index, build_note_index_streaming
+from memory_utils import run_with_memory_limit
+from stylefinder_dataset import extract_features_from_score, extract_features_low_memory
+
+
+def _write_score(path):
+    score = stream.Score()
+    melody = stream.Part()
+    melody.partName = "Violin"
+    melody.append(meter.TimeSignature("3/4"))
+    for p, ql in [("A4", 1), ("G4", 0.5), ("F#4", 0.5), ("E4", 1), ("D4", 3)]:
+        melody.append(note.Note(p, quarterLength=ql))
+    melody.append(note.Rest(quarterLength=3))
+    melody.makeMeasures(inPlace=True)
+
+    # Two-staff piano with chords: music21 reads it back as two PartStaffs
+    right, left = stream.PartStaff(), stream.PartStaff()
+    for staff, pitches in ((right, ["D5", "F#5", "A5"]), (left, ["D3", "A3"])):
+        staff.partName = "Piano"
+        staff.append(meter.TimeSignature("3/4"))
+        for _ in range(3):
+            staff.append(chord.Chord(pitches, quarterLength=3))
+        staff.makeMeasures(inPlace=True)
+    score.insert(0, melody)
+    score.insert(0, right)
+    score.insert(0, left)
+    score.insert(0, layout.StaffGroup([right, left], symbol="brace"))
+    score.write("musicxml", fp=str(path))
+
+
+def test_streaming_index_matches_music21(tmp_path):
+    path = tmp_path / "score.musicxml"
+    _write_score(path)
+    expected = build_note_index(converter.parse(str(path)), source=str(path))
+    streamed = build_note_index_streaming(str(path))
+
+    assert streamed["part_names"] == expected["part_names"]
+    for group in ("measures", "notes"):
+        for field, values in expected[group].items():
+            assert np.allclose(streamed[group][field], values), (group, field)
+
+
+def test_low_memory_features_and_peak_rss(tmp_path):
+    path = tmp_path / "score.musicxml"
+    _write_score(path)
+    results = list(
+        run_with_memory_limit(
+            extract_features_low_memory,
+            [str(path)],
+            memory_limit_mb=1,
+            workers=2,
+            mode="stream",
+        )
+    )
+    assert len(results) == 1
+    _, features, peak = results[0]
+    assert peak > 0
+
+    expected = extract_features_from_score(str(path))
+    for column in (
+        "total_notes",
+        "pitch_range",
+        "avg_interval",
+        "note_density",
+        "avg_duration",
+    ):
+        assert np.isclose(features[column], expected[column]), column
@@ -0,0 +1,47 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from music21 import stream, note, meter, tie
+
+from xml_utils import extract_melody_from_xml
+
+
+def _write_two_part_score(path):
+    score = stream.Score()
+    horn = stream.Part()
+    horn.partName = "Horn"
+    horn.append(meter.TimeSignature("3/4"))
+    tied = note.Note("E-4", quarterLength=1.0)
+    tied.tie = tie.Tie("start")
+    held = note.Note("E-4", quarterLength=1.0)
+    held.tie = tie.Tie("stop")
+    for el in [note.Note("C4"), tied, held, note.Rest(), note.Note("G4")]:
+        horn.append(el)
+    piano = stream.Part()
+    piano.partName = "Piano"
+    piano.append(note.Note("C3", quarterLength=4.0))
+    score.insert(0, horn)
+    score.insert(0, piano)
+    score.write("musicxml", fp=str(path))
+
+
+def test_extract_by_part_name(tmp_path):
+    path = tmp_path / "two_parts.musicxml"
+    _write_two_part_score(path)
+    data = extract_melody_from_xml(str(path), part="horn")
+    assert data["part_name"] == "Horn"
+    assert data["melody"] == ["C4", "Eb4", "Eb4", None, "G4"]
+    assert data["ties"] == [None, "start", "stop", None, None]
+    assert data["time_signature"] == "3/4"
+    assert data["offsets"] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_extract_by_index_and_ambiguous_part(tmp_path):
+    path = tmp_path / "two_parts.musicxml"
+    _write_two_part_score(path)
+    assert extract_melody_from_xml(str(path), part=1)["melody"][0] == "C3"
+    with pytest.raises(ValueError):
+        extract_melody_from_xml(str(path))
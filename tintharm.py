@@ -1,5 +1,6 @@
 # === Tintinnabuli Harmonizer ===
 
+from lazy_imports import lazy_import
 from melody_utils import mirror_melody
 from harmony_utils import harmonize_melody
 
@@ -59,7 +60,8 @@ def transpose_melody_diatonic(melody, degree_shift, key="C", mode="major"):
     return transposed
 
 
-from music21 import converter, note
+converter = lazy_import("music21.converter")
+note = lazy_import("music21.note")
 
 
 def get_user_melody():
@@ -128,7 +130,9 @@ def apply_t_voice_with_pattern(
     return t_voice
 
 
-from music21 import stream, note, metadata, key as m21key
+stream = lazy_import("music21.stream")
+metadata = lazy_import("music21.metadata")
+m21key = lazy_import("music21.key")
 
 
 def build_tintinnabuli_score(
@@ -1,42 +1,63 @@
 # === utils.py ===
 
 MAJOR_SCALES = {
-    'C': ['C', 'D', 'E', 'F', 'G', 'A', 'B'],
-    'G': ['G', 'A', 'B', 'C', 'D', 'E', 'F#'],
-    'D': ['D', 'E', 'F#', 'G', 'A', 'B', 'C#'],
-    'A': ['A', 'B', 'C#', 'D', 'E', 'F#', 'G#'],
-    'E': ['E', 'F#', 'G#', 'A', 'B', 'C#', 'D#'],
-    'F': ['F', 'G', 'A', 'Bb', 'C', 'D', 'E'],
-    'Bb': ['Bb', 'C', 'D', 'Eb', 'F', 'G', 'A'],
-    'Eb': ['Eb', 'F', 'G', 'Ab', 'Bb', 'C', 'D']
+    "C": ["C", "D", "E", "F", "G", "A", "B"],
+    "G": ["G", "A", "B", "C", "D", "E", "F#"],
+    "D": ["D", "E", "F#", "G", "A", "B", "C#"],
+    "A": ["A", "B", "C#", "D", "E", "F#", "G#"],
+    "E": ["E", "F#", "G#", "A", "B", "C#", "D#"],
+    "F": ["F", "G", "A", "Bb", "C", "D", "E"],
+    "Bb": ["Bb", "C", "D", "Eb", "F", "G", "A"],
+    "Eb": ["Eb", "F", "G", "Ab", "Bb", "C", "D"],
 }
 
 MINOR_SCALES = {
-    'C': ['C', 'D', 'Eb', 'F', 'G', 'Ab', 'Bb'],
-    'G': ['G', 'A', 'Bb', 'C', 'D', 'Eb', 'F'],
-    'D': ['D', 'E', 'F', 'G', 'A', 'Bb', 'C'],
-    'A': ['A', 'B', 'C', 'D', 'E', 'F', 'G'],
-    'E': ['E', 'F#', 'G', 'A', 'B', 'C', 'D'],
-    'B': ['B', 'C#', 'D', 'E', 'F#', 'G', 'A'],
-    'F#': ['F#', 'G#', 'A', 'B', 'C#', 'D', 'E'],
-    'F': ['F', 'G', 'Ab', 'Bb', 'C', 'Db', 'Eb']
+    "C": ["C", "D", "Eb", "F", "G", "Ab", "Bb"],
+    "G": ["G", "A", "Bb", "C", "D", "Eb", "F"],
+    "D": ["D", "E", "F", "G", "A", "Bb", "C"],
+    "A": ["A", "B", "C", "D", "E", "F", "G"],
+    "E": ["E", "F#", "G", "A", "B", "C", "D"],
+    "B": ["B", "C#", "D", "E", "F#", "G", "A"],
+    "F#": ["F#", "G#", "A", "B", "C#", "D", "E"],
+    "F": ["F", "G", "Ab", "Bb", "C", "Db", "Eb"],
 }
 
 NOTE_TO_SEMITONE = {
-    "C": 0, "C#": 1, "Db": 1,
-    "D": 2, "D#": 3, "Eb": 3,
-    "E": 4, "F": 5, "F#": 6, "Gb": 6,
-    "G": 7, "G#": 8, "Ab": 8,
-    "A": 9, "A#": 10, "Bb": 10,
-    "B": 11
+    "C": 0,
+    "C#": 1,
+    "Db": 1,
+    "D": 2,
+    "D#": 3,
+    "Eb": 3,
+    "E": 4,
+    "F": 5,
+    "F#": 6,
+    "Gb": 6,
+    "G": 7,
+    "G#": 8,
+    "Ab": 8,
+    "A": 9,
+    "A#": 10,
+    "Bb": 10,
+    "B": 11,
 }
 
 SEMITONE_TO_NOTE = {
-    0: "C", 1: "C#", 2: "D", 3: "D#", 4: "E",
-    5: "F", 6: "F#", 7: "G", 8: "G#", 9: "A",
-    10: "A#", 11: "B"
+    0: "C",
+    1: "C#",
+    2: "D",
+    3: "D#",
+    4: "E",
+    5: "F",
+    6: "F#",
+    7: "G",
+    8: "G#",
+    9: "A",
+    10: "A#",
+    11: "B",
 }
 
+
 def note_to_midi(note):
     name = note[:-1]
     octave = int(note[-1])
@@ -45,37 +66,111 @@ def note_to_midi(note):
         raise ValueError(f"Invalid note name: {note}")
     return 12 * (octave + 1) + semitone
 
+
 def midi_to_note(midi):
     semitone = midi % 12
     octave = (midi // 12) - 1
     name = SEMITONE_TO_NOTE[semitone]
     return f"{name}{octave}"
 
+
 def get_scale_notes(key: str, mode: str):
     key = key.capitalize()
     mode = mode.lower()
-    if mode == 'major':
+    if mode == "major":
         return MAJOR_SCALES.get(key)
-    elif mode == 'minor':
+    elif mode == "minor":
         return MINOR_SCALES.get(key)
     return None
 
+
 def get_triad(scale):
     return [scale[0], scale[2], scale[4]]
 
-def get_triad_note(note, triad, level, direction='below'):
+
+def get_triad_note(note, triad, level, direction="below"):
     if note not in triad:
         return None
     index = triad.index(note)
-    if direction == 'below':
+    if direction == "below":
         new_index = (index - level) % len(triad)
     else:
         new_index = (index + level) % len(triad)
     return triad[new_index]
 
+
 def get_parallel_interval(note, scale, interval):
     try:
         idx = scale.index(note)
         return scale[(idx + interval) % len(scale)]
     except ValueError:
         return None
+
+
+# Aarden-Essen key profiles, the same weights music21's analyze("key") uses.
+KEY_PROFILES = {
+    "major": [
+        17.7661,
+        0.145624,
+        14.9265,
+        0.160186,
+        19.8049,
+        11.3587,
+        0.291248,
+        22.062,
+        0.145624,
+        8.15494,
+        0.232998,
+        4.95122,
+    ],
+    "minor": [
+        18.2648,
+        0.737619,
+        14.0499,
+        16.8599,
+        0.702494,
+        14.4362,
+        0.702494,
+        18.6161,
+        4.56621,
+        1.93186,
+        7.37619,
+        1.75623,
+    ],
+}
+
+# Tonic spellings that line up with the MAJOR_SCALES / MINOR_SCALES keys
+TONIC_NAMES = ["C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B"]
+
+
+def _correlation(xs, ys):
+    n = len(xs)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    if var_x == 0 or var_y == 0:
+        return 0.0
+    return cov / (var_x * var_y) ** 0.5
+
+
+def score_keys(pc_weights):
+    """
+    Correlate a 12-bin pitch-class weight vector against all 24 key profiles.
+    Returns a list of (tonic_pc, mode, correlation), best match first.
+    """
+    scores = []
+    for mode, profile in KEY_PROFILES.items():
+        for tonic in range(12):
+            rotated = [pc_weights[(tonic + i) % 12] for i in range(12)]
+            scores.append((tonic, mode, _correlation(rotated, profile)))
+    scores.sort(key=lambda s: s[2], reverse=True)
+    return scores
+
+
+def estimate_key(pc_weights, default=("C", "major")):
+    if not any(pc_weights):
+        return default
+    tonic, mode, _ = score_keys(pc_weights)[0]
+    return TONIC_NAMES[tonic], mode
@@ -0,0 +1,370 @@
+# === variants.py ===
+# Several harmonizations of one melody in a single score, for side-by-side
+# comparison instead of one harmonized_output file per setting.
+#
+# A variant is written as a short spec: the T-voice setting followed by
+# optional ':'-separated modifiers, each overriding the shared defaults:
+#   T1-below                      T-1 below (the default structure/options)
+#   T2-above:retrograde           a different structure
+#   T1-below:M-9:M+3              M-parallel lines in semitones
+#   T3-below:every-other:voicing  T-voice on every other note, voiced octaves
+#   T1-above:transposition-up-2-3 / :none / :mirror / :combo
+# The label shown in the score is the spec itself.
+#
+# Each distinct structure is applied once and its melody part is built once:
+# with layout "parts" the score holds one melody part per structure and a
+# labelled part per T-voice/M-line, with layout "sections" the variants
+# follow each other on shared staves, each starting on a new bar under a
+# rehearsal mark. The whole score is exported in one pass per format and
+# stored in the output cache like single jobs.
+#
+#   python variants.py "A4 G4 F4 E4 D4" --key A --mode minor -v T1-below -v T2-above -v T1-below:retrograde:M-9
+#   python variants.py "C4 D4 E4" --key C --layout sections -v T1-below -v T1-above
+
+import argparse
+import math
+
+from lazy_imports import lazy_import
+from output_cache import OutputCache, export_bytes, job_key
+
+stream = lazy_import("music21.stream")
+note = lazy_import("music21.note")
+metadata = lazy_import("music21.metadata")
+expressions = lazy_import("music21.expressions")
+m21key = lazy_import("music21.key")
+
+LAYOUTS = ("parts", "sections")
+BAR_LENGTH = 4.0  # quarter lengths; sections are padded to whole 4/4 bars
+EXPORT_FORMATS = ("musicxml", "midi")
+DEFAULTS = {
+    "structure": ["none"],
+    "axis_pitch": None,
+    "m_parallel": [],
+    "t_level": 1,
+    "t_direction": "below",
+    "every_other": False,
+    "voicing": False,
+}
+
+
+def _structure_token(token):
+    parts = token.split("-")
+    if parts[0] not in ("none", "retrograde", "mirror", "combo", "transposition"):
+        return None
+    if parts[0] == "transposition":
+        if len(parts) != 4 or parts[1] not in ("up", "down"):
+            raise ValueError(
+                f"Expected transposition-<up|down>-<step>-<count>, got '{token}'."
+            )
+        return [parts[0], parts[1], int(parts[2]), int(parts[3])]
+    return [token]
+
+
+def parse_variant(spec, defaults=None):
+    """
+    Variant settings from a spec like "T2-above:retrograde:M-9".
+
+    Parameters:
+        spec (str): T-voice setting plus ':'-separated modifiers
+        defaults (dict): shared settings the modifiers override (see DEFAULTS)
+
+    Returns:
+        dict: label, structure, axis_pitch, m_parallel, t_level, t_direction,
+        every_other and voicing
+
+    Raises:
+        ValueError for a malformed spec
+    """
+    variant = dict(DEFAULTS, **(defaults or {}))
+    variant["m_parallel"] = list(variant["m_parallel"])
+    tokens = spec.strip().split(":")
+    head = tokens[0]
+    level, _, direction = head[1:].partition("-")
+    if (
+        head[:1].upper() != "T"
+        or not level.isdigit()
+        or direction not in ("below", "above")
+    ):
+        raise ValueError(
+            f"Variant must start with T<level>-<below|above>, got '{spec}'."
+        )
+    variant.update(label=spec.strip(), t_level=int(level), t_direction=direction)
+
+    for token in tokens[1:]:
+        structure = _structure_token(token)
+        if structure is not None:
+            variant["structure"] = structure
+        elif token[:1] == "M" and token[1:].lstrip("+-").isdigit():
+            variant["m_parallel"].append(int(token[1:]))
+        elif token == "every-other":
+            variant["every_other"] = True
+        elif token == "voicing":
+            variant["voicing"] = True
+        else:
+            raise ValueError(f"Unknown modifier '{token}' in variant '{spec}'.")
+    return variant
+
+
+def harmonize_variants(melody, rhythm, key, mode, variants):
+    """
+    Layers for every variant, applying each distinct structure only once.
+
+    Parameters:
+        melody (list): note names (None for rests)
+        rhythm (list): quarter lengths, one per note
+        key, mode (str): key and 'major'/'minor'
+        variants (list): dicts from parse_variant
+
+    Returns:
+        (structured, layers): {structure key: (melody, rhythm)} and one dict
+        per variant with "variant", "structure" (key into structured),
+        "t_voice" and "m_parallel" ([(interval, line), ...])
+    """
+    from main import apply_t_voice_with_pattern
+    from melody_utils import transpose_note_by_semitones
+    from structure_utils import apply_structure
+
+    structured = {}
+    layers = []
+    for variant in variants:
+        skey = (tuple(variant["structure"]), variant.get("axis_pitch"))
+        if skey not in structured:
+            structured[skey] = apply_structure(
+                melody,
+                rhythm,
+                tuple(variant["structure"]),
+                key=key,
+                mode=mode,
+                axis_pitch=variant.get("axis_pitch"),
+            )
+        line = structured[skey][0]
+        pattern = [True, False] if variant["every_other"] else None
+        t_voice = apply_t_voice_with_pattern(
+            line,
+            key,
+            mode,
+            triad_level=variant["t_level"],
+            direction=variant["t_direction"],
+            bind_pattern=pattern,
+        )
+        m_parallel = [
+            (
+                interval,
+                [
+                    None if n is None else transpose_note_by_semitones(n, interval)
+                    for n in line
+                ],
+            )
+            for interval in variant["m_parallel"]
+        ]
+        if variant["voicing"]:
+            from voicing import voice_layers
+
+            voices = {"t_voice": t_voice}
+            directions = {"t_voice": variant["t_direction"]}
+            for i, (interval, m_line) in enumerate(m_parallel):
+                voices[i] = m_line
+                directions[i] = "above" if interval > 0 else "below"
+            voiced = voice_layers(line, voices, directions)
+            t_voice = voiced["t_voice"]
+            m_parallel = [
+                (interval, voiced[i]) for i, (interval, _) in enumerate(m_parallel)
+            ]
+        layers.append(
+            {
+                "variant": variant,
+                "structure": skey,
+                "t_voice": t_voice,
+                "m_parallel": m_parallel,
+            }
+        )
+    return structured, layers
+
+
+def _structure_name(skey):
+    return "-".join(str(t) for t in skey[0])
+
+
+def _new_part(name, key, mode):
+    part = stream.Part()
+    part.id = name
+    part.partName = name
+    part.insert(0, m21key.Key(key, mode))
+    return part
+
+
+def _fill(part, notes, rhythm, offset=0.0):
+    """Insert notes/rests at `offset`; returns the offset after the last one."""
+    for n, ql in zip(notes, rhythm):
+        part.insert(
+            offset, note.Note(n, quarterLength=ql) if n else note.Rest(quarterLength=ql)
+        )
+        offset += ql
+    return offset
+
+
+def build_variants_score(
+    structured,
+    layers,
+    key,
+    mode,
+    layout="parts",
+    title="Tintharm Variants",
+    composer="Anonymous",
+):
+    """
+    One music21 Score holding every variant from harmonize_variants.
+
+    Parameters:
+        layout (str): "parts" - one melody part per structure, followed by
+            a labelled part for each variant's T-voice and M-lines;
+            "sections" - shared Melody/T-Voice/M staves with the variants
+            one after another, each on a new bar under a rehearsal mark
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}' (use 'parts' or 'sections').")
+    s = stream.Score()
+    s.insert(0, metadata.Metadata())
+    s.metadata.title = title
+    s.metadata.composer = composer
+
+    if layout == "parts":
+        single = len(structured) == 1
+        for skey, (line, rhythm) in structured.items():
+            name = "Melody" if single else f"Melody ({_structure_name(skey)})"
+            melody_part = _new_part(name, key, mode)
+            _fill(melody_part, line, rhythm)
+            s.insert(0, melody_part)
+            for layer in layers:
+                if layer["structure"] != skey:
+                    continue
+                label = layer["variant"]["label"]
+                t_part = _new_part(label, key, mode)
+                _fill(t_part, layer["t_voice"], rhythm)
+                s.insert(0, t_part)
+                for interval, m_line in layer["m_parallel"]:
+                    m_part = _new_part(f"{label} M{interval:+d}", key, mode)
+                    _fill(m_part, m_line, rhythm)
+                    s.insert(0, m_part)
+        return s
+
+    n_m = max((len(layer["m_parallel"]) for layer in layers), default=0)
+    melody_part = _new_part("Melody", key, mode)
+    t_part = _new_part("T-Voice", key, mode)
+    m_parts = [_new_part(f"M-parallel {i + 1}", key, mode) for i in range(n_m)]
+    offset = 0.0
+    for layer in layers:
+        line, rhythm = structured[layer["structure"]]
+        melody_part.insert(offset, expressions.RehearsalMark(layer["variant"]["label"]))
+        end = _fill(melody_part, line, rhythm, offset)
+        _fill(t_part, layer["t_voice"], rhythm, offset)
+        for i, m_part in enumerate(m_parts):
+            if i < len(layer["m_parallel"]):
+                _fill(m_part, layer["m_parallel"][i][1], rhythm, offset)
+            else:
+                _fill(m_part, [None], [end - offset], offset)
+        # Start the next variant on a fresh bar
+        next_offset = math.ceil(end / BAR_LENGTH - 1e-9) * BAR_LENGTH
+        if next_offset > end:
+            for part in [melody_part, t_part] + m_parts:
+                part.insert(end, note.Rest(quarterLength=next_offset - end))
+        offset = next_offset
+    for part in [melody_part, t_part] + m_parts:
+        s.insert(0, part)
+    return s
+
+
+def export_variants(
+    melody,
+    rhythm,
+    key,
+    mode,
+    variants,
+    layout="parts",
+    formats=EXPORT_FORMATS,
+    cache=None,
+):
+    """
+    Harmonize every variant and export the combined score once per format.
+    Unchanged requests are served from the output cache.
+
+    Returns:
+        dict: {format: path}
+    """
+    cache = cache or OutputCache()
+    params = {
+        "melody": melody,
+        "rhythm": rhythm,
+        "key": key,
+        "mode": mode,
+        "variants": variants,
+        "layout": layout,
+    }
+    cache_key = job_key(params)
+    paths = cache.get(cache_key, formats)
+    if paths is not None:
+        print("[INFO] Unchanged variants, served from the output cache.")
+        return paths
+    structured, layers = harmonize_variants(melody, rhythm, key, mode, variants)
+    score = build_variants_score(structured, layers, key, mode, layout=layout)
+    files = {fmt: export_bytes(score, fmt) for fmt in formats}
+    return cache.put(cache_key, files, meta=params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export several harmonizations of one melody as one score."
+    )
+    parser.add_argument("melody", help="space-separated note names, 'r' for a rest")
+    parser.add_argument(
+        "--rhythm",
+        type=float,
+        nargs="+",
+        default=None,
+        help="quarter lengths (default: all 1)",
+    )
+    parser.add_argument("--key", default="C")
+    parser.add_argument("--mode", default="major", choices=["major", "minor"])
+    parser.add_argument(
+        "-v",
+        "--variant",
+        action="append",
+        required=True,
+        dest="variants",
+        help="variant spec, e.g. T2-above:retrograde:M-9 (repeatable)",
+    )
+    parser.add_argument(
+        "--axis-pitch", default=None, help="axis for mirror/combo structures"
+    )
+    parser.add_argument("--layout", default="parts", choices=LAYOUTS)
+    parser.add_argument(
+        "--formats", nargs="+", default=list(EXPORT_FORMATS), choices=EXPORT_FORMATS
+    )
+    args = parser.parse_args(argv)
+
+    melody = [None if t.lower() in ("r", "rest") else t for t in args.melody.split()]
+    rhythm = args.rhythm or [1.0] * len(melody)
+    if len(rhythm) != len(melody):
+        parser.error("--rhythm needs one value per melody note")
+    try:
+        variants = [
+            parse_variant(spec, {"axis_pitch": args.axis_pitch})
+            for spec in args.variants
+        ]
+    except ValueError as e:
+        parser.error(str(e))
+
+    paths = export_variants(
+        melody,
+        rhythm,
+        args.key.capitalize(),
+        args.mode,
+        variants,
+        layout=args.layout,
+        formats=args.formats,
+    )
+    print(f"📁 {len(variants)} variants saved to: {', '.join(paths.values())}")
+
+
+if __name__ == "__main__":
+    main()
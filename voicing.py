@@ -0,0 +1,217 @@
+# === voicing.py ===
+# Octave/register optimizer for T-voices and M-parallel lines.
+#
+# apply_t_voice_with_pattern keeps the melody note's octave for the triad
+# note, and M-parallel lines follow the melody at a fixed interval, so the
+# accompanying lines jump and cross the melody wherever that octave is the
+# wrong one. Here every note keeps its pitch class (and spelling) but its
+# octave is chosen by dynamic programming over the candidate pitches:
+#
+#   cost = leap * |semitones moved|                  (per layer, per note)
+#        + crossing per pair of voices out of order   (melody included)
+#        + range * semitones outside the layer range
+#        + distance * semitones away from the melody
+#
+# One layer is an exact Viterbi pass, O(n*k^2) for n notes and k candidate
+# octaves. Several layers are optimized jointly: the states are combinations
+# of one candidate per layer, pruned to the `beam` cheapest paths after each
+# note.
+
+import itertools
+import re
+
+import numpy as np
+
+from utils import NOTE_TO_SEMITONE
+
+DEFAULT_WEIGHTS = {"leap": 1.0, "crossing": 12.0, "range": 2.0, "distance": 0.25}
+DEFAULT_RANGE = (36, 84)  # C2..C6
+SEARCH_SPAN = 24  # candidates lie within two octaves of the melody note
+DEFAULT_BEAM = 64
+
+_NOTE_RE = re.compile(r"^([A-G][#b-]*)(\d+)$")
+_ACCIDENTALS = {"#": 1, "b": -1, "-": -1}
+
+
+def _semitone(name):
+    return NOTE_TO_SEMITONE[name[0]] + sum(_ACCIDENTALS[a] for a in name[1:])
+
+
+def split_note(note_str):
+    """
+    Split a note name into (spelling, MIDI number), e.g. "Bb3" -> ("Bb", 58).
+    Accepts '#', 'b' and music21's '-' accidentals; the octave belongs to the
+    letter as in music21, so "Cb4" is MIDI 59.
+    """
+    match = _NOTE_RE.match(note_str)
+    if not match:
+        raise ValueError(f"Invalid note name: {note_str}")
+    name, octave = match.groups()
+    return name, 12 * (int(octave) + 1) + _semitone(name)
+
+
+def respell(name, midi):
+    """Inverse of split_note: the spelling `name` at MIDI pitch `midi`."""
+    return f"{name}{(midi - _semitone(name)) // 12 - 1}"
+
+
+def _voice_order(layers, directions):
+    """
+    Top-to-bottom order of the voices as a list of labels, with None standing
+    for the melody. "above" layers sit over the melody and "below" layers
+    under it; layers on the same side keep the order of their average input
+    pitch.
+    """
+
+    def mean_pitch(label):
+        pitches = [p for p in layers[label] if p is not None]
+        return -np.mean(pitches) if pitches else 0.0
+
+    above = sorted((l for l in layers if directions[l] == "above"), key=mean_pitch)
+    below = sorted((l for l in layers if directions[l] != "above"), key=mean_pitch)
+    return above + [None] + below
+
+
+def _infer_direction(melody_midi, line_midi):
+    """'above' if most sounding notes of the line are above the melody."""
+    diffs = [
+        p - m for p, m in zip(line_midi, melody_midi) if p is not None and m is not None
+    ]
+    return "above" if diffs and sum(d > 0 for d in diffs) > len(diffs) / 2 else "below"
+
+
+def _candidates(pitch, melody_pitch, anchor):
+    """Every octave of `pitch` within SEARCH_SPAN of the melody (or anchor)."""
+    centre = melody_pitch if melody_pitch is not None else anchor
+    lo = pitch - 12 * ((pitch - (centre - SEARCH_SPAN)) // 12)
+    return np.arange(max(lo, pitch % 12), min(centre + SEARCH_SPAN, 127) + 1, 12)
+
+
+def voice_layers(
+    melody, layers, directions=None, weights=None, ranges=None, beam=DEFAULT_BEAM
+):
+    """
+    Re-choose the octave of every note in the accompanying layers.
+
+    Parameters:
+        melody (list): melody note names (None for rests); never changed
+        layers (dict): label -> list of note names aligned with the melody
+            (None for rests), e.g. {"T-Voice": t_voice, "M-3": m_parallel[0]}
+        directions (dict): label -> "above" or "below" the melody; inferred
+            from the input pitches when missing. Layers on the same side keep
+            the top-to-bottom order of their average input pitch.
+        weights (dict): overrides for DEFAULT_WEIGHTS
+        ranges (dict): label -> (low, high) MIDI range, default DEFAULT_RANGE
+        beam (int): joint states kept per note when optimizing several layers
+
+    Returns:
+        dict: label -> revoiced list of note names (same spellings and rests)
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    ranges = ranges or {}
+    labels = list(layers)
+    if not labels:
+        return {}
+    n = len(melody)
+    for label in labels:
+        if len(layers[label]) != n:
+            raise ValueError(
+                f"Layer '{label}' has {len(layers[label])} notes, melody has {n}."
+            )
+
+    melody_midi = [None if m is None else split_note(m)[1] for m in melody]
+    parsed = {
+        l: [None if x is None else split_note(x) for x in layers[l]] for l in labels
+    }
+    layer_midi = {l: [None if x is None else x[1] for x in parsed[l]] for l in labels}
+    directions = dict(directions or {})
+    for label in labels:
+        directions.setdefault(label, _infer_direction(melody_midi, layer_midi[label]))
+    order = _voice_order(layer_midi, directions)
+
+    sounding_melody = [m for m in melody_midi if m is not None]
+    anchor = int(np.median(sounding_melody)) if sounding_melody else 60
+    low = np.array([ranges.get(l, DEFAULT_RANGE)[0] for l in labels])
+    high = np.array([ranges.get(l, DEFAULT_RANGE)[1] for l in labels])
+    # Pairs (upper, lower) of voice columns that must not cross; column -1
+    # is the melody
+    column = {None: -1, **{l: i for i, l in enumerate(labels)}}
+    pairs = [(column[a], column[b]) for a, b in itertools.combinations(order, 2)]
+
+    # Per-layer candidates at each note. A resting layer holds the candidates
+    # of its neighbouring note so the leap across the rest is still counted.
+    options = {l: [None] * n for l in labels}
+    for label in labels:
+        last = None
+        for i in range(n):
+            if layer_midi[label][i] is not None:
+                last = _candidates(layer_midi[label][i], melody_midi[i], anchor)
+            options[label][i] = last
+        nxt = None
+        for i in range(n - 1, -1, -1):
+            if options[label][i] is None:
+                options[label][i] = nxt if nxt is not None else np.array([-1])
+            else:
+                nxt = nxt if layer_midi[label][i] is None else options[label][i]
+
+    states_per_step, back_per_step = [], []
+    cost = None
+    for i in range(n):
+        grids = np.meshgrid(*(options[l][i] for l in labels), indexing="ij")
+        states = np.stack([g.ravel() for g in grids], axis=1)  # (S, L)
+        sounding = np.array([layer_midi[l][i] is not None for l in labels])
+        node = _node_cost(states, sounding, melody_midi[i], low, high, pairs, weights)
+
+        if cost is None:
+            total, back = node, np.zeros(len(states), dtype=np.int64)
+        else:
+            prev = states_per_step[-1]
+            valid = (prev[:, None, :] >= 0) & (states[None, :, :] >= 0)
+            moves = np.where(valid, np.abs(states[None, :, :] - prev[:, None, :]), 0)
+            paths = cost[:, None] + weights["leap"] * moves.sum(axis=2)  # (P, S)
+            back = np.argmin(paths, axis=0)
+            total = paths[back, np.arange(len(states))] + node
+
+        if len(states) > beam:
+            keep = np.argsort(total, kind="stable")[:beam]
+            states, total, back = states[keep], total[keep], back[keep]
+        states_per_step.append(states)
+        back_per_step.append(back)
+        cost = total
+
+    voiced = {l: list(layers[l]) for l in labels}
+    state = int(np.argmin(cost))
+    for i in range(n - 1, -1, -1):
+        for j, label in enumerate(labels):
+            if parsed[label][i] is not None:
+                voiced[label][i] = respell(
+                    parsed[label][i][0], int(states_per_step[i][state, j])
+                )
+        state = int(back_per_step[i][state])
+    return voiced
+
+
+def _node_cost(states, sounding, melody_pitch, low, high, pairs, weights):
+    """Crossing, range and distance cost of each joint state at one note."""
+    cost = np.zeros(len(states))
+    pitched = states.astype(float)
+    pitched[:, ~sounding] = np.nan
+    cost += weights["range"] * np.nansum(
+        np.maximum(low - pitched, 0) + np.maximum(pitched - high, 0), axis=1
+    )
+    melody = np.full(
+        (len(states), 1), np.nan if melody_pitch is None else float(melody_pitch)
+    )
+    if melody_pitch is not None:
+        cost += weights["distance"] * np.nansum(np.abs(pitched - melody), axis=1)
+    voices = np.concatenate([pitched, melody], axis=1)  # column -1 is the melody
+    for upper, lower in pairs:
+        crossed = voices[:, lower] >= voices[:, upper]  # NaN (rest) never crosses
+        cost += weights["crossing"] * crossed
+    return cost
+
+
+def voice_line(melody, line, direction=None, **kwargs):
+    """voice_layers for a single layer; returns the revoiced line."""
+    directions = {"line": direction} if direction else None
+    return voice_layers(melody, {"line": line}, directions, **kwargs)["line"]
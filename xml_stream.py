@@ -0,0 +1,185 @@
+# === xml_stream.py ===
+# Low-memory MusicXML reader.
+#
+# music21 builds an object tree many times the size of the file for the whole
+# score at once. This reader walks a (partwise) MusicXML file with iterparse
+# and hands back one part at a time as plain tuples, clearing the XML elements
+# as it goes, so memory is bounded by the largest single part rather than the
+# whole score. It reads only what the analysis code needs: pitches, onsets,
+# durations, ties and measure spans. Pitches are as written, like music21's
+# default.
+
+import xml.etree.ElementTree as ET
+import zipfile
+
+STEP_TO_SEMITONE = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+
+def _open_score(path):
+    """Return a binary file object for .musicxml/.xml or compressed .mxl."""
+    if not path.endswith(".mxl"):
+        return open(path, "rb")
+    archive = zipfile.ZipFile(path)
+    rootfile = None
+    try:
+        container = ET.fromstring(archive.read("META-INF/container.xml"))
+        for el in container.iter():
+            if el.tag.endswith("rootfile") and el.get("full-path"):
+                rootfile = el.get("full-path")
+                break
+    except KeyError:
+        pass
+    if rootfile is None:
+        rootfile = next(
+            n
+            for n in archive.namelist()
+            if n.endswith((".xml", ".musicxml")) and not n.startswith("META-INF")
+        )
+    return archive.open(rootfile)
+
+
+def _measure_number(raw, previous):
+    # Like music21: the digits of the number attribute ("X0" -> 0)
+    digits = "".join(ch for ch in raw or "" if ch.isdigit())
+    return int(digits) if digits else previous + 1
+
+
+def _tie_type(note_el):
+    # Like music21: a stop and a start on one note make it a continuation
+    types = {t.get("type") for t in note_el.findall("tie")}
+    if {"start", "stop"} <= types:
+        return "continue"
+    return "start" if "start" in types else "stop" if "stop" in types else None
+
+
+def _read_part(part_el):
+    """
+    Convert one <part> element into one entry per staff (a piano part with
+    two staves becomes two entries, like music21's PartStaff objects):
+        measures: [(number, offset, length)] in quarter lengths
+        notes: [(measure row, offset in measure, duration, midi, is_chord,
+            tie)] - tie is "start", "continue", "stop" or None
+    """
+    staves = {}  # staff number -> {"measures": [...], "notes": [...]}
+    divisions = 1.0
+    bar_length = 4.0
+    part_offset = 0.0
+    number = 0
+
+    for m_row, m_el in enumerate(part_el.iter("measure")):
+        number = _measure_number(m_el.get("number"), number)
+        cursor = 0.0
+        last_onset = 0.0
+        longest = {}  # staff -> end of its latest event
+        measure_rests = {}  # staff -> True while it only holds whole-bar rests
+        chord_rows = []  # (staff, row) of the chord currently being read
+
+        for el in m_el:
+            tag = el.tag
+            if tag == "attributes":
+                div = el.findtext("divisions")
+                if div:
+                    divisions = float(div)
+                beats, beat_type = el.findtext("time/beats"), el.findtext(
+                    "time/beat-type"
+                )
+                if beats and beat_type and beats.isdigit():
+                    bar_length = 4.0 * int(beats) / int(beat_type)
+                n_staves = el.findtext("staves")
+                for staff in range(1, int(n_staves) + 1 if n_staves else 1):
+                    staves.setdefault(staff, {"measures": [], "notes": []})
+            elif tag == "backup":
+                cursor -= float(el.findtext("duration", "0")) / divisions
+            elif tag == "forward":
+                cursor += float(el.findtext("duration", "0")) / divisions
+                staff = int(el.findtext("staff", "1"))
+                longest[staff] = max(longest.get(staff, 0.0), cursor)
+            elif tag == "note":
+                staff = int(el.findtext("staff", "1"))
+                # Grace notes take no time (duration 0, as in music21)
+                is_grace = el.find("grace") is not None
+                duration = (
+                    0.0 if is_grace else float(el.findtext("duration", "0")) / divisions
+                )
+                rest = el.find("rest")
+                is_chord = el.find("chord") is not None
+                if is_chord:
+                    onset = last_onset
+                else:
+                    onset = last_onset = cursor
+                    cursor += duration
+                    chord_rows = []
+                longest[staff] = max(longest.get(staff, 0.0), cursor)
+                whole_bar_rest = rest is not None and rest.get("measure") == "yes"
+                measure_rests[staff] = measure_rests.get(staff, True) and whole_bar_rest
+
+                pitch = el.find("pitch")
+                if pitch is None:
+                    continue  # rest or unpitched percussion
+                step = pitch.findtext("step")
+                alter = float(pitch.findtext("alter", "0"))
+                octave = int(pitch.findtext("octave"))
+                midi = (octave + 1) * 12 + STEP_TO_SEMITONE[step] + int(round(alter))
+                notes = staves.setdefault(staff, {"measures": [], "notes": []})["notes"]
+                if is_chord:
+                    for c_staff, row in chord_rows:
+                        c_notes = staves[c_staff]["notes"]
+                        c_notes[row] = c_notes[row][:4] + (True,) + c_notes[row][5:]
+                chord_rows.append((staff, len(notes)))
+                notes.append((m_row, onset, duration, midi, is_chord, _tie_type(el)))
+
+        # music21 stretches a bar that only holds whole-bar rests to the meter
+        lengths = {
+            staff: bar_length if measure_rests.get(staff) else end
+            for staff, end in longest.items()
+        }
+        if not staves:
+            staves[1] = {"measures": [], "notes": []}
+        for staff, data in staves.items():
+            data["measures"].append((number, part_offset, lengths.get(staff, 0.0)))
+        part_offset += max(lengths.values(), default=0.0)
+
+    return [staves[staff] for staff in sorted(staves)]
+
+
+def iter_parts(path):
+    """
+    Yield one dict per part (per staff for multi-staff parts), in score
+    order, without holding the whole score:
+        name, instrument: from the <part-list>
+        measures: [(number, offset, length)]
+        notes: [(measure row, offset in measure, duration, midi, is_chord,
+            tie)]
+    """
+    names, instruments = {}, {}
+    with _open_score(path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        root = None
+        for event, el in context:
+            if root is None:
+                root = el
+                if root.tag == "score-timewise":
+                    raise ValueError(
+                        "Timewise MusicXML is not supported by the streaming reader."
+                    )
+            if event != "end":
+                continue
+            if el.tag == "score-part":
+                names[el.get("id")] = el.findtext("part-name")
+                instruments[el.get("id")] = el.findtext(
+                    "score-instrument/instrument-name"
+                )
+            elif el.tag == "part":
+                part_id = el.get("id")
+                staves = _read_part(el)
+                for n, staff in enumerate(staves, start=1):
+                    # Unnamed parts fall back to the id, per staff like music21
+                    fallback = f"{part_id}-Staff{n}" if len(staves) > 1 else part_id
+                    yield {
+                        "name": names.get(part_id) or fallback,
+                        "instrument": instruments.get(part_id),
+                        "measures": staff["measures"],
+                        "notes": staff["notes"],
+                    }
+                # Release the parsed part (and the part list) before the next one
+                root.clear()
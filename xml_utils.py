@@ -1,35 +1,163 @@
 # === xml_utils.py ===
 
-from music21 import converter, key, meter, note, stream
+from lazy_imports import lazy_import
+from instrumentation import count, count_objects, stage
+from utils import estimate_key
 
+chord = lazy_import("music21.chord")
+converter = lazy_import("music21.converter")
+key = lazy_import("music21.key")
+meter = lazy_import("music21.meter")
+note = lazy_import("music21.note")
+stream = lazy_import("music21.stream")
+m21tie = lazy_import("music21.tie")
 
-def extract_monophonic_melody_from_xml(path):
+
+def list_part_names(score):
+    return [p.partName or p.id for p in score.parts]
+
+
+def select_part(score, part=None):
     """
-    Load a monophonic melody line from a MusicXML file and extract metadata.
+    Pick one part from a parsed score.
+
+    Parameters:
+        score: music21 Score
+        part (int, str or None): Part index, or a case-insensitive part /
+            instrument name (substring match). None only works for
+            single-part scores.
+
     Returns:
-        - melody_stream: music21 stream containing the melody
-        - metadata: dict with key, mode, time signature
+        music21 Part
+
     Raises:
-        - ValueError if the file contains polyphonic or multi-part music
+        ValueError if the part cannot be resolved
     """
-    try:
-        score = converter.parse(path)
-        parts = score.parts
+    parts = list(score.parts)
+    if not parts:
+        raise ValueError("Score contains no parts.")
+
+    if part is None:
         if len(parts) != 1:
-            raise ValueError("MusicXML must contain only one part.")
-
-        notes = [n for n in parts[0].flat.notes if isinstance(n, note.Note)]
-        if len(notes) != len(parts[0].flat.notes):
-            raise ValueError("Only monophonic melodies without chords are supported.")
-
-        key_sig = parts[0].analyze("key")
-        ts = parts[0].recurse().getElementsByClass(meter.TimeSignature).first()
-        metadata = {
-            "key": key_sig.tonic.name,
-            "mode": key_sig.mode,
-            "time_signature": str(ts) if ts else "4/4",
-        }
+            raise ValueError(
+                f"Score has {len(parts)} parts {list_part_names(score)}; "
+                "choose one by name or index."
+            )
+        return parts[0]
+
+    if isinstance(part, int) or (isinstance(part, str) and part.strip().isdigit()):
+        idx = int(part)
+        if not 0 <= idx < len(parts):
+            raise ValueError(f"Part index {idx} out of range (0-{len(parts) - 1}).")
+        return parts[idx]
+
+    wanted = part.strip().lower()
+    for p in parts:
+        names = [p.partName, p.id]
+        inst = p.getInstrument(returnDefault=False)
+        if inst is not None:
+            names.append(inst.instrumentName)
+        if any(isinstance(n, str) and wanted in n.lower() for n in names):
+            return p
+    raise ValueError(f"No part matching '{part}' in {list_part_names(score)}.")
+
+
+def extract_melody_from_xml(path, part=None):
+    """
+    Extract a monophonic melody line from a MusicXML file in a single pass
+    over the selected part.
+
+    Parameters:
+        path (str): MusicXML file
+        part (int, str or None): Part index or name (see select_part)
 
-        return stream.Part(notes), metadata
+    Returns:
+        dict with:
+            - melody: note names (e.g. "Eb4"), None for rests
+            - rhythm: quarter lengths, parallel to melody
+            - offsets: quarter-note offsets from the start of the part
+            - ties: tie type per event ("start", "continue", "stop" or None)
+            - key, mode: estimated from duration-weighted pitch classes
+            - key_signature: first written key signature (e.g. "C# minor") or None
+            - time_signature: first time signature (e.g. "3/4"), "4/4" if absent
+            - part_name: name of the selected part
+
+    Raises:
+        ValueError if the part cannot be selected or contains chords
+    """
+    try:
+        with stage("xml.parse", path=path):
+            score = converter.parse(path)
+        count_objects(score)
+        melody_part = select_part(score, part)
+
+        melody, rhythm, offsets, ties = [], [], [], []
+        pc_weights = [0.0] * 12
+        time_sig = None
+        key_sig = None
+        measure_offset = 0.0
+
+        for el in melody_part.recurse():
+            if isinstance(el, stream.Measure):
+                measure_offset = el.offset
+            elif isinstance(el, chord.Chord):
+                raise ValueError(
+                    f"Chord found in measure {el.measureNumber}; "
+                    "only monophonic melodies are supported."
+                )
+            elif isinstance(el, note.GeneralNote):
+                is_note = isinstance(el, note.Note)
+                if el.duration.isGrace or not (is_note or isinstance(el, note.Rest)):
+                    continue
+                ql = float(el.quarterLength)
+                if is_note:
+                    melody.append(el.pitch.nameWithOctave.replace("-", "b"))
+                    pc_weights[el.pitch.pitchClass] += ql
+                else:
+                    melody.append(None)
+                rhythm.append(ql)
+                offsets.append(measure_offset + float(el.offset))
+                ties.append(el.tie.type if el.tie is not None else None)
+            elif time_sig is None and isinstance(el, meter.TimeSignature):
+                time_sig = el.ratioString
+            elif key_sig is None and isinstance(el, key.KeySignature):
+                ks = el if isinstance(el, key.Key) else el.asKey()
+                key_sig = f"{ks.tonic.name.replace('-', 'b')} {ks.mode}"
+
+        count("notes_read", len(melody))
+        with stage("key.estimate"):
+            tonic, mode = estimate_key(pc_weights)
+        return {
+            "melody": melody,
+            "rhythm": rhythm,
+            "offsets": offsets,
+            "ties": ties,
+            "key": tonic,
+            "mode": mode,
+            "key_signature": key_sig,
+            "time_signature": time_sig or "4/4",
+            "part_name": melody_part.partName or melody_part.id,
+        }
     except Exception as e:
         raise ValueError(f"Error parsing XML file: {e}")
+
+
+def extract_monophonic_melody_from_xml(path, part=None):
+    """
+    Load a monophonic melody line from a MusicXML file and extract metadata.
+    Returns:
+        - melody_stream: music21 stream containing the melody (notes and rests)
+        - metadata: dict with key, mode, time signature plus the event data
+          from extract_melody_from_xml
+    Raises:
+        - ValueError if the part cannot be selected or contains chords
+    """
+    data = extract_melody_from_xml(path, part=part)
+    melody_stream = stream.Part()
+    for name, ql, tie_type in zip(data["melody"], data["rhythm"], data["ties"]):
+        n = note.Note(name) if name else note.Rest()
+        n.quarterLength = ql
+        if tie_type:
+            n.tie = m21tie.Tie(tie_type)
+        melody_stream.append(n)
+    return melody_stream, data